@@ -0,0 +1,275 @@
+"""Benchmarks for the Inky drivers.
+
+Measures how long packing the planes takes, how much memory it allocates and
+how much is sent to the display for every resolution :class:`inky.Inky`
+supports, for both the ``inky.py`` and the ``ssd1619a.py`` path. Nothing is
+sent to a real display: :class:`inky_host.HostTransport` stands in for the
+SPI bus, so it runs the same on a computer (CPython with numpy) and on a
+board.
+
+Results are printed as one JSON object per line. On a computer:
+
+    python benchmark.py --colour red --baudrate 488000 > results.jsonl
+    python benchmark.py --baseline results.jsonl
+
+The second run fails (exit status 1) when a timing got more than
+``--tolerance`` slower, more bytes are sent or fewer bytes are saved than in
+the baseline.
+
+On a board, copy this file next to the drivers and run::
+
+    import benchmark
+    benchmark.run()
+"""
+
+import gc
+import json
+import time
+
+import inky
+import inky_host
+import inky_pack
+import inky_sequence
+import inky_stats
+
+_SPI_BAUDRATE = 488000  # Default of inky_transport and code.py
+_SPI_CHUNK_SIZE = 4096  # Bytes per chip select of the ssd1619a.py model
+_TIMING_NOISE_MS = 1  # Timings closer than this to the baseline never count as a regression
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None  # CircuitPython, use gc.mem_alloc() instead
+
+try:
+    _ticks_ns = time.monotonic_ns
+except AttributeError:
+    def _ticks_ns():
+        return int(time.monotonic() * 1000000000)
+
+
+class _Allocations:
+    """Peak number of bytes allocated while measuring, `None` if unknown."""
+
+    def __enter__(self):
+        gc.collect()
+        self.peak = None
+        if tracemalloc is not None:
+            tracemalloc.start()
+        else:
+            try:
+                self._start = gc.mem_alloc()
+            except AttributeError:
+                self._start = None
+        return self
+
+    def __exit__(self, *exc):
+        if tracemalloc is not None:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        elif self._start is not None:
+            # No peak on CircuitPython, what is still allocated after the call
+            self.peak = gc.mem_alloc() - self._start
+
+
+def measure(function, repeat=3):
+    """Run `function` `repeat` times.
+
+    :return: tuple of (fastest run in ms, bytes allocated by the first run or `None`).
+    """
+    with _Allocations() as allocations:
+        function()
+    best = None
+    for _ in range(repeat):
+        start = _ticks_ns()
+        function()
+        elapsed = (_ticks_ns() - start) / 1000000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), allocations.peak
+
+
+def test_image(width, height):
+    """Bitmap with stripes of every colour and some single pixels, the same on every run."""
+    image = inky.Bitmap(width, height, 4)
+    for y in range(height):
+        colour = (y // 16) % 3
+        for x in range(0, width, 3 if colour else 5):
+            image[x, y] = colour or inky.BLACK
+    return image
+
+
+def wire_time(length, baudrate):
+    """Modelled time in ms to clock `length` bytes out at `baudrate`, without chip select overhead."""
+    return round(length * 8000 / baudrate, 3)
+
+
+def _chunks(commands):
+    """Modelled chip select cycles for the commands in a host log, one per command and per 4096 bytes of data."""
+    return sum(1 + (len(data) + _SPI_CHUNK_SIZE - 1) // _SPI_CHUNK_SIZE for _, data in commands)
+
+
+def check_packbits(screen, black, colour):
+    """Check packed planes byte for byte against the pixel by pixel :meth:`inky.Inky.packbits`.
+
+    Its rows aren't padded to whole bytes, so only displays that are a multiple of 8 pixels wide compare.
+
+    :raises ValueError: if a plane differs.
+    """
+    for name, plane, predicate in (('black/white', black, lambda value: value != inky.WHITE),
+                                   ('colour', colour, lambda value: value == inky.RED)):
+        if bytes(plane.reshape(-1)) != bytes(screen.packbits(screen.buf, predicate)):
+            raise ValueError('Packed {} plane differs from packbits at {}x{}'.format(name, screen.width, screen.height))
+
+
+def bench_inky(resolution, colour, baudrate, repeat=3, reference=False):
+    """Benchmark the ``inky.py`` driver at one resolution."""
+    width, height = resolution
+    cols, rows, rotation = inky._RESOLUTION[resolution]
+    transport = inky_host.HostTransport(cols, rows)
+    screen = inky.Inky(resolution, colour, transport=transport)
+    screen.set_image(test_image(width, height))
+    result = {'driver': 'inky', 'resolution': '{}x{}'.format(width, height), 'colour': colour,
+              'baudrate': baudrate}
+
+    stride = inky_pack.row_bytes(width)
+    black = inky_pack.np.zeros((height, stride), dtype=inky_pack.np.uint8)
+    colour_plane = inky_pack.np.zeros((height, stride), dtype=inky_pack.np.uint8)
+
+    def pack():
+        black[:] = 0
+        colour_plane[:] = 0
+        inky_pack.pack_planes(screen.buf, black, colour_plane)
+
+    result['pack_ms'], result['pack_alloc'] = measure(pack, repeat)
+    if reference:
+        # Pixel by pixel, as slow as it gets
+        result['packbits_bw_ms'], _ = measure(lambda: screen.packbits(screen.buf, lambda value: value != inky.WHITE), 1)
+        result['packbits_colour_ms'], _ = measure(lambda: screen.packbits(screen.buf, lambda value: value == inky.RED), 1)
+        if width % 8 == 0:
+            check_packbits(screen, black, colour_plane)
+
+    screen.stats = inky_stats.Stats()
+    with _Allocations() as allocations:
+        screen.show()
+    stats = screen.stats
+    result['show_alloc'] = allocations.peak
+    result['commands'] = stats.refresh_commands
+    result['bytes'] = stats.refresh_bytes
+    result['bytes_saved'] = stats.refresh_bytes_saved
+    result['chunks'] = transport.selects
+    result['transfer_ms'] = wire_time(stats.refresh_bytes, baudrate)
+
+    # Same frame again with one pixel changed, with the controller kept awake
+    screen.stay_awake = True
+    screen.show(force=True)
+    x, y = width // 2, height // 2
+    screen.set_pixel(x, y, inky.WHITE if screen.buf[x, y] else inky.RED)
+    transport.clear_log()
+    screen.show()
+    result['delta_bytes'] = stats.refresh_bytes
+    result['delta_transfer_ms'] = wire_time(stats.refresh_bytes, baudrate)
+    screen.sleep()
+    return result
+
+
+def bench_ssd1619a(resolution, colour, baudrate):
+    """Model a refresh of the ``ssd1619a.py`` driver at one resolution.
+
+    ``displayio`` isn't available on a computer, so this replays the start
+    sequence and the full RAM writes ``displayio`` does for a refresh through
+    :class:`inky_host.HostTransport`. Packing happens in ``displayio``'s C code
+    and isn't timed. The controller is set up for the panel, which is turned on the pHATs.
+    """
+    width, height = resolution
+    cols, rows, _ = inky._RESOLUTION[resolution]
+    transport = inky_host.HostTransport(cols, rows)
+    transport.play_displayio(inky_sequence.start_sequence(cols, rows, colour, colour, inky_sequence.BLACK))
+    plane = bytearray(inky_pack.row_bytes(cols) * rows)
+    for command in (0x24, 0x26):
+        for register, data in inky_sequence.ram_pointer(0, 0):
+            transport.write(False, bytes((register,)))
+            transport.write(True, data)
+        transport.write(False, bytes((command,)))
+        transport.write(True, plane)
+    transport.write(False, b'\x20')
+    commands = transport.commands()
+    length = sum(1 + len(data) for _, data in commands)
+    return {'driver': 'ssd1619a', 'resolution': '{}x{}'.format(width, height), 'colour': colour,
+            'baudrate': baudrate, 'commands': len(commands), 'bytes': length,
+            'chunks': _chunks(commands), 'transfer_ms': wire_time(length, baudrate)}
+
+
+def run(colour='red', baudrate=_SPI_BAUDRATE, repeat=10, reference=False, resolutions=None):
+    """Run all benchmarks, print and return the results.
+
+    :param str colour: One of 'red', 'black' or 'yellow'.
+    :param int baudrate: SPI clock used to model transfer times.
+    :param int repeat: Timed runs per measurement, the fastest is reported.
+    :param bool reference: Also time the pixel by pixel :meth:`inky.Inky.packbits` and check the packed planes
+        against it, see :func:`check_packbits`. Slow.
+    :param resolutions: Resolutions to run, default: all that :class:`inky.Inky` supports.
+    """
+    results = []
+    for resolution in resolutions or sorted(inky._RESOLUTION):
+        for result in (bench_inky(resolution, colour, baudrate, repeat, reference),
+                       bench_ssd1619a(resolution, colour, baudrate)):
+            print(json.dumps(result))
+            results.append(result)
+    return results
+
+
+def compare(baseline, results, tolerance=0.5):
+    """Compare results with a baseline.
+
+    :param baseline: Results of an earlier run.
+    :param results: Results of this run.
+    :param float tolerance: Fraction a timing may grow before it counts as a regression.
+    :return: list of messages, one per regression.
+    """
+    regressions = []
+    earlier = {(result['driver'], result['resolution'], result['colour']): result for result in baseline}
+    for result in results:
+        old = earlier.get((result['driver'], result['resolution'], result['colour']))
+        if old is None:
+            continue
+        for key, value in result.items():
+            before = old.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or key == 'baudrate':
+                continue
+            if key.endswith('_saved'):
+                # Savings may only grow
+                if value < before:
+                    regressions.append('{} {} {}: {} -> {}'.format(result['driver'], result['resolution'], key, before, value))
+                continue
+            # Timings vary between runs, sizes should not change at all
+            limit = max(before * (1 + tolerance), before + _TIMING_NOISE_MS) if key.endswith('_ms') else before
+            if value > limit:
+                regressions.append('{} {} {}: {} -> {}'.format(result['driver'], result['resolution'], key, before, value))
+    return regressions
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--colour', default='red', choices=('red', 'black', 'yellow'))
+    parser.add_argument('--baudrate', type=int, default=_SPI_BAUDRATE)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--reference', action='store_true', help='also time the pixel by pixel Inky.packbits and check the packed planes against it')
+    parser.add_argument('--baseline', help='JSON lines from an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = run(args.colour, args.baudrate, args.repeat, args.reference)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = [json.loads(line) for line in f if line.strip()]
+        regressions = compare(baseline, results, args.tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression, file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
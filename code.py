@@ -6,6 +6,9 @@ from ulab import numpy as np
 
 displayio.release_displays()
 
+# SPI clock for the display, the SSD1619A takes up to 20 MHz if the wiring allows it
+SPI_BAUDRATE = 488000
+
 if(False) :
     # Use Pimoroni Inky driver, ported to CircuitPython
     import inky
@@ -13,7 +16,7 @@ if(False) :
 
     bitmap, palette = adafruit_imageload.load("CircuitPython-400x300.bmp")
 
-    screen=inky.Inky(colour='yellow')
+    screen=inky.Inky(colour='yellow', baudrate=SPI_BAUDRATE)
     screen.setup()
     screen.set_border(inky.BLACK)
     screen.set_image(bitmap)
@@ -35,7 +38,7 @@ else :
     time.sleep(0.1)
 
     display_bus = displayio.FourWire(
-        spi, command=epd_dc, chip_select=epd_cs, baudrate=488000
+        spi, command=epd_dc, chip_select=epd_cs, baudrate=SPI_BAUDRATE
     )
     #time.sleep(1)
 
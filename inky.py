@@ -2,20 +2,20 @@
 # This is a port of the Pimoroni Inky library to CircuitPython
 # The original library is available at https://github.com/pimoroni/inky/tree/master/library/inky
 
+import gc
 import time
-import struct
-import displayio
-import supervisor # for timing
-import board, microcontroller, busio
-from digitalio import DigitalInOut, Direction, Pull
-from adafruit_bus_device.spi_device import SPIDevice
 
-import inky_eeprom
+import inky_pack
+import inky_sequence
+from inky_stats import ticks_diff, ticks_ms
 
 try:
-    import ulab
+    import board, microcontroller, busio
+    from displayio import Bitmap
 except ImportError:
-    raise ImportError('This library requires the ulab numpy-like module')
+    # Not running on CircuitPython, pass a transport such as inky_host.HostTransport
+    board = microcontroller = busio = None
+    from inky_host import Bitmap
 
 # Pimoroni has not specified the driver chip
 # Most likely it's an SSD1619A 
@@ -25,29 +25,54 @@ WHITE = 0
 BLACK = 1
 RED = YELLOW = 2
 
-# GPIO pins required by BCM number
-RESET_PIN = board.IO5 #27
-BUSY_PIN = board.IO4
-DC_PIN = board.IO6
+if board is not None:
+    # GPIO pins required by BCM number
+    RESET_PIN = board.IO5 #27
+    BUSY_PIN = board.IO4
+    DC_PIN = board.IO6
 
-# In addition the following pins are used for SPI
-CS_PIN = board.IO7
-MOSI_PIN = board.MOSI
-SCLK_PIN = board.SCK
+    # In addition the following pins are used for SPI
+    CS_PIN = board.IO7
+    MOSI_PIN = board.MOSI
+    SCLK_PIN = board.SCK
+else:
+    RESET_PIN = BUSY_PIN = DC_PIN = CS_PIN = MOSI_PIN = SCLK_PIN = None
 
 # SPI channel for device 0
 # CS0 = 0
 
-_SPI_CHUNK_SIZE = 4096
 _SPI_COMMAND = False
 _SPI_DATA = True
 
+_BUSY_POLL_INTERVAL = 0.01  # seconds
+
+# Bytes of the commands around a RAM write: X pointer (2), Y pointer (3) and the RAM command (1)
+_WINDOW_OVERHEAD = 6
+# Rows that match the display RAM are skipped unless that costs more than rewriting them:
+# a new span takes 4 more commands, 7 chip select cycles, each about as long as sending 8 bytes
+_SPAN_OVERHEAD = 64
+
+
+def _mem_alloc():
+    """Bytes currently allocated on the heap, `None` if the port can't tell."""
+    try:
+        return gc.mem_alloc()
+    except AttributeError:
+        return None
+
+
+def _alloc_delta(start, packed):
+    """Bytes allocated since `start`, the larger of the counts after packing and now.
+    Not a true peak: a collection in between frees memory, so it's never below 0.
+    """
+    return max(0, max(packed, _mem_alloc()) - start)
+
 _RESOLUTION = {
     (800, 480): (800, 480, 0),
     (600, 448): (600, 448, 0),
     (400, 300): (400, 300, 0),
     (212, 104): (104, 212, -90),
-    (250, 122): (250, 122, -90),
+    (250, 122): (122, 250, -90),
 }
 
 
@@ -61,8 +86,9 @@ class Inky:
     RED = 2
     YELLOW = 2
 
-    def __init__(self, resolution=(400, 300), colour='black', cs_pin:microcontroller.Pin=CS_PIN, dc_pin:microcontroller.Pin=DC_PIN, reset_pin:microcontroller.Pin=RESET_PIN, busy_pin:microcontroller.Pin=BUSY_PIN, h_flip=False, v_flip=False,
-                 spi_bus:busio.SPI=None):
+    def __init__(self, resolution=(400, 300), colour='black', cs_pin:'microcontroller.Pin'=CS_PIN, dc_pin:'microcontroller.Pin'=DC_PIN, reset_pin:'microcontroller.Pin'=RESET_PIN, busy_pin:'microcontroller.Pin'=BUSY_PIN, h_flip=False, v_flip=False,
+                 spi_bus:'busio.SPI'=None, transport=None, framebuffer=True, rotation=0, epd_type=None, eeprom_cache=None,
+                 baudrate=None):
         """Initialise an Inky Display.
         :param resolution: Display resolution (width, height) in pixels, default: (400, 300).
         :type resolution: tuple(int, int)
@@ -71,238 +97,486 @@ class Inky:
         :param int dc_pin: Data/command pin for SPI communication, default: `22`.
         :param int reset_pin: Device reset pin, default: `27`.
         :param int busy_pin: Device busy/wait pin: `17`.
-        :param bool h_flip: Enable horizontal display flip, default: `False`.
-        :param bool v_flip: Enable vertical display flip, default: `False`.
+        :param bool h_flip: Mirror the image left to right, default: `False`.
+        :param bool v_flip: Mirror the image top to bottom, default: `False`.
         :param spi_bus: SPI device. If `None` then a default :class:`spidev.SpiDev` object is used. Default: `None`.
         :type spi_bus: :class:`spidev.SpiDev`
         :param i2c_bus: SMB object. If `None` then :class:`smbus2.SMBus(1)` is used.
         :type i2c_bus: :class:`smbus2.SMBus`
+        :param transport: Connection to the display controller. If `None` then an :class:`inky_transport.SPITransport`
+            is created from `spi_bus` and the pins, use :class:`inky_host.HostTransport` to run on a computer. Default: `None`.
+        :param bool framebuffer: Allocate a frame buffer and packed planes for :meth:`show`. Without them the
+            display can only be updated with :meth:`show_stream`, which needs a lot less memory. Default: `True`.
+        :param int rotation: Rotate the image by 90, 180 or 270 degrees counter clockwise, on top of the
+            rotation of the display itself. With 90 or 270 the image is `resolution` turned on its side,
+            for portrait layouts. Default: `0`.
+        :param epd_type: The :class:`inky_eeprom.EPDType` of the display, skips reading the EEPROM.
+            Use `False` to skip it without one, on boards without the I2C pins wired. Default: `None`,
+            read the EEPROM (once, see :func:`inky_eeprom.detect`) when no `transport` is given.
+        :param eeprom_cache: Where to keep the EEPROM contents between boots, a file path or an offset into
+            ``microcontroller.nvm``, see :func:`inky_eeprom.detect`. Default: `None`.
+        :param int baudrate: SPI clock when no `transport` is given, up to :data:`inky_transport.MAX_BAUDRATE`.
+            Default: `None`, 488 kHz.
         """
-        self._spi_bus = spi_bus
-        self._spi_device = None
+        if transport is None:
+            import inky_transport
+            options = {} if baudrate is None else {'baudrate': baudrate}
+            transport = inky_transport.SPITransport(spi_bus, cs_pin, dc_pin, reset_pin, busy_pin, **options)
+            eeprom = True
+        else:
+            eeprom = False  # The EEPROM is on the Inky board, only read it when talking to one
+        self.transport = transport
 
         if resolution not in _RESOLUTION.keys():
             raise ValueError('Resolution {}x{} not supported!'.format(*resolution))
 
+        if rotation % 90:
+            raise ValueError('Rotation {} is not supported!'.format(rotation))
+
         self.resolution = resolution
-        self.width, self.height = resolution
+        # The panel is cols x rows, the image is rotated onto it
         self.cols, self.rows, self.rotation = _RESOLUTION[resolution]
+        self.rotation = (self.rotation + rotation) % 360
+        self.h_flip = h_flip
+        self.v_flip = v_flip
+        if self.rotation in (90, 270):
+            self.width, self.height = self.rows, self.cols
+        else:
+            self.width, self.height = self.cols, self.rows
+        self._set_orientation()
 
         if colour not in ('red', 'black', 'yellow'):
             raise ValueError('Colour {} is not supported!'.format(colour))
 
         self.colour = colour
-        self.eeprom = inky_eeprom.EPDType.from_eeprom()
+        if epd_type is not None:
+            self.eeprom = epd_type or None
+        elif eeprom:
+            import inky_eeprom
+            self.eeprom = inky_eeprom.detect(cache=eeprom_cache)
+        else:
+            self.eeprom = None
         self.lut = colour
 
         if self.eeprom is not None:
-            if self.eeprom.width != self.width or self.eeprom.height != self.height:
+            if (self.eeprom.width, self.eeprom.height) != resolution:
                 raise ValueError('Supplied width/height do not match Inky: {}x{}'.format(self.eeprom.width, self.eeprom.height))
-            if self.eeprom.display_variant in (1, 6) and self.eeprom.get_color() == 'red':
+            if self.eeprom.get_lut() == 'red_ht':
                 self.lut = 'red_ht'
 
-        self.buf:displayio.Bitmap=displayio.Bitmap(self.width, self.height, 4) # 4 color values is 2 bits per pixel
         self.border_colour = 0
-
-        self.dc_pin =  DigitalInOut(dc_pin)
-        self.reset_pin = DigitalInOut(reset_pin)
-        self.busy_pin = DigitalInOut(busy_pin)
-        self.cs_pin = DigitalInOut(cs_pin)
-        self.h_flip = h_flip
-        self.v_flip = v_flip
-
-        self._gpio_setup = False
-
-        """Inky Lookup Tables.
-        These lookup tables comprise of two sets of values.
-        The first set of values, formatted as binary, describe the voltages applied during the six update phases:
-          Phase 0     Phase 1     Phase 2     Phase 3     Phase 4     Phase 5     Phase 6
-          A B C D
-        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,  LUT0 - Black
-        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,  LUT1 - White
-        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  NOT USED BY HARDWARE
-        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,  LUT3 - Yellow or Red
-        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  LUT4 - VCOM
-        There are seven possible phases, arranged horizontally, and only the phases with duration/repeat information
-        (see below) are used during the update cycle.
-        Each phase has four steps: A, B, C and D. Each step is represented by two binary bits and these bits can
-        have one of four possible values representing the voltages to be applied. The default values follow:
-        0b00: VSS or Ground
-        0b01: VSH1 or 15V
-        0b10: VSL or -15V
-        0b11: VSH2 or 5.4V
-        During each phase the Black, White and Yellow (or Red) stages are applied in turn, creating a voltage
-        differential across each display pixel. This is what moves the physical ink particles in their suspension.
-        The second set of values, formatted as hex, describe the duration of each step in a phase, and the number
-        of times that phase should be repeated:
-          Duration                Repeat
-          A     B     C     D
-        0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 0
-        0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 1
-        0x04, 0x08, 0x08, 0x10, 0x10,      etc
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        The duration and repeat parameters allow you to take a single sequence of A, B, C and D voltage values and
-        transform them into a waveform that - effectively - wiggles the ink particles into the desired position.
-        In all of our LUT definitions we use the first and second phases to flash/pulse and clear the display to
-        mitigate image retention. The flashing effect is actually the ink particles being moved from the bottom to
-        the top of the display repeatedly in an attempt to reset them back into a sensible resting position.
-        """
-        self._luts = {
-            'black': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x10, 0x04, 0x04, 0x04, 0x04,
-                0x10, 0x04, 0x04, 0x04, 0x04,
-                0x04, 0x08, 0x08, 0x10, 0x10,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-            ],
-            'red': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x40, 0x0C, 0x20, 0x0C, 0x06,
-                0x10, 0x08, 0x04, 0x04, 0x06,
-                0x04, 0x08, 0x08, 0x10, 0x10,
-                0x02, 0x02, 0x02, 0x40, 0x20,
-                0x02, 0x02, 0x02, 0x02, 0x02,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00
-            ],
-            'red_ht': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00010000, 0b00010000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b10000000, 0b10000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b01001000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x43, 0x0A, 0x1F, 0x0A, 0x04,
-                0x10, 0x08, 0x04, 0x04, 0x06,
-                0x04, 0x08, 0x08, 0x10, 0x0B,
-                0x02, 0x04, 0x04, 0x40, 0x10,
-                0x06, 0x06, 0x06, 0x02, 0x02,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00
-            ],
-            'yellow': [
-                0b11111010, 0b10010100, 0b10001100, 0b11000000, 0b11010000, 0b00000000, 0b00000000,
-                0b11111010, 0b10010100, 0b00101100, 0b10000000, 0b11100000, 0b00000000, 0b00000000,
-                0b11111010, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b11111010, 0b10010100, 0b11111000, 0b10000000, 0b01010000, 0b00000000, 0b11001100,
-                0b10111111, 0b01011000, 0b11111100, 0b10000000, 0b11010000, 0b00000000, 0b00010001,
-                0x40, 0x10, 0x40, 0x10, 0x08,
-                0x08, 0x10, 0x04, 0x04, 0x10,
-                0x08, 0x08, 0x03, 0x08, 0x20,
-                0x08, 0x04, 0x00, 0x00, 0x10,
-                0x10, 0x08, 0x08, 0x00, 0x20,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-            ]
-        }
+        self.plane_map = inky_pack.DEFAULT_MAP  # Plane bits of each palette index, see set_palette()
+        self._cmd_buf = bytearray(1)
+        self.alloc_delta = None
+        self._last_border = None  # Display content unknown until the first refresh
+
+        if framebuffer:
+            self.buf:Bitmap=Bitmap(self.width, self.height, 4) # 4 color values is 2 bits per pixel
+
+            # Packed planes are owned by the driver and reused for every refresh,
+            # so show() doesn't allocate a new 15KB buffer (or list) per plane.
+            # They hold the image as the panel shows it, rotated and mirrored.
+            self._buf_a = bytearray(inky_pack.row_bytes(self.cols) * self.rows)
+            self._buf_b = bytearray(len(self._buf_a))
+            self._plane_a = inky_pack.plane_view(self._buf_a, self.cols, self.rows)
+            self._plane_b = inky_pack.plane_view(self._buf_b, self.cols, self.rows)
+
+            # Packed copy of the last frame sent, to skip refreshes that wouldn't change anything
+            self._last_a = inky_pack.plane_view(bytearray(len(self._buf_a)), self.cols, self.rows)
+            self._last_b = inky_pack.plane_view(bytearray(len(self._buf_b)), self.cols, self.rows)
+        else:
+            # Streaming only, see show_stream()
+            self.buf = None
+            self._buf_a = self._buf_b = self._plane_a = self._plane_b = None
+            self._last_a = self._last_b = None
+        self.changed_rows = None
+
+        # Controller state, so back-to-back refreshes only send what changed.
+        # With stay_awake the display isn't put to sleep after a refresh, so the next
+        # refresh skips the reset and only rewrites registers and rows that changed.
+        self.stay_awake = False
+        # With pattern_fill a mostly blank plane is filled by the controller itself, see _ram_spans()
+        self.pattern_fill = True
+        self._awake = False
+        self._registers = {}
+
+        # Waveform selection, see set_update_mode()
+        self.update_mode = 'full'
+        self.full_every = 0
+        self.last_update_mode = None
+        self._fast_updates = 0
+        # Assign an inky_policy.RefreshPolicy to choose the waveform by the ghosting history instead
+        self.refresh_policy = None
+        # Temperature in degrees C the waveform is adjusted to, a number or a function that reads a sensor
+        # such as read_temperature(). None uses the waveforms as they are.
+        self.temperature = None
+        self.temperature_band = None  # Band of the last refresh, see inky_sequence.TEMPERATURE_BANDS
+
+        # Instrumentation, assign an inky_stats.Stats to record refreshes
+        self.stats = None
+
+        # Assign an inky_cache.FrameCache to store frames with cache_frame() and show them with show_cached()
+        self.frame_cache = None
+
+        # State for the asyncio API
+        self._refreshing = False
+        self._refresh_lock = None
+        self._busy_mark = None  # Start of the refresh triggered by start_show()
+
+    def _set_orientation(self):
+        """Split rotation and mirroring into what packing does and what the controller does.
+        Plane row `n` is image row `n`, or image column `n` when the image is on its side
+        (`_transpose`). Packing mirrors plane rows (`_reverse`), the controller mirrors the
+        order of the rows by writing its RAM bottom up (`_flip_rows`), which costs nothing.
+        """
+        rotation = self.rotation
+        self._transpose = rotation in (90, 270)
+        if self._transpose:
+            # 90: panel rows run right to left through the image, panel columns top to bottom
+            self._flip_rows = (rotation == 90) != self.h_flip
+            self._reverse = (rotation == 270) != self.v_flip
+        else:
+            self._flip_rows = (rotation == 180) != self.v_flip
+            self._reverse = (rotation == 180) != self.h_flip
 
     def setup(self):
         """Set up Inky GPIO and reset display."""
-        if not self._gpio_setup:
-            self.dc_pin.direction = Direction.OUTPUT
-            self.dc_pin.value = False
-            self.reset_pin.direction = Direction.OUTPUT
-            self.reset_pin.value = True
-            self.busy_pin.direction = Direction.INPUT
-
-            if self._spi_bus is None:
-                self._spi_bus = board.SPI()
-           
-            self._gpio_setup = True
-
-        self.reset_pin.value = False
-        time.sleep(0.1)
-        self.reset_pin.value = True
-        time.sleep(0.1)
+        self.transport.setup()
+        self.transport.reset()
 
         self._send_command(0x12)  # Soft Reset
         self._busy_wait()
 
+        # A reset puts every register back to its default
+        self._registers = {}
+        self._awake = True
+
+    def sleep(self):
+        """Put the display into deep sleep.
+        The display is reset and configured again by the next refresh.
+        """
+        self._send_command(0x10, 0x01)  # Enter Deep Sleep
+        self._awake = False
+
+    def set_update_mode(self, mode, full_every=10):
+        """Select the waveform used to refresh the display.
+        'fast' uses a short black/white waveform and, while the display is kept awake, doesn't
+        rewrite the red/yellow RAM, so updates are much quicker but leave some ghosting. A full refresh is still used for the first
+        refresh, when the red/yellow plane changed and after every `full_every` fast refreshes.
+        :param str mode: One of 'full' or 'fast'.
+        :param int full_every: Number of fast refreshes before a full refresh clears the ghosting,
+            `0` to never force a full refresh. Default: `10`.
+        The mode is ignored while a :attr:`refresh_policy` is assigned.
+        """
+        if mode not in ('full', 'fast'):
+            raise ValueError('Update mode {} is not supported!'.format(mode))
+        self.update_mode = mode
+        self.full_every = full_every
+        self._fast_updates = 0
+
+    def _use_fast_update(self, window):
+        """Decide whether the next refresh of a RAM window can use the fast waveform."""
+        if self.refresh_policy is not None:
+            return self._policy_decision(window)
+        if self.update_mode != 'fast' or self._last_border is None:
+            return False
+        if self.full_every and self._fast_updates >= self.full_every:
+            return False
+        c0, y0, c1, y1 = window
+        return inky_pack.changed_rows(self._plane_b[y0:y1, c0:c1], self._last_b[y0:y1, c0:c1]) is None
+
+    def _policy_decision(self, window):
+        """Let the :attr:`refresh_policy` pick the waveform for the rows that changed."""
+        c0, y0, c1, y1 = window
+        known = self._last_border is not None
+        colour_changed = known and inky_pack.changed_rows(self._plane_b[y0:y1, c0:c1], self._last_b[y0:y1, c0:c1]) is not None
+        waveform, reason = self.refresh_policy.decide(self.rows, self.changed_rows or (y0, y1), colour_changed,
+                                                      self._plane_b, known)
+        if self.stats is not None:
+            self.stats.decision(waveform, reason)
+        return waveform == 'fast'
+
+    def compile_sequences(self):
+        """Compile the configuration commands for every border colour and waveform now,
+        so refreshes never have to. Refreshes compile what they need on first use otherwise.
+        With a :attr:`temperature` set, the waveforms of every temperature band are compiled too.
+        """
+        bands = (None,) if self.temperature is None else range(len(inky_sequence.TEMPERATURE_BANDS))
+        inky_sequence.precompile(self.rows, self.colour, self.lut, self.resolution, self._flip_rows, bands)
+
+    def set_temperature(self, celsius):
+        """Adjust the waveform to the temperature of the display, from an external sensor.
+        Cold displays get longer phases for full colour, warm displays shorter ones for quicker refreshes.
+        :param celsius: Temperature in degrees C, a function returning it (called before every refresh),
+            or `None` to use the waveforms as they are.
+        """
+        self.temperature = celsius
+
+    def read_temperature(self):
+        """Read the temperature sensor of the display controller.
+        Needs a transport that reads data back from the controller, see :meth:`inky_transport.SPITransport.read`
+        for the wiring.
+        Use ``set_temperature(screen.read_temperature)`` to read it before every refresh.
+        :return: Temperature in degrees C.
+        """
+        asleep = not self._awake
+        if asleep:
+            self.setup()
+        self._set_register(0x18, b'\x80')  # Temperature sensor: internal
+        self._set_register(0x22, b'\xa1')  # Display Update Sequence: clock on, load temperature, clock off
+        self._send_command(0x20)
+        self._busy_wait()
+        data = self.transport.read(0x1b, 2)  # Temperature register, 12 bit two's complement in 1/16 degrees
+        if asleep:
+            self.sleep()  # Woken only for this, the RAM doesn't hold a frame
+        value = (data[0] << 4) | (data[1] >> 4)
+        if value & 0x800:
+            value -= 0x1000
+        return value / 16
+
+    def _temperature_band(self):
+        temperature = self.temperature
+        if callable(temperature):
+            temperature = temperature()
+        return inky_sequence.temperature_band(temperature)
+
+    def _set_register(self, command, data):
+        """Send a configuration command, unless the controller already holds this value.
+        :param command: command byte
+        :param data: compiled command data, see :mod:`inky_sequence`
+        """
+        if self._registers.get(command) == data:
+            return
+        self._send_command(command, data)
+        self._registers[command] = data
+
     def _busy_wait(self):
         """Wait for busy/wait pin."""
-        start= supervisor.ticks_ms()
-        while self.busy_pin.value == True:
-            time.sleep(0.01)
-        stop = supervisor.ticks_ms()
-        print("Waited for busy: ", (stop - start)/1000)
+        while self.transport.busy == True:
+            time.sleep(_BUSY_POLL_INTERVAL)
+
+    def _mark(self):
+        """Start timing a phase, `None` while stats are disabled."""
+        return None if self.stats is None else ticks_ms()
+
+    def _phase(self, name, start):
+        """Record the time since :meth:`_mark` for a phase."""
+        if start is not None and self.stats is not None:
+            self.stats.phase(name, start)
+
+    async def _busy_wait_async(self, timeout=None):
+        """Wait for busy/wait pin, yielding to other tasks while polling.
+        :param float timeout: Seconds to wait, default: wait forever.
+        :return: False if the display was still busy after `timeout`.
+        """
+        import asyncio  # Only needed by the asyncio API
+
+        start = ticks_ms()
+        while self.transport.busy == True:
+            if timeout is not None and ticks_diff(ticks_ms(), start) > timeout * 1000:
+                return False
+            await asyncio.sleep(_BUSY_POLL_INTERVAL)
+        return True
+
+    @property
+    def busy(self):
+        """True while the display is refreshing."""
+        return self._refreshing or self.transport.busy
+
+    async def wait_idle(self, timeout=None):
+        """Wait for a refresh started by :meth:`show_async` to finish, yielding to other tasks.
+        :param float timeout: Seconds to wait, default: wait forever.
+        :return: False if the display was still busy after `timeout`.
+        """
+        import asyncio  # Only needed by the asyncio API
+
+        start = ticks_ms()
+        while self.busy:
+            if timeout is not None and ticks_diff(ticks_ms(), start) > timeout * 1000:
+                return False
+            await asyncio.sleep(_BUSY_POLL_INTERVAL)
+        return True
+
+    async def show_async(self, force=False, timeout=None, callback=None):
+        """Show buffer on display without blocking the asyncio event loop.
+        The frame is packed straight away, even if a previous refresh is still running,
+        and sent as soon as the display is idle. Other tasks keep running while the display
+        refreshes, so they can draw the next frame into :attr:`buf` in the meantime.
+        :param bool force: If True, refresh even if nothing changed, default: `False`.
+        :param float timeout: Seconds to wait for the display each time it is busy, default: wait forever.
+        :param callback: Called with this display when the refresh has finished, default: `None`.
+        :return: The changed rows as (first row, end row), or `None` if nothing changed.
+        :raises TimeoutError: if the display is still busy after `timeout`.
+        """
+        import asyncio  # Only needed by the asyncio API
+
+        self._check_framebuffer()
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        window = (0, 0, inky_pack.row_bytes(self.cols), self.rows)
+
+        async with self._refresh_lock:
+            if self.stats is not None:
+                self.stats.begin()
+            start = _mem_alloc()
+            mark = self._mark()
+            self._pack_window(window)
+            self._phase('pack', mark)
+            packed = _mem_alloc()
+            if not await self.wait_idle(timeout):
+                raise TimeoutError('Display still busy after {}s'.format(timeout))
+            if not self._send_frame(window, force, finish=False):
+                return None
+            self._refreshing = True
+
+        try:
+            mark = self._mark()
+            if not await self._busy_wait_async(timeout):
+                raise TimeoutError('Display still busy after {}s'.format(timeout))
+            self._phase('busy', mark)
+            if not self.stay_awake:
+                self.sleep()
+        finally:
+            self._refreshing = False
+
+        if start is not None:
+            self.alloc_delta = _alloc_delta(start, packed)
+        if callback is not None:
+            callback(self)
+        return self.changed_rows
+
+    def start_show(self, force=False):
+        """Send the buffer to the display and trigger the refresh, without waiting for it.
+        Lets several displays refresh at the same time, see :mod:`inky_multi`. Poll :attr:`busy`
+        and call :meth:`finish_show` once the display is idle.
+        :param bool force: If True, refresh even if nothing changed, default: `False`.
+        :return: True if a refresh was started, False if nothing changed.
+        """
+        self._check_framebuffer()
+        if self.stats is not None:
+            self.stats.begin()
+        window = (0, 0, inky_pack.row_bytes(self.cols), self.rows)
+        mark = self._mark()
+        self._pack_window(window)
+        self._phase('pack', mark)
+        if not self._send_frame(window, force, finish=False):
+            return False
+        self._busy_mark = self._mark()
+        return True
+
+    def finish_show(self):
+        """Finish a refresh started by :meth:`start_show` once the display is idle.
+        Puts the display to sleep, unless :attr:`stay_awake` is set.
+        """
+        self._phase('busy', self._busy_mark)
+        self._busy_mark = None
+        if not self.stay_awake:
+            self.sleep()
 
-    def _update(self, buf_a, buf_b, busy_wait=True):
+    def _update(self, buf_a, buf_b, busy_wait=True, window=None, finish=True, fast=False):
         """Update display.
         :param buf_a: Black/White pixels
         :param buf_b: Yellow/Red pixels
+        :param window: RAM window to write as (first byte column, first row, end byte column, end row),
+            default: the whole display. Only this part of `buf_a` and `buf_b` is sent.
+        :param bool finish: If False, return as soon as the update is triggered and leave waiting
+            for it and putting the display to sleep to the caller.
+        :param bool fast: Use the fast black/white waveform, the Yellow/Red RAM isn't written
+            unless the display was reset.
         """
-        self.setup()
-
-        packed_height = list(struct.pack('<H', self.rows))
-
-        print(f'packed_height: {packed_height}')
-
-        if isinstance(packed_height[0], str):
-            packed_height = map(ord, packed_height)
-
-        self._send_command(0x74, 0x54)  # Set Analog Block Control
-        self._send_command(0x7e, 0x3b)  # Set Digital Block Control
-
-        self._send_command(0x01, packed_height + [0x00])  # Gate setting
-
-        self._send_command(0x03, 0x17)  # Gate Driving Voltage
-        self._send_command(0x04, [0x41, 0xAC, 0x32])  # Source Driving Voltage
-
-        self._send_command(0x3a, 0x07)  # Dummy line period
-        self._send_command(0x3b, 0x04)  # Gate line width
-        self._send_command(0x11, 0x03)  # Data entry mode setting 0x03 = X/Y increment
-
-        self._send_command(0x2c, 0x3c)  # VCOM Register, 0x3c = -1.5v?
-        self._send_command(0x22, 0xC7)  # Display Update Sequence
-
-        self._send_command(0x3c, 0b00000000)
-        if self.border_colour == self.BLACK:
-            self._send_command(0x3c, 0b00000000)  # GS Transition Define A + VSS + LUT0
-        elif self.border_colour == self.RED and self.colour == 'red':
-            self._send_command(0x3c, 0b01110011)  # Fix Level Define A + VSH2 + LUT3
-        elif self.border_colour == self.YELLOW and self.colour == 'yellow':
-            self._send_command(0x3c, 0b00110011)  # GS Transition Define A + VSH2 + LUT3
-        elif self.border_colour == self.WHITE:
-            self._send_command(0x3c, 0b00110001)  # GS Transition Define A + VSH2 + LUT1
-
-        if self.colour == 'yellow':
-            self._send_command(0x04, [0x07, 0xAC, 0x32])  # Set voltage of VSH and VSL
-        if self.colour == 'red' and self.resolution == (400, 300):
-            self._send_command(0x04, [0x30, 0xAC, 0x22])
-
-        self._send_command(0x32, self._luts[self.lut])  # Set LUTs
+        ram_retained = self._begin_update('fast' if fast else self.lut)
 
         # Start image data send
+        stride = inky_pack.row_bytes(self.cols)
+        c0, y0, c1, y1 = (0, 0, stride, self.rows) if window is None else window
+        flip_rows = self.rows if self._flip_rows else 0
 
-        self._send_command(0x44, [0x00, (self.cols // 8) - 1])  # Set RAM X Start/End
-        self._send_command(0x45, [0x00, 0x00] + packed_height)  # Set RAM Y Start/End
+        for command, data in inky_sequence.ram_window(c0, y0, c1, y1, flip_rows):
+            self._set_register(command, data)
 
         # 0x24 == RAM B/W, 0x26 == RAM Red/Yellow/etc
-        for data in ((0x24, buf_a), (0x26, buf_b)):
-            cmd, buf = data
-            self._send_command(0x4e, 0x00)  # Set RAM X Pointer Start
-            self._send_command(0x4f, [0x00, 0x00])  # Set RAM Y Pointer Start
-            self._send_command(cmd, buf)
-
+        for cmd, buf, last in ((0x24, buf_a, self._last_a), (0x26, buf_b, self._last_b)):
+            if fast and ram_retained and cmd == 0x26:
+                continue  # Unchanged and still in the display RAM
+            mark = self._mark()
+            sent = None if self.stats is None else self.stats.refresh_bytes
+            plane = inky_pack.plane_view(buf, self.cols, self.rows)
+            spans = self._ram_spans(cmd, plane, last, (c0, y0, c1, y1), ram_retained)
+            with self.transport:  # One bus transaction for the whole plane
+                for s0, s1 in spans:
+                    for pointer in inky_sequence.ram_pointer(c0, s0, flip_rows):
+                        self._send_command(*pointer)  # Set RAM X/Y Pointer Start
+                    self._send_window(cmd, buf, stride, c0, s0, c1, s1)
+            if sent is not None:
+                # Writing the whole window takes both pointers, the RAM command and the data. Spans and
+                # a pattern fill can cost more than that on a small window, which doesn't count as saved.
+                self.stats.saved(max(0, _WINDOW_OVERHEAD + (y1 - y0) * (c1 - c0) - (self.stats.refresh_bytes - sent)))
+            self._phase('transfer_bw' if cmd == 0x24 else 'transfer_colour', mark)
+
+        self._finish_update(busy_wait, finish)
+
+    def _ram_spans(self, command, plane, last, window, ram_retained):
+        """Runs of rows of a RAM window that have to be written, as a list of (first row, end row).
+        Rows the display RAM already holds are skipped: while the RAM is retained, the rows that match
+        the last frame sent. Otherwise a mostly blank (or full) plane is first filled by the controller
+        itself (see :func:`inky_sequence.pattern_fill`) and only the rows that differ are written.
+        """
+        c0, y0, c1, y1 = window
+        gap = _SPAN_OVERHEAD // (c1 - c0)
+        if ram_retained and self._last_border is not None:
+            spans = inky_pack.row_spans(plane[y0:y1, c0:c1], last[y0:y1, c0:c1], gap)
+            return [(y0 + s0, y0 + s1) for s0, s1 in spans]
+
+        if (self.pattern_fill and window == (0, 0, inky_pack.row_bytes(self.cols), self.rows)
+                and self.cols <= inky_sequence.PATTERN_FILL_SIZE[0] and self.rows <= inky_sequence.PATTERN_FILL_SIZE[1]):
+            value, count = inky_pack.fill_value(plane)
+            if count:
+                spans = inky_pack.row_spans(plane, value, gap)
+                skipped = self.rows - sum(s1 - s0 for s0, s1 in spans)
+                if skipped * (c1 - c0) > _SPAN_OVERHEAD:
+                    self._send_command(*inky_sequence.pattern_fill(command, value))
+                    self._busy_wait()
+                    return spans
+        return ((y0, y1),)
+
+    def _begin_update(self, lut):
+        """Wake up the controller and send the configuration for a refresh.
+        :param str lut: Waveform to use, a key of :data:`inky_sequence.LUTS`.
+        :return: True if the display RAM still holds the last frame sent.
+        """
+        if self.stats is not None:
+            self.stats.refreshes += 1
+        mark = self._mark()
+        ram_retained = self._awake
+        if self._awake:
+            self._busy_wait()  # Previous refresh must be done before sending anything
+        else:
+            self.setup()
+
+        self.temperature_band = self._temperature_band()
+        # The LUT is only sent again when the band changed, or after a reset
+        for command, data in inky_sequence.config(self.rows, self.colour, lut, self.border_colour, self.resolution,
+                                                  self._flip_rows, self.temperature_band):
+            self._set_register(command, data)
+        self._phase('setup', mark)
+        return ram_retained
+
+    def _finish_update(self, busy_wait=True, finish=True):
+        """Trigger the display update once the RAM has been written.
+        :param bool finish: If False, return as soon as the update is triggered and leave waiting
+            for it and putting the display to sleep to the caller.
+        """
         self._send_command(0x20)  # Trigger Display Update
         time.sleep(0.05)
 
+        if not finish:
+            return
         if busy_wait:
+            mark = self._mark()
             self._busy_wait()
-        self._send_command(0x10, 0x01)  # Enter Deep Sleep
+            self._phase('busy', mark)
+        if not self.stay_awake:
+            self.sleep()
 
     def set_pixel(self, x, y, v):
         """Set a single pixel on the buffer.
@@ -311,27 +585,338 @@ class Inky:
         :param int v: Colour to set, valid values are `inky.BLACK`, `inky.WHITE`, `inky.RED` and `inky.YELLOW`.
         """
         if v in (WHITE, BLACK, RED):
-            self.buf[y][x] = v
+            self.buf[x, y] = v
 
-    def show(self, busy_wait=True):
+    def show(self, busy_wait=True, force=False):
         """Show buffer on display.
+        Nothing is sent when the image and border match the last frame sent to the display.
+        After the update :attr:`alloc_delta` holds the bytes allocated on the heap while packing and sending,
+        as seen after packing and after sending, or `None` when the port doesn't report heap usage.
         :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
+        :param bool force: If True, refresh even if nothing changed, default: `False`.
+        :return: The changed rows as (first row, end row), or `None` if nothing changed. Rows of the panel,
+            which are image columns when the image is rotated by 90 or 270 degrees.
         """
-        region = self.buf
-
-        # TODO : Handle flip / rotate?
+        self._show_window((0, 0, inky_pack.row_bytes(self.cols), self.rows), busy_wait, force)
+        return self.changed_rows
+
+    def show_region(self, x, y, w, h, busy_wait=True, force=False):
+        """Show part of the buffer on display.
+        Only the rows of the region are packed and only the region is written to the display RAM,
+        the rest of the panel keeps its current image. The region is widened to whole bytes (8 pixels).
+        Nothing is sent when the region and border match what was last sent to the display.
+        :param int x: Left edge of the region.
+        :param int y: Top edge of the region.
+        :param int w: Width of the region.
+        :param int h: Height of the region.
+        :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
+        :param bool force: If True, refresh even if nothing changed, default: `False`.
+        :return: The region that was sent, as (x, y, w, h), or `None` if nothing was sent.
+        """
+        window = self._align_region(x, y, w, h)
+        if window is None or not self._show_window(window, busy_wait, force):
+            return None
+        return self._window_region(window)
+
+    @property
+    def planes_upright(self):
+        """True if the packed planes hold the image as it is, not turned or mirrored by packing,
+        so it can be drawn into them directly (see :mod:`inky_canvas`). Mirroring top to bottom is
+        left to the controller and doesn't count.
+        """
+        return not (self._transpose or self._reverse)
 
-        # Split the image into Black and Color planes
+    def show_planes(self, region=None, busy_wait=True, force=False):
+        """Show the packed planes as they are, without packing :attr:`buf` into them first.
+        For images drawn straight into :attr:`planes`, see :mod:`inky_canvas`. A later :meth:`show`
+        packs :attr:`buf` over them again.
+        :param region: Part of the image to send as (x, y, w, h), widened to whole bytes. Default: the whole display.
+        :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
+        :param bool force: If True, refresh even if nothing changed, default: `False`.
+        :return: The changed rows as (first row, end row), or `None` if nothing changed.
+        """
+        self._check_framebuffer()
+        if self.stats is not None:
+            self.stats.begin()
+        if region is None:
+            window = (0, 0, inky_pack.row_bytes(self.cols), self.rows)
+        else:
+            window = self._align_region(*region)
+            if window is None:
+                return None
+        if not self._send_frame(window, force, busy_wait):
+            return None
+        return self.changed_rows
+
+    def cache_frame(self, name=None):
+        """Pack the buffer and store the planes in :attr:`frame_cache`, for :meth:`show_cached`.
+        Nothing is sent to the display.
+        :param str name: Name of the frame, default: derived from the packed planes, see :func:`inky_cache.frame_key`.
+        :return: The name the frame was stored as.
+        """
+        import inky_cache  # Only needed with a frame cache
+
+        self._check_framebuffer()
+        window = (0, 0, inky_pack.row_bytes(self.cols), self.rows)
+        self._pack_window(window)
+        if name is None:
+            name = inky_cache.frame_key(self._buf_a, self._buf_b)
+        self.frame_cache.store(name, self._buf_a, self._buf_b, self.cols, self.rows, self._orientation_flags(),
+                               self.border_colour)
+        return name
+
+    def show_cached(self, name, busy_wait=True, force=False, band_rows=16):
+        """Show a frame stored by :meth:`cache_frame`, without loading or packing an image.
+        With a frame buffer the planes are read into the driver's planes and only the rows that
+        changed are sent, like :meth:`show`; :attr:`buf` isn't touched, the next :meth:`show` shows it
+        again. Without one (``framebuffer=False``) the planes are read and sent `band_rows` rows at a time.
+        The border colour is set to the one of the cached frame.
+        :param str name: Name of the frame in :attr:`frame_cache`.
+        :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
+        :param bool force: If True, refresh even if nothing changed, default: `False`.
+        :param int band_rows: Rows sent at a time without a frame buffer, default: `16`.
+        :return: The changed rows as (first row, end row), or `None` if nothing changed.
+        :raises KeyError: if the frame isn't cached.
+        :raises ValueError: if the frame was cached for a different display size or orientation.
+        """
+        if self.stats is not None:
+            self.stats.begin()
+        mark = self._mark()
+        with self.frame_cache.open(name) as frame:
+            if (frame.cols, frame.rows, frame.orientation) != (self.cols, self.rows, self._orientation_flags()):
+                raise ValueError('Frame {} was cached for another display size or orientation'.format(name))
+            self.border_colour = frame.border
+            if self._plane_a is None:
+                self._stream_frame(frame, band_rows, busy_wait)
+                return self.changed_rows
+            frame.read_plane(0, self._buf_a)
+            frame.read_plane(1, self._buf_b)
+        self._phase('load', mark)
+        self._send_frame((0, 0, inky_pack.row_bytes(self.cols), self.rows), force, busy_wait)
+        return self.changed_rows
+
+    def _orientation_flags(self):
+        """How the planes are laid out on the panel, cached frames only fit an identical layout."""
+        return int(self._transpose) | int(self._reverse) << 1 | int(self._flip_rows) << 2
+
+    def _stream_frame(self, frame, band_rows, busy_wait):
+        """Send the planes of a cached frame band by band, see :meth:`show_cached`."""
+        stride = inky_pack.row_bytes(self.cols)
+        buf = bytearray(stride * band_rows)
+        flip_rows = self.rows if self._flip_rows else 0
+
+        self._begin_update(self.lut)
+        for command, data in inky_sequence.ram_window(0, 0, stride, self.rows, flip_rows):
+            self._set_register(command, data)
+        for plane, command in ((0, 0x24), (1, 0x26)):
+            mark = self._mark()
+            with self.transport:
+                for pointer in inky_sequence.ram_pointer(0, 0, flip_rows):
+                    self._send_command(*pointer)
+                # One RAM write command, the controller keeps filling RAM with every chunk
+                self._cmd_buf[0] = command
+                self._spi_write(_SPI_COMMAND, self._cmd_buf)
+                length = 0
+                for count in frame.chunks(plane, buf):
+                    self._spi_write(_SPI_DATA, buf, 0, count)
+                    length += count
+            if self.stats is not None:
+                self.stats.command(command, length)
+            self._phase('transfer_bw' if command == 0x24 else 'transfer_colour', mark)
+        self._forget_frame()
+        self._finish_update(busy_wait)
+
+    def _forget_frame(self):
+        """The whole display was written without keeping the frame, the next show() can't skip anything."""
+        self._last_border = None
+        self.changed_rows = (0, self.rows)
+        self._fast_updates = 0
+        self.last_update_mode = 'full'
+        if self.refresh_policy is not None:
+            self.refresh_policy.full_refresh()
+
+    def show_stream(self, source, band_rows=16, busy_wait=True):
+        """Render the display band by band, without a frame buffer.
+        Each band of rows is packed and written straight to the display RAM, so memory use
+        depends on the band size instead of the display size. Use it with ``framebuffer=False``
+        to run large displays on small boards. The whole display is always refreshed.
+        :param source: Either a function called as ``source(y0, y1)`` for each band, or an iterable
+            of bands from top to bottom. A band is a :class:`displayio.Bitmap` or 2D uint8 array of
+            palette indices (`inky.WHITE`, `inky.BLACK`, `inky.RED`), as wide as the display.
+        :param int band_rows: Rows per call of `source` and rows packed at a time, default: `16`.
+        :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
+        :raises ValueError: if a band has the wrong width or the bands don't add up to the display height,
+            or the image is rotated by 90 or 270 degrees, which needs whole columns.
+        """
+        if self._transpose:
+            raise ValueError('show_stream() needs a rotation of 0 or 180 degrees')
+        if self.stats is not None:
+            self.stats.begin()
+        start = _mem_alloc()
+        stride = inky_pack.row_bytes(self.width)
+        buf_a = bytearray(stride * band_rows)
+        buf_b = bytearray(len(buf_a))
+        plane_a = inky_pack.plane_view(buf_a, self.width, band_rows)
+        plane_b = inky_pack.plane_view(buf_b, self.width, band_rows)
+        flip_rows = self.rows if self._flip_rows else 0
+
+        self._begin_update(self.lut)
+        for command, data in inky_sequence.ram_window(0, 0, stride, self.height, flip_rows):
+            self._set_register(command, data)
+
+        y = 0
+        for band in self._bands(source, band_rows):
+            width, height = inky_pack.size(band)
+            if width != self.width or y + height > self.height:
+                raise ValueError('Band of {}x{} at row {} does not fit display: {}x{}'.format(width, height, y, self.width, self.height))
+            for y0 in range(0, height, band_rows):
+                y1 = min(y0 + band_rows, height)
+                mark = self._mark()
+                inky_pack.pack_planes(band, plane_a[:y1 - y0, :], plane_b[:y1 - y0, :], y0, y1, self.plane_map,
+                                      reverse=self._reverse)
+                self._phase('pack', mark)
+                # Both RAMs share one address counter, point it at the band for each plane
+                for command, buf in ((0x24, buf_a), (0x26, buf_b)):
+                    mark = self._mark()
+                    with self.transport:
+                        for pointer in inky_sequence.ram_pointer(0, y + y0, flip_rows):
+                            self._send_command(*pointer)
+                        self._send_window(command, buf, stride, 0, 0, stride, y1 - y0)
+                    self._phase('transfer_bw' if command == 0x24 else 'transfer_colour', mark)
+            y += height
+        if y != self.height:
+            raise ValueError('Bands cover {} rows, display has {}'.format(y, self.height))
+
+        self._forget_frame()
+        packed = _mem_alloc()
+        self._finish_update(busy_wait)
+        if start is not None:
+            self.alloc_delta = _alloc_delta(start, packed)
+
+    def _bands(self, source, band_rows):
+        """Bands of rows from a :meth:`show_stream` source."""
+        if callable(source):
+            for y0 in range(0, self.height, band_rows):
+                yield source(y0, min(y0 + band_rows, self.height))
+        else:
+            for band in source:
+                yield band
 
-        buf_a = self.packbits(region, lambda x:x!=WHITE).tolist()
-        buf_b = self.packbits(region, lambda x:x==RED).tolist()
+    def _check_framebuffer(self):
+        if self._plane_a is None:
+            raise ValueError('Display was created with framebuffer=False, use show_stream()')
 
-        self._update(buf_a, buf_b, busy_wait=busy_wait)
+    def _show_window(self, window, busy_wait, force):
+        """Pack and send a RAM window if it differs from the last frame sent.
+        :return: True if the display was updated.
+        """
+        self._check_framebuffer()
+        if self.stats is not None:
+            self.stats.begin()
+        start = _mem_alloc()
+        mark = self._mark()
+        self._pack_window(window)
+        self._phase('pack', mark)
+        packed = _mem_alloc()
+
+        if not self._send_frame(window, force, busy_wait):
+            return False
+
+        if start is not None:
+            self.alloc_delta = _alloc_delta(start, packed)
+        return True
+
+    def _pack_window(self, window):
+        """Pack the rows of a RAM window into the driver's plane buffers."""
+        c0, y0, c1, y1 = window
+
+        # Split the image into Black and Color planes, straight into the driver's buffers,
+        # rotated and mirrored on the way
+        inky_pack.pack_planes(self.buf, self._plane_a[y0:y1, :], self._plane_b[y0:y1, :], y0, y1, self.plane_map,
+                              self._transpose, self._reverse)
+
+    def _send_frame(self, window, force, busy_wait=True, finish=True):
+        """Send a packed RAM window if it differs from the last frame sent.
+        :return: True if the display was updated.
+        """
+        c0, y0, c1, y1 = window
+        self.changed_rows = self._changed_rows(window)
+        if self.changed_rows is None and not force:
+            return False
+
+        ram_window = window
+        if self._awake and self.changed_rows is not None:
+            # The display RAM still holds the last frame, only rewrite the rows that changed
+            ram_window = (c0, self.changed_rows[0], c1, self.changed_rows[1])
+
+        fast = self._use_fast_update(window)
+        self._fast_updates = self._fast_updates + 1 if fast else 0
+        self.last_update_mode = 'fast' if fast else 'full'
+
+        self._update(self._buf_a, self._buf_b, busy_wait=busy_wait, window=ram_window, finish=finish, fast=fast)
+
+        self._last_a[y0:y1, c0:c1] = self._plane_a[y0:y1, c0:c1]
+        self._last_b[y0:y1, c0:c1] = self._plane_b[y0:y1, c0:c1]
+        self._last_border = self.border_colour
+        return True
+
+    def _changed_rows(self, window):
+        """Compare a RAM window of the packed planes with the last frame sent.
+        :return: The changed rows as (first row, end row), or `None` if nothing changed.
+        """
+        c0, y0, c1, y1 = window
+        if self._last_border != self.border_colour:
+            return y0, y1
+        first, end = y1, y0
+        for plane, last in ((self._plane_a, self._last_a), (self._plane_b, self._last_b)):
+            rows = inky_pack.changed_rows(plane[y0:y1, c0:c1], last[y0:y1, c0:c1])
+            if rows is not None:
+                first = min(first, y0 + rows[0])
+                end = max(end, y0 + rows[1])
+        if end <= first:
+            return None
+        return first, end
+
+    def _align_region(self, x, y, w, h):
+        """Clip a region of the image to the display, find it on the panel and widen it to byte columns.
+        :return: (first byte column, first row, end byte column, end row) or `None` if the region is empty.
+        """
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + w)
+        y1 = min(self.height, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        if self._transpose:
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        if self._reverse:
+            x0, x1 = self.cols - x1, self.cols - x0
+        return x0 >> 3, y0, inky_pack.row_bytes(x1), y1
+
+    def _window_region(self, window):
+        """The region of the image in a RAM window, as (x, y, w, h)."""
+        c0, y0, c1, y1 = window
+        x0, x1 = c0 << 3, min(c1 << 3, self.cols)
+        if self._reverse:
+            x0, x1 = self.cols - x1, self.cols - x0
+        if self._transpose:
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        return x0, y0, x1 - x0, y1 - y0
+
+    @property
+    def planes(self):
+        """The packed Black/White and Yellow/Red planes last sent by :meth:`show`.
+        These buffers are reused by every refresh, copy them if you need to keep them.
+        """
+        return memoryview(self._buf_a), memoryview(self._buf_b)
 
-    def packbits(self, region:displayio.Bitmap, predicate):
-        
+    def packbits(self, region:Bitmap, predicate):
+        """Pack one plane pixel by pixel.
+        This is the original, slow implementation. :meth:`show` uses :func:`inky_pack.pack_planes`,
+        this is kept as a reference for checking its output.
+        """
         outputLength=(region.width*region.height)>>3
-        packedData = ulab.numpy.zeros((outputLength), dtype=ulab.numpy.uint8)
+        packedData = inky_pack.np.zeros((outputLength), dtype=inky_pack.np.uint8)
         bitIndex = 0
         currentByte = 0
         
@@ -350,6 +935,14 @@ class Inky:
         return packedData
 
 
+    def set_palette(self, mapping):
+        """Choose the display colour of palette indices in :attr:`buf`.
+        By default `inky.WHITE`, `inky.BLACK` and `inky.RED` show as themselves and any other index as black.
+        On a black/white display indices mapped to `inky.RED` show as black.
+        :param dict mapping: Display colour of palette indices, for example ``{3: inky.RED}``.
+        """
+        self.plane_map = inky_pack.PlaneMap(mapping, colour=self.colour != 'black')
+
     def set_border(self, colour):
         """Set the border colour.
         :param int colour: The border colour. Valid values are `inky.BLACK`, `inky.WHITE`, `inky.RED` and `inky.YELLOW`.
@@ -363,42 +956,55 @@ class Inky:
         :param image: Image to copy.
         :type image: :class:`PIL.Image.Image` or :class:`numpy.ndarray` or list
         """
-        if isinstance(image, displayio.Bitmap):
-            self.buf=image # TODO : copy data? Handle rotation?
+        if isinstance(image, Bitmap):
+            if image.width != self.width or image.height != self.height:
+                raise ValueError('Image size {}x{} does not match display: {}x{}'.format(image.width, image.height, self.width, self.height))
+            self.buf=image # Not copied, rotation and flips are applied while packing
             return
         
         raise ValueError("image should be a Bitmap")
 
-    def _spi_write(self, dc : bool, values:bytearray):
+    def _spi_write(self, dc : bool, values:bytearray, start=0, end=None):
         """Write values over SPI.
         :param dc: whether to write as data or command
-        :param values: list of values to write
+        :param values: buffer of values to write, written in place without copying
+        :param int start: index of the first value to write, default: `0`.
+        :param int end: index after the last value to write, default: `len(values)`.
         """
-        
-        self.dc_pin.value = dc
-
-        transferLength=len(values)
-        device = SPIDevice(spi=self._spi_bus, chip_select=self.cs_pin, baudrate=488000)
-        for start in range(0, transferLength, _SPI_CHUNK_SIZE):
-             with device as spi:
-                    # Chuncked transfer
-                    spi.write(buffer=values, start=start, end=min(start+_SPI_CHUNK_SIZE, transferLength))
-        
+        self.transport.write(dc, values, start, end)
+
+    def _send_window(self, command, buf, stride, c0, y0, c1, y1):
+        """Send the part of a packed plane that falls inside a RAM window.
+        Full width windows are one contiguous write, otherwise each row is written separately;
+        the controller keeps filling RAM as long as no new command is sent.
+        :param command: RAM write command
+        :param buf: packed plane, `stride` bytes per row
+        """
+        self._cmd_buf[0] = command
+        self._spi_write(_SPI_COMMAND, self._cmd_buf)
+        if c0 == 0 and c1 == stride:
+            self._spi_write(_SPI_DATA, buf, y0 * stride, y1 * stride)
+        else:
+            for row in range(y0 * stride, y1 * stride, stride):
+                self._spi_write(_SPI_DATA, buf, row + c0, row + c1)
+        if self.stats is not None:
+            self.stats.command(command, (y1 - y0) * (c1 - c0))
+
     def _send_command(self, command, data:bytearray=None):
         """Send command over SPI.
         :param command: command byte
-        :param data: optional list of values
+        :param data: optional int, list of values or buffer (`bytearray`, `memoryview`), buffers are sent as is
         """
-        print('SPI \\x{:02x}'.format(command), end=' ')
-
-        self._spi_write(_SPI_COMMAND, bytearray([command]))
+        self._cmd_buf[0] = command
+        self._spi_write(_SPI_COMMAND, self._cmd_buf)
+        length = 0
         if data is not None:
-        if isinstance(data, list):
-            data = bytearray(data)
-        if isinstance(data, int):
-            data = bytearray([data])
-            print('{:02x}'.format(len(data)), end=' ')
-            print(''.join('{:02x} '.format(x) for x in data))    
+            if isinstance(data, list):
+                data = bytearray(data)
+            if isinstance(data, int):
+                self._cmd_buf[0] = data
+                data = self._cmd_buf
+            length = len(data)
             self._spi_write(_SPI_DATA, data)
-        else:
-            print('\\x00')
+        if self.stats is not None:
+            self.stats.command(command, length)
@@ -0,0 +1,79 @@
+"""Create the right driver for the attached Inky display.
+
+The display type comes from the EEPROM on the Inky board (read once and
+optionally cached, see :func:`inky_eeprom.detect`), so one ``code.py`` runs
+on every supported board and display:
+
+    import inky_auto
+
+    screen = inky_auto.auto_display(eeprom_cache=0)
+    screen.set_image(bitmap)
+    screen.show()
+
+Only displays with an SSD1619A controller (the original pHAT and wHAT
+variants) are supported. Other known variants raise a `ValueError` that names
+the panel and its controller.
+"""
+
+import inky_eeprom
+
+SUPPORTED_CONTROLLERS = ('ssd1619a',)
+
+
+def display_spec(epd_type):
+    """Resolution and colour to drive a display with.
+
+    :param epd_type: :class:`inky_eeprom.EPDType` of the display.
+    :return: tuple of (resolution, colour).
+    :raises ValueError: if the display variant is unknown or its controller isn't supported.
+    """
+    variant = inky_eeprom.VARIANTS.get(epd_type.display_variant)
+    if variant is None:
+        raise ValueError('Display variant {} is not supported!'.format(epd_type.display_variant))
+    controller, resolution, colour = variant
+    if controller not in SUPPORTED_CONTROLLERS:
+        raise ValueError('{} uses the {} controller, which is not supported!'.format(epd_type.get_variant(), controller.upper()))
+    # The EEPROM knows the panel best, the table covers EEPROMs with fields left blank
+    if epd_type.width and epd_type.height:
+        resolution = (epd_type.width, epd_type.height)
+    return resolution, epd_type.get_color() or colour
+
+
+def auto_display(epd_type=None, eeprom_cache=None, bus=None, **kwargs):
+    """Create a driver for the attached display.
+
+    Returns an :class:`inky.Inky`, or an :class:`ssd1619a.SSD1619A` when a ``displayio`` bus is given.
+    The configuration commands for the display are compiled before the driver is returned.
+
+    :param epd_type: :class:`inky_eeprom.EPDType` of the display, default: read from the EEPROM.
+    :param eeprom_cache: Where to keep the EEPROM contents between boots, see :func:`inky_eeprom.detect`.
+    :param bus: ``displayio.FourWire`` bus, to use the ``displayio`` driver instead. Default: `None`.
+        The pHAT panels are turned, the driver gets their own geometry and a ``displayio`` rotation
+        that shows the image the way :class:`inky.Inky` does, `rotation` turns it further.
+    :param kwargs: Passed on to the driver, for example pins, `rotation` or `busy_pin`.
+    :raises RuntimeError: if there is no `epd_type` and no EEPROM to read it from.
+    :raises ValueError: if the display isn't supported.
+    """
+    if epd_type is None:
+        epd_type = inky_eeprom.detect(cache=eeprom_cache)
+        if epd_type is None:
+            raise RuntimeError('No Inky EEPROM found, pass epd_type to select the display')
+    resolution, colour = display_spec(epd_type)
+
+    lut = epd_type.get_lut() or colour
+
+    if bus is not None:
+        import ssd1619a
+        from inky import _RESOLUTION
+        # The controller is set up for the panel's sources (cols) and gates (rows), displayio turns the image.
+        # Inky's rotation is counter clockwise, displayio's clockwise.
+        if resolution not in _RESOLUTION:
+            raise ValueError('Resolution {}x{} not supported!'.format(*resolution))
+        cols, rows, rotation = _RESOLUTION[resolution]
+        kwargs['rotation'] = (kwargs.get('rotation', 0) - rotation) % 360
+        return ssd1619a.SSD1619A(bus, colour, lut=lut, width=cols, height=rows, **kwargs)
+
+    import inky
+    screen = inky.Inky(resolution, colour, epd_type=epd_type, **kwargs)
+    screen.compile_sequences()
+    return screen
@@ -0,0 +1,273 @@
+"""Cache of packed frames on flash, for instant redisplay.
+
+Screens that come back again and again (a kiosk rotating through a fixed set
+of pages) don't have to be loaded and packed every time: :meth:`inky.Inky.cache_frame`
+stores the packed black/white and red/yellow planes, compressed, and
+:meth:`inky.Inky.show_cached` sends them to the display again without decoding
+an image or packing anything.
+
+    screen.frame_cache = inky_cache.FrameCache('/frames', max_bytes=64 * 1024)
+    if 'menu' not in screen.frame_cache:
+        bitmap, palette = adafruit_imageload.load('/menu.bmp')
+        screen.set_image(bitmap)
+        screen.cache_frame('menu')
+    screen.show_cached('menu')
+
+Planes are compressed with PackBits run length encoding, so the mostly empty
+red/yellow plane takes a few hundred bytes. Frames are kept as one file each
+and the least recently used ones are removed when the cache grows over
+`max_bytes`. CircuitPython can only write to its flash when it isn't mounted
+over USB, see ``storage.remount()``.
+"""
+
+import os
+import struct
+
+MAGIC = b'INKF'
+_VERSION = 1
+# magic, version, panel columns, panel rows, orientation flags, border colour, compressed size of each plane
+_HEADER = '<4sBHHBBII'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+_SUFFIX = '.ink'
+
+_RUN_MIN = 3  # Shorter runs are cheaper as part of a literal
+_RUN_MAX = 128
+_FILLS = {0x00: bytes(_RUN_MAX), 0xFF: b'\xff' * _RUN_MAX}  # Runs of blank and full bytes, the usual ones
+
+
+def compress(data):
+    """Compress a buffer with PackBits run length encoding.
+
+    A header byte `n` below 128 is followed by `n + 1` literal bytes, a header
+    above 128 by one byte that repeats `257 - n` times.
+
+    :param data: Buffer to compress.
+    :return: bytearray of compressed data.
+    """
+    out = bytearray()
+    length = len(data)
+    literal = i = 0
+    while i < length:
+        value = data[i]
+        end = min(length, i + _RUN_MAX)
+        j = i + 1
+        while j < end and data[j] == value:
+            j += 1
+        if j - i < _RUN_MIN:
+            i = j
+            continue
+        _literals(out, data, literal, i)
+        out.append(257 - (j - i))
+        out.append(value)
+        literal = i = j
+    _literals(out, data, literal, length)
+    return out
+
+
+def _literals(out, data, start, end):
+    for i in range(start, end, 128):
+        count = min(end - i, 128)
+        out.append(count - 1)
+        out.extend(data[i:i + count])
+
+
+def decompress(stream, length, buf):
+    """Decompress PackBits data from a file, a buffer at a time.
+
+    :param stream: File positioned at the compressed data.
+    :param int length: Number of compressed bytes.
+    :param buf: Buffer to decompress into, reused for every chunk.
+    :return: generator of the number of bytes decompressed into `buf`, every chunk but the last fills it.
+    """
+    out = memoryview(buf)
+    size = len(buf)
+    header = bytearray(1)
+    pos = 0
+    while length > 0:
+        stream.readinto(header)
+        length -= 1
+        n = header[0]
+        if n < 128:
+            count = n + 1
+            length -= count
+            while count:
+                part = min(count, size - pos)
+                stream.readinto(out[pos:pos + part])
+                pos += part
+                count -= part
+                if pos == size:
+                    yield pos
+                    pos = 0
+        elif n > 128:
+            stream.readinto(header)
+            length -= 1
+            count = 257 - n
+            fill = _FILLS.get(header[0]) or bytes(header) * _RUN_MAX
+            while count:
+                part = min(count, size - pos)
+                out[pos:pos + part] = fill[:part]
+                pos += part
+                count -= part
+                if pos == size:
+                    yield pos
+                    pos = 0
+    if pos:
+        yield pos
+
+
+def frame_key(plane_a, plane_b):
+    """Key for a frame derived from its content, a CRC32 of both planes as 8 hex digits."""
+    import binascii  # Only needed for content keys
+
+    return '{:08x}'.format(binascii.crc32(plane_b, binascii.crc32(plane_a)) & 0xFFFFFFFF)
+
+
+class Frame:
+    """A cached frame opened for reading, see :meth:`FrameCache.open`.
+
+    Use it as a context manager so the file is closed again.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        header = bytearray(_HEADER_SIZE)
+        if stream.readinto(header) != _HEADER_SIZE:
+            raise ValueError('Cached frame is truncated')
+        magic, version, self.cols, self.rows, self.orientation, self.border, size_a, size_b = struct.unpack(_HEADER, header)
+        if magic != MAGIC or version != _VERSION:
+            raise ValueError('Not a cached frame')
+        self._sizes = (size_a, size_b)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._stream.close()
+
+    def chunks(self, plane, buf):
+        """Decompress a plane a buffer at a time.
+
+        Planes must be read in order, the black/white plane (`0`) before the red/yellow one (`1`).
+
+        :param int plane: `0` for the black/white plane, `1` for the red/yellow plane.
+        :param buf: Buffer to decompress into.
+        :return: generator of the number of bytes in `buf`, see :func:`decompress`.
+        """
+        self._stream.seek(_HEADER_SIZE + (self._sizes[0] if plane else 0))
+        return decompress(self._stream, self._sizes[plane], buf)
+
+    def read_plane(self, plane, buf):
+        """Decompress a whole plane into `buf`, which must be exactly as large as the plane."""
+        pos = 0
+        for count in self.chunks(plane, buf):
+            pos += count
+        if pos != len(buf):
+            raise ValueError('Cached plane has {} bytes, expected {}'.format(pos, len(buf)))
+
+
+class FrameCache:
+    """Packed frames on flash, one file per frame, limited to `max_bytes`.
+
+    The least recently stored or shown frame is removed first when the cache
+    is full. Use is only tracked in memory, so reading never writes to flash.
+
+    :param str path: Directory for the frames, created if needed. Default: '/frames'.
+    :param int max_bytes: Total size of all cached frames, default: `65536`.
+    """
+
+    def __init__(self, path='/frames', max_bytes=65536):
+        self.path = path.rstrip('/') or '/'
+        self.max_bytes = max_bytes
+        try:
+            os.mkdir(self.path)
+        except OSError:
+            pass  # Already there
+        self._sizes = {}
+        self._order = []  # Least recently used first
+        for filename in os.listdir(self.path):
+            if filename.endswith(_SUFFIX):
+                name = filename[:-len(_SUFFIX)]
+                self._sizes[name] = os.stat(self._filename(name))[6]
+                self._order.append(name)
+
+    def __contains__(self, name):
+        return name in self._sizes
+
+    def __len__(self):
+        return len(self._sizes)
+
+    @property
+    def size(self):
+        """Bytes used by all cached frames."""
+        return sum(self._sizes.values())
+
+    def names(self):
+        """Names of the cached frames, least recently used first."""
+        return list(self._order)
+
+    def _filename(self, name):
+        return '{}/{}{}'.format(self.path if self.path != '/' else '', name, _SUFFIX)
+
+    def _touch(self, name):
+        self._order.remove(name)
+        self._order.append(name)
+
+    def store(self, name, plane_a, plane_b, cols, rows, orientation=0, border=0):
+        """Compress and store a frame, replacing a frame of the same name.
+
+        :param str name: Name of the frame, used as file name.
+        :param plane_a: Packed black/white plane.
+        :param plane_b: Packed red/yellow plane.
+        :param int cols: Panel width in pixels.
+        :param int rows: Panel height in pixels.
+        :param int orientation: Flags of the orientation the planes were packed for.
+        :param int border: Border colour.
+        :return: Size of the stored frame in bytes.
+        :raises ValueError: if the compressed frame is larger than `max_bytes`.
+        """
+        data_a = compress(plane_a)
+        data_b = compress(plane_b)
+        size = _HEADER_SIZE + len(data_a) + len(data_b)
+        if size > self.max_bytes:
+            raise ValueError('Frame of {} bytes does not fit a cache of {} bytes'.format(size, self.max_bytes))
+        if name in self._sizes:
+            self.remove(name)
+        while self._order and self.size + size > self.max_bytes:
+            self.remove(self._order[0])
+
+        with open(self._filename(name), 'wb') as f:
+            f.write(struct.pack(_HEADER, MAGIC, _VERSION, cols, rows, orientation, border, len(data_a), len(data_b)))
+            f.write(data_a)
+            f.write(data_b)
+        self._sizes[name] = size
+        self._order.append(name)
+        return size
+
+    def open(self, name):
+        """Open a cached frame for reading.
+
+        :return: :class:`Frame`, close it when done.
+        :raises KeyError: if there is no frame of this name.
+        """
+        if name not in self._sizes:
+            raise KeyError('Frame {} is not cached'.format(name))
+        self._touch(name)
+        return Frame(open(self._filename(name), 'rb'))
+
+    def remove(self, name):
+        """Remove a frame from the cache, if it is there."""
+        if self._sizes.pop(name, None) is None:
+            return
+        self._order.remove(name)
+        try:
+            os.remove(self._filename(name))
+        except OSError:
+            pass  # Already gone
+
+    def clear(self):
+        """Remove all frames."""
+        for name in list(self._order):
+            self.remove(name)
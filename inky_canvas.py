@@ -0,0 +1,394 @@
+"""Retained mode drawing straight into the packed planes of an Inky display.
+
+A :class:`Canvas` keeps a list of items (rectangles, lines, 1 bit sprites and
+text) and draws them into the packed black/white and red/yellow planes of an
+:class:`inky.Inky` with whole-byte array operations. There is no full size
+``displayio.Bitmap`` and nothing to pack: :meth:`Canvas.show` only redraws
+and sends the area that changed since the last time.
+
+    screen = inky.Inky(colour='red')
+    canvas = inky_canvas.Canvas(screen)
+    title = canvas.add(inky_canvas.Text(10, 10, 'Hello', font))
+    canvas.add(inky_canvas.Rect(0, 40, 400, 2, inky.RED))
+    canvas.show()
+    title.update(text='World')
+    canvas.show()  # Redraws and sends the rows of the title only
+
+Items are drawn in the order they were added, later items on top. Change an
+item with :meth:`Item.update`, so the canvas knows what to redraw. The planes
+must hold the image upright, see :attr:`inky.Inky.planes_upright`: on the
+pHATs, whose panels are turned, use ``rotation=90``.
+"""
+
+import inky_pack
+from inky_pack import np, WHITE, BLACK
+
+
+def pack_sprite(image):
+    """Pack a ``displayio.Bitmap`` (or 2D uint8 array) into a 1 bit sprite, every index but 0 is ink.
+
+    :return: 2D uint8 array of packed rows, first pixel in the most significant bit.
+    """
+    sprite, _ = inky_pack.pack_planes(image, None, None)
+    return sprite
+
+
+def _intersect(a, b):
+    """Intersection of two (x0, y0, x1, y1) rectangles, `None` if they don't overlap."""
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+class Item:
+    """Something drawn on a :class:`Canvas`.
+
+    On its own an item covers nothing and draws nothing, subclasses override
+    :meth:`bounds` and :meth:`draw`.
+
+    :param int colour: `inky.BLACK`, `inky.WHITE` or `inky.RED`.
+    """
+
+    def __init__(self, colour=BLACK):
+        self.colour = colour
+        self.visible = True
+        self.canvas = None
+
+    def bounds(self):
+        """Pixels the item covers as (x0, y0, x1, y1), end exclusive. Default: none."""
+        return 0, 0, 0, 0
+
+    def draw(self, canvas, clip):
+        """Draw the item, only inside `clip`, an (x0, y0, x1, y1) rectangle. Default: nothing."""
+
+    def update(self, **changes):
+        """Change attributes of the item, for example ``update(x=20, colour=inky.RED)``,
+        and mark what it covered before and after as changed.
+        """
+        if self.canvas is not None:
+            self.canvas.invalidate(self.bounds())
+        for name, value in changes.items():
+            if not hasattr(self, name):
+                raise AttributeError('{} has no attribute {}'.format(type(self).__name__, name))
+            setattr(self, name, value)
+        if self.canvas is not None:
+            self.canvas.invalidate(self.bounds())
+
+
+class Rect(Item):
+    """A filled rectangle, or its outline.
+
+    :param int x: Left edge.
+    :param int y: Top edge.
+    :param int w: Width.
+    :param int h: Height.
+    :param int colour: Colour, default: `inky.BLACK`.
+    :param int outline: Width of the outline, `0` for a filled rectangle. Default: `0`.
+    """
+
+    def __init__(self, x, y, w, h, colour=BLACK, outline=0):
+        super().__init__(colour)
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.outline = outline
+
+    def bounds(self):
+        return self.x, self.y, self.x + self.w, self.y + self.h
+
+    def draw(self, canvas, clip):
+        x0, y0, x1, y1 = self.bounds()
+        t = self.outline
+        if not t or 2 * t >= min(self.w, self.h):
+            canvas.fill_rect(x0, y0, x1, y1, self.colour, clip)
+            return
+        canvas.fill_rect(x0, y0, x1, y0 + t, self.colour, clip)
+        canvas.fill_rect(x0, y1 - t, x1, y1, self.colour, clip)
+        canvas.fill_rect(x0, y0 + t, x0 + t, y1 - t, self.colour, clip)
+        canvas.fill_rect(x1 - t, y0 + t, x1, y1 - t, self.colour, clip)
+
+
+class Line(Item):
+    """A one pixel wide line from (x0, y0) to (x1, y1), both ends included.
+
+    Horizontal and vertical lines are drawn a byte at a time, others a pixel at a time.
+    """
+
+    def __init__(self, x0, y0, x1, y1, colour=BLACK):
+        super().__init__(colour)
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+
+    def bounds(self):
+        return min(self.x0, self.x1), min(self.y0, self.y1), max(self.x0, self.x1) + 1, max(self.y0, self.y1) + 1
+
+    def draw(self, canvas, clip):
+        if self.x0 == self.x1 or self.y0 == self.y1:
+            canvas.fill_rect(*self.bounds(), colour=self.colour, clip=clip)
+            return
+        # Bresenham
+        x, y, x1, y1 = self.x0, self.y0, self.x1, self.y1
+        dx, dy = abs(x1 - x), -abs(y1 - y)
+        sx, sy = (1 if x < x1 else -1), (1 if y < y1 else -1)
+        error = dx + dy
+        while True:
+            if clip[0] <= x < clip[2] and clip[1] <= y < clip[3]:
+                canvas.set_pixel(x, y, self.colour)
+            if x == x1 and y == y1:
+                break
+            e2 = 2 * error
+            if e2 >= dy:
+                error += dy
+                x += sx
+            if e2 <= dx:
+                error += dx
+                y += sy
+
+
+class Sprite(Item):
+    """A 1 bit image: set bits are drawn in `colour`, the others are transparent.
+
+    :param int x: Left edge.
+    :param int y: Top edge.
+    :param rows: 2D uint8 array of packed rows, see :func:`pack_sprite`. Bits past `width` must be 0.
+    :param int width: Width in pixels, default: all bits of a row.
+    :param int colour: Colour, default: `inky.BLACK`.
+    """
+
+    def __init__(self, x, y, rows, width=None, colour=BLACK):
+        super().__init__(colour)
+        self.x, self.y = x, y
+        self.rows = rows
+        self.width = rows.shape[1] * 8 if width is None else width
+
+    def bounds(self):
+        return self.x, self.y, self.x + self.width, self.y + self.rows.shape[0]
+
+    def draw(self, canvas, clip):
+        canvas.blit(self.x, self.y, self.rows, self.colour, clip)
+
+
+class Text(Item):
+    """A line of text.
+
+    The font supplies ``line_height`` and ``glyph(char)``, which returns the glyph as
+    (packed rows, width, x offset, y offset, advance), offsets from the pen position at the
+    top left of the line, or `None` for characters it doesn't have, like :class:`FixedFont`
+    and :class:`inky_font.Font`. Glyphs with a width of 0 only advance the pen.
+
+    :param int x: Left edge.
+    :param int y: Top edge of the line.
+    :param str text: The text.
+    :param font: Font to draw with.
+    :param int colour: Colour, default: `inky.BLACK`.
+    """
+
+    def __init__(self, x, y, text, font, colour=BLACK):
+        super().__init__(colour)
+        self.x, self.y = x, y
+        self.text = text
+        self.font = font
+
+    def _glyphs(self):
+        """(x, y, rows, width) of every glyph to draw."""
+        pen = self.x
+        for char in self.text:
+            glyph = self.font.glyph(char)
+            if glyph is None:
+                continue
+            rows, width, dx, dy, advance = glyph
+            if width and rows.shape[0]:
+                yield pen + dx, self.y + dy, rows, width
+            pen += advance
+
+    def bounds(self):
+        x0, y0, x1, y1 = self.x, self.y, self.x, self.y + self.font.line_height
+        for x, y, rows, width in self._glyphs():
+            x0, y0 = min(x0, x), min(y0, y)
+            x1, y1 = max(x1, x + width), max(y1, y + rows.shape[0])
+        return x0, y0, x1, y1
+
+    def draw(self, canvas, clip):
+        for x, y, rows, width in self._glyphs():
+            if _intersect((x, y, x + width, y + rows.shape[0]), clip) is not None:
+                canvas.blit(x, y, rows, self.colour, clip)
+
+
+class FixedFont:
+    """A font of equally sized glyphs from a 1 bit glyph atlas.
+
+    The atlas holds the glyphs one below the other, `cell_height` rows each, in character order.
+
+    :param atlas: 2D uint8 array of packed rows, ``row_bytes(cell_width)`` bytes wide, see :func:`pack_sprite`.
+    :param int cell_width: Glyph width in pixels.
+    :param int cell_height: Glyph height in pixels.
+    :param int first: Character code of the first glyph, default: `32` (space).
+    """
+
+    def __init__(self, atlas, cell_width, cell_height, first=32):
+        self.atlas = atlas
+        self.cell_width = cell_width
+        self.line_height = cell_height
+        self.first = first
+        self.count = atlas.shape[0] // cell_height
+
+    def glyph(self, char):
+        index = ord(char) - self.first
+        if not 0 <= index < self.count:
+            return None
+        h = self.line_height
+        return self.atlas[index * h:(index + 1) * h, :], self.cell_width, 0, 0, self.cell_width
+
+
+class Canvas:
+    """Items drawn into the packed planes of a display.
+
+    :param display: :class:`inky.Inky` with a frame buffer and upright planes.
+    :param int background: Colour behind the items, default: `inky.WHITE`.
+    :raises ValueError: if the planes of the display are turned or mirrored.
+    """
+
+    def __init__(self, display, background=WHITE):
+        if not display.planes_upright:
+            raise ValueError('Canvas needs planes that hold the image upright, see Inky.planes_upright')
+        buf_a, buf_b = display.planes
+        self.display = display
+        self.width = display.width
+        self.height = display.height
+        self.background = background
+        self.items = []
+        self._planes = (inky_pack.plane_view(buf_a, self.width, self.height),
+                        inky_pack.plane_view(buf_b, self.width, self.height))
+        self._dirty = (0, 0, self.width, self.height)  # Draw everything the first time
+
+    def add(self, item):
+        """Add an item on top of the others.
+
+        :return: The item.
+        """
+        if item.canvas is not None:
+            raise ValueError('Item is already on a canvas')
+        item.canvas = self
+        self.items.append(item)
+        self.invalidate(item.bounds())
+        return item
+
+    def remove(self, item):
+        """Remove an item, what was below it shows again."""
+        self.items.remove(item)
+        item.canvas = None
+        self.invalidate(item.bounds())
+
+    def clear(self):
+        """Remove all items."""
+        for item in list(self.items):
+            self.remove(item)
+
+    def invalidate(self, bounds=None):
+        """Mark an area as changed, so the next :meth:`render` draws it again.
+
+        :param bounds: (x0, y0, x1, y1), default: the whole canvas.
+        """
+        area = (0, 0, self.width, self.height)
+        bounds = area if bounds is None else _intersect(bounds, area)
+        if bounds is None:
+            return
+        if self._dirty is not None:
+            bounds = (min(bounds[0], self._dirty[0]), min(bounds[1], self._dirty[1]),
+                      max(bounds[2], self._dirty[2]), max(bounds[3], self._dirty[3]))
+        self._dirty = bounds
+
+    @property
+    def dirty(self):
+        """Area that changed since the last :meth:`render` as (x0, y0, x1, y1), `None` if nothing changed."""
+        return self._dirty
+
+    def render(self):
+        """Draw the changed area into the planes.
+
+        The area is widened to whole bytes, filled with the background and every item
+        overlapping it is drawn again, clipped to it.
+
+        :return: The area drawn as (x, y, w, h), or `None` if nothing changed.
+        """
+        if self._dirty is None:
+            return None
+        x0, y0, x1, y1 = self._dirty
+        clip = (x0 & ~7, y0, min(self.width, (x1 + 7) & ~7), y1)
+        self._dirty = None
+        self.fill_rect(*clip, colour=self.background, clip=clip)
+        for item in self.items:
+            if item.visible and _intersect(item.bounds(), clip) is not None:
+                item.draw(self, clip)
+        return clip[0], clip[1], clip[2] - clip[0], clip[3] - clip[1]
+
+    def show(self, busy_wait=True, force=False):
+        """Draw what changed and send it to the display, see :meth:`inky.Inky.show_planes`.
+
+        :return: The changed rows as (first row, end row), or `None` if nothing changed.
+        """
+        region = self.render()
+        if region is None and not force:
+            return None
+        return self.display.show_planes(region, busy_wait, force)
+
+    def _paint(self, y0, y1, c0, c1, mask, colour):
+        """Set the pixels of `mask` in byte columns `c0` to `c1` of rows `y0` to `y1` to a colour.
+
+        :param mask: uint8 array of one row (used for all rows) or of every row.
+        """
+        for plane, bit in zip(self._planes, self.display.plane_map.bits(colour)):
+            area = plane[y0:y1, c0:c1]
+            if bit:
+                plane[y0:y1, c0:c1] = area | mask
+            else:
+                plane[y0:y1, c0:c1] = area & (255 - mask)
+
+    def fill_rect(self, x0, y0, x1, y1, colour, clip=None):
+        """Fill a rectangle, whole bytes at a time.
+
+        :param clip: Only fill inside this (x0, y0, x1, y1) rectangle, default: the whole canvas.
+        """
+        area = _intersect((x0, y0, x1, y1), clip or (0, 0, self.width, self.height))
+        if area is None:
+            return
+        x0, y0, x1, y1 = area
+        c0, c1 = x0 >> 3, inky_pack.row_bytes(x1)
+        mask = np.full(c1 - c0, 0xFF, dtype=np.uint8)
+        mask[0] = 0xFF >> (x0 & 7)
+        if x1 & 7:
+            mask[-1] = int(mask[-1]) & (0xFF << (8 - (x1 & 7))) & 0xFF
+        self._paint(y0, y1, c0, c1, mask, colour)
+
+    def set_pixel(self, x, y, colour):
+        """Set a single pixel, ignored outside the canvas."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        bit = 0x80 >> (x & 7)
+        c = x >> 3
+        for plane, value in zip(self._planes, self.display.plane_map.bits(colour)):
+            plane[y, c] = (plane[y, c] | bit) if value else (plane[y, c] & (0xFF ^ bit))
+
+    def blit(self, x, y, rows, colour, clip=None):
+        """Draw the set bits of packed 1 bit rows at any position, shifting them into place a row of bytes at a time.
+
+        :param rows: 2D uint8 array of packed rows, first pixel in the most significant bit.
+        :param clip: Only draw inside this (x0, y0, x1, y1) rectangle, whole bytes wide. Default: the whole canvas.
+        """
+        height, width = rows.shape
+        shift = x & 7
+        if shift:
+            # Spread each byte over two: the high bits stay, the low bits move to the next byte
+            wide = np.array(rows, dtype=np.uint16)
+            mask = np.zeros((height, width + 1), dtype=np.uint8)
+            mask[:, :width] = np.array(wide >> shift, dtype=np.uint8)
+            mask[:, 1:] = mask[:, 1:] | np.array((wide << (8 - shift)) & 0xFF, dtype=np.uint8)
+            width += 1
+        else:
+            mask = rows
+        c0 = x >> 3
+        clip = clip or (0, 0, self.width, self.height)
+        cols = _intersect((c0, y, c0 + width, y + height), (clip[0] >> 3, clip[1], inky_pack.row_bytes(clip[2]), clip[3]))
+        if cols is None:
+            return
+        a0, b0, a1, b1 = cols
+        self._paint(b0, b1, a0, a1, mask[b0 - y:b1 - y, a0 - c0:a1 - c0], colour)
@@ -0,0 +1,259 @@
+"""Colour quantization and dithering for Inky e-Ink displays.
+
+Maps truecolour or greyscale images to the display palette: `WHITE`, `BLACK`
+and, on red and yellow displays, `RED`/`YELLOW`. Images are processed in
+bands of rows with whole-row ``ulab`` operations, and the result is either a
+band of palette indices for :meth:`inky.Inky.show_stream` or packed planes.
+
+Sources can be anything :func:`channels` reads: a ``displayio.Bitmap`` with
+its palette as loaded by ``adafruit_imageload`` (paletted, or 16 bit RGB565
+with a ``ColorConverter``), a raw RGB565 buffer wrapped in :class:`RGB565`, a
+2D greyscale array or a tuple of red, green and blue 2D arrays.
+
+    bitmap, palette = adafruit_imageload.load("photo.bmp")
+    screen = inky.Inky(colour='red', framebuffer=False)
+    screen.show_stream(inky_dither.bands(bitmap, 'red', palette=palette))
+"""
+
+import inky_pack
+from inky_pack import np, WHITE, BLACK, RED
+
+_FLOAT = getattr(np, 'float', None) or np.float64  # numpy dropped np.float, ulab only has np.float
+
+# Colour of each display pigment as (red, green, blue)
+_COLOURS = {
+    'black': ((WHITE, (255, 255, 255)), (BLACK, (0, 0, 0))),
+    'red': ((WHITE, (255, 255, 255)), (BLACK, (0, 0, 0)), (RED, (255, 0, 0))),
+    'yellow': ((WHITE, (255, 255, 255)), (BLACK, (0, 0, 0)), (RED, (255, 255, 0))),
+}
+
+# 4x4 Bayer matrix, thresholds are (value + 0.5) * 16
+_BAYER = (
+    (0, 8, 2, 10),
+    (12, 4, 14, 6),
+    (3, 11, 1, 9),
+    (15, 7, 13, 5),
+)
+
+METHODS = ('threshold', 'ordered', 'diffusion')
+
+
+class RGB565:
+    """A raw buffer of 16 bit RGB565 pixels, row after row.
+
+    :param buffer: Buffer of ``width * height`` 16 bit values.
+    :param int width: Width in pixels.
+    :param int height: Height in pixels.
+    :param bool swap: True if the pixels are big endian, as most displays and cameras send them. Default: `False`.
+    """
+
+    def __init__(self, buffer, width, height, swap=False):
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.swap = swap
+
+    def rows(self, y0, y1):
+        """Rows `y0` up to `y1` as a 2D uint16 array."""
+        values = np.frombuffer(self.buffer, dtype=np.uint16, count=(y1 - y0) * self.width, offset=y0 * self.width * 2)
+        values = values.reshape((y1 - y0, self.width))
+        if self.swap:
+            values = (values >> 8) | (values << 8)
+        return values
+
+
+def _split565(values):
+    """Red, green and blue uint8 arrays, 0 to 255, from RGB565 values."""
+    red = (values >> 8) & 0xF8
+    green = (values >> 3) & 0xFC
+    blue = (values << 3) & 0xF8
+    # Repeat the top bits in the low bits, so full intensity is 255
+    return (np.array(red | (red >> 5), dtype=np.uint8),
+            np.array(green | (green >> 6), dtype=np.uint8),
+            np.array(blue | (blue >> 5), dtype=np.uint8))
+
+
+def _bitmap565(image, y0, y1):
+    """Rows of a 16 bit ``displayio.Bitmap`` as uint16 values."""
+    # One 16 bit value per pixel, rows padded to 32 bits
+    stride = inky_pack.bitmap_stride(image, 16)
+    values = np.frombuffer(image, dtype=np.uint16, count=(y1 - y0) * stride // 2, offset=y0 * stride)
+    return values.reshape((y1 - y0, stride // 2))[:, :image.width]
+
+
+def channels(image, palette=None, y0=0, y1=None):
+    """Read rows of an image as red, green and blue.
+
+    :param image: ``displayio.Bitmap``, :class:`RGB565`, 2D greyscale uint8 array or a tuple of
+        red, green and blue 2D uint8 arrays.
+    :param palette: Colours of a paletted ``displayio.Bitmap``, a ``displayio.Palette`` or a list of
+        0xRRGGBB values. Not needed for 16 bit bitmaps, which hold RGB565 values.
+    :param int y0: First row.
+    :param int y1: End row (exclusive), default: image height.
+    :return: tuple of (red, green, blue) 2D uint8 arrays.
+    """
+    if isinstance(image, (tuple, list)):
+        width, height = inky_pack.size(image[0])
+        y1 = height if y1 is None else y1
+        return tuple(np.array(channel[y0:y1, :], dtype=np.uint8) for channel in image)
+
+    width, height = inky_pack.size(image)
+    y1 = height if y1 is None else y1
+    if hasattr(image, 'shape'):
+        grey = np.array(image[y0:y1, :], dtype=np.uint8)
+        return grey, grey, grey
+    if isinstance(image, RGB565):
+        return _split565(image.rows(y0, y1))
+    if inky_pack.bits_per_value(image) == 16:
+        return _split565(_bitmap565(image, y0, y1))
+    if palette is None:
+        raise ValueError('A palette is needed for bitmaps of {} bits per value'.format(inky_pack.bits_per_value(image)))
+
+    indices = inky_pack.pixels(image, y0, y1)[:, :width]
+    red = np.zeros((y1 - y0, width), dtype=np.uint16)
+    green = np.zeros((y1 - y0, width), dtype=np.uint16)
+    blue = np.zeros((y1 - y0, width), dtype=np.uint16)
+    for index in range(len(palette)):
+        colour = palette[index]
+        mask = np.array(indices == index, dtype=np.uint16)
+        red = red + mask * ((colour >> 16) & 0xFF)
+        green = green + mask * ((colour >> 8) & 0xFF)
+        blue = blue + mask * (colour & 0xFF)
+    return np.array(red, dtype=np.uint8), np.array(green, dtype=np.uint8), np.array(blue, dtype=np.uint8)
+
+
+class Quantizer:
+    """Maps colours to the palette of a display, band by band.
+
+    * ``threshold``: nearest pigment, no dithering
+    * ``ordered``: 4x4 Bayer dithering, fast and stable between frames
+    * ``diffusion``: error diffusion, smoother gradients. The error of each row is spread over the
+      next row only, so every row is still processed as a whole
+
+    :param str colour: One of 'red', 'black' or 'yellow', the colour of the display.
+    :param str method: One of 'threshold', 'ordered' or 'diffusion', default: 'ordered'.
+    """
+
+    def __init__(self, colour='red', method='ordered'):
+        if colour not in _COLOURS:
+            raise ValueError('Colour {} is not supported!'.format(colour))
+        if method not in METHODS:
+            raise ValueError('Dithering method {} is not supported!'.format(method))
+        self.colour = colour
+        self.method = method
+        self._error = None
+
+    def reset(self):
+        """Start a new image, forget the error carried over from the previous band."""
+        self._error = None
+
+    def quantize(self, red, green, blue, y0=0):
+        """Map a band of pixels to display colours.
+
+        Bands of one image must be passed from top to bottom.
+
+        :param red: 2D uint8 array of red values.
+        :param green: 2D uint8 array of green values.
+        :param blue: 2D uint8 array of blue values.
+        :param int y0: Image row of the first row of the band, aligns the dither pattern.
+        :return: 2D uint8 array of `WHITE`, `BLACK` and `RED`/`YELLOW`.
+        """
+        if self.method == 'diffusion':
+            return self._diffuse(red, green, blue)
+        rows, width = red.shape
+        if self.method == 'ordered':
+            threshold = np.zeros((rows, width), dtype=np.int16)
+            for j in range(4):
+                first = (j - y0) % 4
+                for k in range(4):
+                    threshold[first::4, k::4] = _BAYER[j][k] * 16 + 8
+        else:
+            threshold = np.full((rows, width), 128, dtype=np.int16)
+
+        luma = (np.array(red, dtype=np.uint16) * 77 + np.array(green, dtype=np.uint16) * 150
+                + np.array(blue, dtype=np.uint16) * 29) >> 8
+        black = np.array(np.array(luma, dtype=np.int16) < threshold, dtype=np.uint8)
+        if self.colour == 'black':
+            return black
+
+        # How far a pixel is from grey towards the display's colour
+        if self.colour == 'red':
+            chroma = np.array(red, dtype=np.int16) - np.array(np.maximum(green, blue), dtype=np.int16)
+        else:
+            chroma = np.array(np.minimum(red, green), dtype=np.int16) - np.array(blue, dtype=np.int16)
+        colour = np.array(chroma > threshold, dtype=np.uint8)
+        return black + colour * (RED - black)
+
+    def _diffuse(self, red, green, blue):
+        rows, width = red.shape
+        pigments = _COLOURS[self.colour]
+        if self._error is None or len(self._error[0]) != width:
+            self._error = [np.zeros(width) for _ in range(3)]
+        out = np.zeros((rows, width), dtype=np.uint8)
+        for y in range(rows):
+            row = [np.array(channel[y, :], dtype=_FLOAT) + error
+                   for channel, error in zip((red, green, blue), self._error)]
+            best = None
+            chosen = [np.zeros(width), np.zeros(width), np.zeros(width)]
+            for value, rgb in pigments:
+                distance = (row[0] - rgb[0]) ** 2 + (row[1] - rgb[1]) ** 2 + (row[2] - rgb[2]) ** 2
+                if best is None:
+                    closer = np.ones(width)
+                    best = distance
+                else:
+                    closer = np.array(distance < best, dtype=_FLOAT)
+                    best = np.minimum(best, distance)
+                out[y, :] = np.array(out[y, :] * (1 - closer) + value * closer, dtype=np.uint8)
+                for c in range(3):
+                    chosen[c] = chosen[c] * (1 - closer) + rgb[c] * closer
+            for c in range(3):
+                # Half of the error goes straight down, a quarter down to either side
+                error = row[c] - chosen[c]
+                spread = error * 0.5
+                spread[1:] += error[:-1] * 0.25
+                spread[:-1] += error[1:] * 0.25
+                self._error[c] = spread
+        return out
+
+
+def bands(image, colour='red', method='ordered', palette=None, band_rows=8):
+    """Quantize an image band by band, for :meth:`inky.Inky.show_stream`.
+
+    :param image: Any image :func:`channels` reads.
+    :param str colour: One of 'red', 'black' or 'yellow', the colour of the display.
+    :param str method: One of 'threshold', 'ordered' or 'diffusion', default: 'ordered'.
+    :param palette: Palette of a paletted bitmap, see :func:`channels`.
+    :param int band_rows: Rows per band, default: `8`.
+    :return: generator of 2D uint8 arrays of display colours.
+    """
+    quantizer = Quantizer(colour, method)
+    width, height = inky_pack.size(image[0] if isinstance(image, (tuple, list)) else image)
+    for y0 in range(0, height, band_rows):
+        y1 = min(y0 + band_rows, height)
+        yield quantizer.quantize(*channels(image, palette, y0, y1), y0=y0)
+
+
+def pack(image, colour='red', method='ordered', palette=None, black=None, colour_plane=None, band_rows=8):
+    """Quantize an image straight into packed black/white and red/yellow planes.
+
+    :param image: Any image :func:`channels` reads.
+    :param str colour: One of 'red', 'black' or 'yellow', the colour of the display.
+    :param str method: One of 'threshold', 'ordered' or 'diffusion', default: 'ordered'.
+    :param palette: Palette of a paletted bitmap, see :func:`channels`.
+    :param black: Optional 2D uint8 array to receive the black/white plane.
+    :param colour_plane: Optional 2D uint8 array to receive the red/yellow plane.
+    :param int band_rows: Rows quantized at a time, default: `8`.
+    :return: tuple of (black, colour) arrays, see :func:`inky_pack.pack_planes`.
+    """
+    width, height = inky_pack.size(image[0] if isinstance(image, (tuple, list)) else image)
+    shape = (height, inky_pack.row_bytes(width))
+    if black is None:
+        black = np.zeros(shape, dtype=np.uint8)
+    if colour_plane is None:
+        colour_plane = np.zeros(shape, dtype=np.uint8)
+    y0 = 0
+    for band in bands(image, colour, method, palette, band_rows):
+        y1 = y0 + band.shape[0]
+        inky_pack.pack_planes(band, black[y0:y1, :], colour_plane[y0:y1, :])
+        y0 = y1
+    return black, colour_plane
@@ -1,8 +1,25 @@
-import board
+"""Display type EEPROM of Inky boards.
+
+The EEPROM is only read when :func:`detect` is first called and the result
+is kept for later calls. It can also be kept between boots in a file on the
+CIRCUITPY drive or in ``microcontroller.nvm``, so a board only talks I2C the
+first time it starts with a display attached:
+
+    epd_type = inky_eeprom.detect(cache=0)  # offset into microcontroller.nvm
+    epd_type = inky_eeprom.detect(cache='/inky_eeprom.bin')
+
+Boards without the I2C pins wired can pass a known :class:`EPDType` to
+:class:`inky.Inky` instead.
+"""
+
 import struct
 
-import adafruit_24lc32
-eeprom = adafruit_24lc32.EEPROM_I2C(board.I2C())
+_FORMAT = '<HHBBB22s'
+_LENGTH = 29  # struct.calcsize(_FORMAT)
+_MAGIC = b'INKY'  # Marks a cached copy in microcontroller.nvm
+
+_detected = None
+_NO_EEPROM = object()  # Remembered when detect() found nothing, so I2C isn't probed again
 
 DISPLAY_VARIANT = [
     None,
@@ -28,6 +45,28 @@ DISPLAY_VARIANT = [
     '7-Colour 800x480 (AC073TC1A)'
 ]
 
+# Display controller, resolution and colour of each display variant
+VARIANTS = {
+    1: ('ssd1619a', (212, 104), 'red'),
+    2: ('ssd1619a', (400, 300), 'yellow'),
+    3: ('ssd1619a', (400, 300), 'black'),
+    4: ('ssd1619a', (212, 104), 'black'),
+    5: ('ssd1619a', (212, 104), 'yellow'),
+    6: ('ssd1619a', (400, 300), 'red'),
+    7: ('ssd1619a', (400, 300), 'red'),
+    8: ('ssd1619a', (400, 300), 'red'),
+    10: ('ssd1608', (250, 122), 'black'),
+    11: ('ssd1608', (250, 122), 'red'),
+    12: ('ssd1608', (250, 122), 'yellow'),
+    14: ('uc8159', (600, 448), '7colour'),
+    15: ('uc8159', (640, 400), '7colour'),
+    16: ('uc8159', (640, 400), '7colour'),
+    17: ('ssd1683', (400, 300), 'black'),
+    18: ('ssd1683', (400, 300), 'red'),
+    19: ('ssd1683', (400, 300), 'yellow'),
+    20: ('ac073tc1a', (800, 480), '7colour'),
+}
+
 class EPDType:
     """Class to represent EPD EEPROM structure."""
 
@@ -58,17 +97,31 @@ Time: {}""".format(self.width,
                    self.eeprom_write_time)
 
     @classmethod
-    def from_eeprom(class_object):
-        """Load epd type from eeprom"""
-        return EPDType.from_bytes(eeprom[0:29])
+    def from_eeprom(class_object, i2c=None):
+        """Load epd type from eeprom
+        :param i2c: I2C bus, default: `board.I2C()`.
+        """
+        import adafruit_24lc32  # Only needed when the EEPROM is read
+        if i2c is None:
+            import board
+            i2c = board.I2C()
+        eeprom = adafruit_24lc32.EEPROM_I2C(i2c)
+        return class_object.from_bytes(eeprom[0:_LENGTH])
 
     @classmethod
     def from_bytes(class_object, data):
         """Initialise new EEPROM data structure from a bytes-like object or list."""
         data = bytearray(data)
-        data = struct.unpack('<HHBBB22s', data)
+        data = struct.unpack(_FORMAT, data)
         return class_object(*data)
 
+    def to_bytes(self):
+        """The EEPROM data structure as `bytes`, see :meth:`from_bytes`."""
+        write_time = self.eeprom_write_time
+        if isinstance(write_time, str):
+            write_time = write_time.encode()
+        return struct.pack(_FORMAT, self.width, self.height, self.color, self.pcb_variant, self.display_variant, write_time)
+
     def get_color(self):
         """Get the stored colour value."""
         try:
@@ -76,9 +129,72 @@ Time: {}""".format(self.width,
         except IndexError:
             return None
 
+    def get_lut(self):
+        """Return the name of the waveform for the display, the red high temperature panels need 'red_ht'."""
+        color = self.get_color()
+        if self.display_variant in (1, 6) and color == 'red':
+            return 'red_ht'
+        return color
+
     def get_variant(self):
         """Return text name of the display variant."""
         try:
             return DISPLAY_VARIANT[self.display_variant]
         except IndexError:
             return None
+
+
+def _read_cache(cache):
+    try:
+        if isinstance(cache, str):
+            with open(cache, 'rb') as f:
+                data = f.read()
+            return EPDType.from_bytes(data) if len(data) == _LENGTH else None
+        import microcontroller
+        data = microcontroller.nvm[cache:cache + len(_MAGIC) + _LENGTH]
+        if data[:len(_MAGIC)] != _MAGIC:
+            return None
+        return EPDType.from_bytes(data[len(_MAGIC):])
+    except (OSError, ImportError, TypeError, IndexError):
+        return None
+
+
+def _write_cache(cache, epd_type):
+    data = epd_type.to_bytes()
+    try:
+        if isinstance(cache, str):
+            with open(cache, 'wb') as f:
+                f.write(data)
+        else:
+            import microcontroller
+            microcontroller.nvm[cache:cache + len(_MAGIC) + _LENGTH] = _MAGIC + data
+    except (OSError, ImportError, TypeError, IndexError):
+        pass  # CIRCUITPY is read-only unless boot.py remounts it, detection still works
+
+
+def detect(i2c=None, cache=None, refresh=False):
+    """Find out which display is attached, reading the EEPROM only once.
+
+    :param i2c: I2C bus, default: `board.I2C()`.
+    :param cache: Where to keep the result between boots: a file path, an offset into
+        ``microcontroller.nvm`` (33 bytes are used) or `None` to not keep it. Default: `None`.
+    :param bool refresh: Read the EEPROM again, for example after swapping displays. Default: `False`.
+    :return: :class:`EPDType`, or `None` if there is no EEPROM on the I2C bus. A missing EEPROM is
+        remembered as well, until the next boot or `refresh`, but isn't kept in `cache`.
+    """
+    global _detected
+    if _detected is not None and not refresh:
+        return None if _detected is _NO_EEPROM else _detected
+    epd_type = None
+    if cache is not None and not refresh:
+        epd_type = _read_cache(cache)
+    if epd_type is None:
+        try:
+            epd_type = EPDType.from_eeprom(i2c)
+        except (RuntimeError, ValueError, OSError, ImportError):
+            _detected = _NO_EEPROM  # No pull-ups, nothing at the EEPROM address or no I2C at all
+            return None
+        if cache is not None:
+            _write_cache(cache, epd_type)
+    _detected = epd_type
+    return epd_type
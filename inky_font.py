@@ -0,0 +1,364 @@
+"""Pre-packed bitmap fonts for text on a :class:`inky_canvas.Canvas`.
+
+BDF and PCF fonts are converted once into a glyph atlas: every glyph is stored
+as packed, byte aligned 1 bit rows, the same format as the display planes, so
+drawing text is reading a few bytes and shifting them into the planes with
+:meth:`inky_canvas.Canvas.blit`. Nothing is parsed or unpacked on the board.
+
+Convert fonts on a computer (it runs on a board too, but needs the whole font
+in memory), keeping only the characters a screen needs:
+
+    python inky_font.py ter-u16b.bdf /Volumes/CIRCUITPY/fonts/ter16.glyphs --chars " -~"
+
+and draw with them:
+
+    font = inky_font.Font('/fonts/ter16.glyphs')
+    canvas.add(inky_canvas.Text(10, 10, 'Price: 3.50', font))
+
+:class:`Font` keeps the glyph index in memory (15 bytes per glyph) and the
+most recently used glyphs in a small cache, everything else stays on flash.
+"""
+
+import struct
+
+from inky_pack import np
+
+MAGIC = b'INKG'
+_VERSION = 1
+# magic, version, glyph count, ascent, descent
+_HEADER = '<4sBHhh'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+# character code, offset of the rows from the first glyph, width, height, x offset, y offset from the top of the line, advance
+_ENTRY = '<IIBBbbB'
+_ENTRY_SIZE = struct.calcsize(_ENTRY)
+
+_PCF_MAGIC = b'\x01fcp'
+_PCF_ACCELERATORS = 1 << 1
+_PCF_METRICS = 1 << 2
+_PCF_BITMAPS = 1 << 3
+_PCF_BDF_ENCODINGS = 1 << 5
+_PCF_BDF_ACCELERATORS = 1 << 8
+_PCF_BYTE_MSB = 1 << 2
+_PCF_BIT_MSB = 1 << 3
+_PCF_COMPRESSED_METRICS = 0x100
+
+
+def _row_bytes(width):
+    return (width + 7) >> 3
+
+
+def _trim(width, height, dy, rows):
+    """Drop blank rows above and below a glyph, they would only be blitted for nothing."""
+    stride = _row_bytes(width)
+    top, bottom = 0, height
+    while top < bottom and not any(rows[top * stride:(top + 1) * stride]):
+        top += 1
+    while bottom > top and not any(rows[(bottom - 1) * stride:bottom * stride]):
+        bottom -= 1
+    if top == bottom:
+        return 0, 0, 0, b''
+    return width, bottom - top, dy + top, bytes(rows[top * stride:bottom * stride])
+
+
+def load_bdf(stream):
+    """Read the glyphs of a BDF font.
+
+    :param stream: BDF file opened in text mode.
+    :return: tuple of (ascent, descent, glyphs), see :func:`write_atlas` for `glyphs`.
+    """
+    ascent = descent = None
+    box = (0, 0, 0, 0)
+    raw = []
+    glyph = None
+    bitmap = None
+    for line in stream:
+        words = line.split()
+        if not words:
+            continue
+        key = words[0]
+        if bitmap is not None:
+            if key == 'ENDCHAR':
+                glyph.append(bitmap)
+                raw.append(glyph)
+                bitmap = None
+            else:
+                bitmap.append(words[0])
+        elif key == 'FONT_ASCENT':
+            ascent = int(words[1])
+        elif key == 'FONT_DESCENT':
+            descent = int(words[1])
+        elif key == 'FONTBOUNDINGBOX':
+            box = tuple(int(word) for word in words[1:5])
+        elif key == 'STARTCHAR':
+            glyph = [-1, 0, box]
+        elif key == 'ENCODING':
+            glyph[0] = int(words[1])
+        elif key == 'DWIDTH':
+            glyph[1] = int(words[1])
+        elif key == 'BBX':
+            glyph[2] = tuple(int(word) for word in words[1:5])
+        elif key == 'BITMAP':
+            bitmap = []
+
+    if ascent is None:
+        ascent = box[1] + box[3]
+    if descent is None:
+        descent = -box[3]
+    glyphs = {}
+    for code, advance, (width, height, x_offset, y_offset), lines in raw:
+        if code < 0:
+            continue  # Not encoded
+        stride = _row_bytes(width)
+        rows = bytearray(stride * height)
+        for y, line in enumerate(lines[:height]):
+            data = bytes.fromhex(line)[:stride]
+            rows[y * stride:y * stride + len(data)] = data
+        glyphs[code] = (advance, x_offset) + _trim(width, height, ascent - height - y_offset, rows)
+    return ascent, descent, glyphs
+
+
+def _reverse_bits(value):
+    value = ((value & 0xF0) >> 4) | ((value & 0x0F) << 4)
+    value = ((value & 0xCC) >> 2) | ((value & 0x33) << 2)
+    return ((value & 0xAA) >> 1) | ((value & 0x55) << 1)
+
+
+def load_pcf(data):
+    """Read the glyphs of a PCF font.
+
+    :param data: Contents of the PCF file (not gzip compressed).
+    :return: tuple of (ascent, descent, glyphs), see :func:`write_atlas` for `glyphs`.
+    :raises ValueError: if the data isn't a PCF font or tables are missing.
+    """
+    if data[:4] != _PCF_MAGIC:
+        raise ValueError('Not a PCF font')
+    tables = {}
+    count, = struct.unpack_from('<i', data, 4)
+    for i in range(count):
+        kind, _, _, offset = struct.unpack_from('<iiii', data, 8 + 16 * i)
+        tables[kind] = offset
+
+    def table(kind):
+        if kind not in tables:
+            raise ValueError('PCF font has no table {}'.format(kind))
+        offset = tables[kind]
+        fmt, = struct.unpack_from('<i', data, offset)
+        return fmt, offset + 4, '>' if fmt & _PCF_BYTE_MSB else '<'
+
+    fmt, offset, order = table(_PCF_BDF_ACCELERATORS if _PCF_BDF_ACCELERATORS in tables else _PCF_ACCELERATORS)
+    ascent, descent = struct.unpack_from(order + 'ii', data, offset + 8)
+
+    fmt, offset, order = table(_PCF_METRICS)
+    metrics = []
+    if fmt & _PCF_COMPRESSED_METRICS:
+        count, = struct.unpack_from(order + 'h', data, offset)
+        for i in range(count):
+            metrics.append(tuple(value - 0x80 for value in data[offset + 2 + 5 * i:offset + 7 + 5 * i]))
+    else:
+        count, = struct.unpack_from(order + 'i', data, offset)
+        for i in range(count):
+            metrics.append(struct.unpack_from(order + 'hhhhh', data, offset + 4 + 12 * i))
+
+    fmt, offset, order = table(_PCF_BITMAPS)
+    count, = struct.unpack_from(order + 'i', data, offset)
+    offsets = struct.unpack_from(order + '{}i'.format(count), data, offset + 4)
+    bitmaps = offset + 4 + 4 * count + 16
+    pad = 1 << (fmt & 3)
+    unit = 1 << ((fmt >> 4) & 3)
+    swap = unit > 1 and bool(fmt & _PCF_BYTE_MSB) != bool(fmt & _PCF_BIT_MSB)
+    invert = not fmt & _PCF_BIT_MSB
+
+    fmt, offset, order = table(_PCF_BDF_ENCODINGS)
+    first_col, last_col, first_row, last_row, _ = struct.unpack_from(order + 'hhhhh', data, offset)
+    cols = last_col - first_col + 1
+    count = cols * (last_row - first_row + 1)
+    indices = struct.unpack_from(order + '{}H'.format(count), data, offset + 10)
+
+    glyphs = {}
+    for i, index in enumerate(indices):
+        if index == 0xFFFF:
+            continue  # No glyph for this code
+        code = ((first_row + i // cols) << 8) | (first_col + i % cols)
+        left, right, advance, glyph_ascent, glyph_descent = metrics[index][:5]
+        width, height = right - left, glyph_ascent + glyph_descent
+        stride = _row_bytes(width)
+        padded = (stride + pad - 1) // pad * pad
+        start = bitmaps + offsets[index]
+        rows = bytearray(stride * height)
+        for y in range(height):
+            line = bytearray(data[start + y * padded:start + (y + 1) * padded])
+            if swap:
+                for k in range(0, padded, unit):
+                    line[k:k + unit] = line[k:k + unit][::-1]
+            if invert:
+                line = bytearray(_reverse_bits(value) for value in line)
+            rows[y * stride:(y + 1) * stride] = line[:stride]
+        glyphs[code] = (advance, left) + _trim(width, height, ascent - glyph_ascent, rows)
+    return ascent, descent, glyphs
+
+
+def write_atlas(stream, ascent, descent, glyphs):
+    """Write a glyph atlas.
+
+    :param stream: File opened for binary writing.
+    :param int ascent: Pixels from the top of the line to the baseline.
+    :param int descent: Pixels below the baseline.
+    :param dict glyphs: (advance, x offset, width, height, y offset from the top of the line, packed rows) by character code.
+    :raises ValueError: if a glyph is too large for the atlas.
+    """
+    index = bytearray()
+    rows = bytearray()
+    for code in sorted(glyphs):
+        advance, dx, width, height, dy, data = glyphs[code]
+        try:
+            index.extend(struct.pack(_ENTRY, code, len(rows), width, height, dx, dy, advance))
+        except (struct.error, OverflowError):
+            raise ValueError('Glyph {} is too large for the atlas'.format(code))
+        rows.extend(data)
+    stream.write(struct.pack(_HEADER, MAGIC, _VERSION, len(glyphs), ascent, descent))
+    stream.write(index)
+    stream.write(rows)
+
+
+def convert(source, dest, chars=None):
+    """Convert a BDF or PCF font into a glyph atlas for :class:`Font`.
+
+    :param str source: Path of the BDF or PCF font.
+    :param str dest: Path of the glyph atlas to write.
+    :param chars: Characters to keep, default: all glyphs of the font.
+    :return: Number of glyphs written.
+    """
+    with open(source, 'rb') as f:
+        data = f.read()
+    if data[:4] == _PCF_MAGIC:
+        ascent, descent, glyphs = load_pcf(data)
+    else:
+        ascent, descent, glyphs = load_bdf(data.decode('latin-1').splitlines())
+    if chars is not None:
+        codes = set(ord(char) for char in chars)
+        glyphs = {code: glyph for code, glyph in glyphs.items() if code in codes}
+    with open(dest, 'wb') as f:
+        write_atlas(f, ascent, descent, glyphs)
+    return len(glyphs)
+
+
+class Font:
+    """A glyph atlas written by :func:`convert`, for :class:`inky_canvas.Text`.
+
+    The atlas stays open, close the font (or use it as a context manager) when it isn't needed anymore.
+
+    :param str path: Path of the glyph atlas.
+    :param int cache_size: Number of glyphs kept in memory, the least recently used go first. Characters
+        the font doesn't have are cached too. Default: `96`.
+    :raises ValueError: if the file isn't a glyph atlas.
+    """
+
+    def __init__(self, path, cache_size=96):
+        self._file = open(path, 'rb')
+        header = bytearray(_HEADER_SIZE)
+        self._file.readinto(header)
+        magic, version, count, self.ascent, self.descent = struct.unpack(_HEADER, header)
+        if magic != MAGIC or version != _VERSION:
+            self._file.close()
+            raise ValueError('{} is not a glyph atlas'.format(path))
+        self.line_height = self.ascent + self.descent
+        self._index = bytearray(count * _ENTRY_SIZE)
+        self._file.readinto(self._index)
+        self._count = count
+        self._rows = _HEADER_SIZE + len(self._index)
+        self.cache_size = cache_size
+        self._cache = {}
+        self._order = []  # Least recently used first
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._file.close()
+
+    def _find(self, code):
+        """Index entry of a character code, `None` if the font doesn't have it."""
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) >> 1
+            entry = struct.unpack_from(_ENTRY, self._index, mid * _ENTRY_SIZE)
+            if entry[0] == code:
+                return entry
+            if entry[0] < code:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def glyph(self, char):
+        """A glyph as (packed rows, width, x offset, y offset, advance), see :class:`inky_canvas.Text`.
+
+        Glyphs without ink (spaces) have a width of 0 and no rows.
+
+        :return: The glyph, or `None` if the font doesn't have it.
+        """
+        glyph = self._cache.get(char)
+        if glyph is not None:
+            self._order.remove(char)
+            self._order.append(char)
+            return glyph or None  # False for characters the font doesn't have
+        entry = self._find(ord(char))
+        if entry is None:
+            glyph = False
+        else:
+            _, offset, width, height, dx, dy, advance = entry
+            rows = None
+            if width and height:
+                data = bytearray(_row_bytes(width) * height)
+                self._file.seek(self._rows + offset)
+                self._file.readinto(data)
+                rows = np.frombuffer(data, dtype=np.uint8).reshape((height, _row_bytes(width)))
+            glyph = (rows, width, dx, dy, advance)
+        if len(self._order) >= self.cache_size:
+            del self._cache[self._order.pop(0)]
+        self._cache[char] = glyph
+        self._order.append(char)
+        return glyph or None
+
+    def text_width(self, text):
+        """Advance of a line of text in pixels."""
+        width = 0
+        for char in text:
+            glyph = self.glyph(char)
+            if glyph is not None:
+                width += glyph[4]
+        return width
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert a BDF or PCF font into a glyph atlas for inky_font.Font')
+    parser.add_argument('source', help='BDF or PCF font')
+    parser.add_argument('dest', help='glyph atlas to write')
+    parser.add_argument('--chars', help='characters to keep, "a-z" includes the range. Default: all glyphs')
+    args = parser.parse_args()
+
+    chars = None
+    if args.chars is not None:
+        chars = set()
+        spec = args.chars
+        i = 0
+        while i < len(spec):
+            if i + 2 < len(spec) and spec[i + 1] == '-':
+                chars.update(chr(code) for code in range(ord(spec[i]), ord(spec[i + 2]) + 1))
+                i += 3
+            else:
+                chars.add(spec[i])
+                i += 1
+    print('{} glyphs written'.format(convert(args.source, args.dest, chars)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""Host computer backend for Inky e-Ink displays.
+
+Runs :class:`inky.Inky` on a regular computer (CPython with numpy) without a
+board or display. :class:`HostTransport` records every command and data byte
+the driver sends, emulates BUSY timing and keeps its own copy of the
+controller's black/white and red/yellow RAM, so the resulting image can be
+compared with a known good one.
+
+    import inky, inky_host
+
+    transport = inky_host.HostTransport(400, 300)
+    screen = inky.Inky(colour='red', transport=transport)
+    screen.set_pixel(10, 10, inky.BLACK)
+    screen.show()
+    image = transport.image()
+"""
+
+import struct
+import time
+
+WHITE = 0
+BLACK = 1
+RED = YELLOW = 2
+
+# Step sizes of the auto write commands (0x46/0x47), in rows and pixels. The two largest
+# steps cover all gates (rows) or sources (pixels) of the emulated display.
+_FILL_STEPS = (8, 16, 32, 64, 128, 256)
+
+
+class Bitmap(bytearray):
+    """Stand-in for :class:`displayio.Bitmap` on a host computer.
+
+    Pixels are stored like CircuitPython does, so the buffer can be read by
+    :mod:`inky_pack` exactly like on a board: below 8 bits per value packed in
+    little endian 32 bit words with the first pixel in the most significant
+    bits, otherwise one byte, 16 or 32 bit value per pixel. Rows are 32 bit aligned.
+    """
+
+    _FORMATS = {8: '<B', 16: '<H', 32: '<I'}
+
+    def __init__(self, width, height, value_count):
+        bits = 1
+        while (1 << bits) < value_count:
+            bits *= 2
+        self.width = width
+        self.height = height
+        self.bits_per_value = bits
+        self._words = (width * bits + 31) // 32
+        super().__init__(self._words * 4 * height)
+
+    def _locate(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError('pixel out of bounds')
+        bits = self.bits_per_value
+        if bits >= 8:
+            return (y * self._words * 4 + x * (bits >> 3)), 0
+        offset = (y * self._words + (x * bits) // 32) * 4
+        return offset, 32 - ((x % (32 // bits)) + 1) * bits
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            return super().__getitem__(index)
+        offset, shift = self._locate(*index)
+        if self.bits_per_value >= 8:
+            return struct.unpack_from(self._FORMATS[self.bits_per_value], self, offset)[0]
+        word = struct.unpack_from('<I', self, offset)[0]
+        return (word >> shift) & ((1 << self.bits_per_value) - 1)
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, tuple):
+            return super().__setitem__(index, value)
+        offset, shift = self._locate(*index)
+        if self.bits_per_value >= 8:
+            return struct.pack_into(self._FORMATS[self.bits_per_value], self, offset, value)
+        mask = ((1 << self.bits_per_value) - 1) << shift
+        word = struct.unpack_from('<I', self, offset)[0]
+        struct.pack_into('<I', self, offset, (word & ~mask) | ((value << shift) & mask))
+
+    def fill(self, value):
+        """Set every pixel to `value`."""
+        for y in range(self.height):
+            for x in range(self.width):
+                self[x, y] = value
+
+
+class HostTransport:
+    """Transport that records commands and emulates an SSD1619A's RAM.
+
+    :param int width: Display width in pixels.
+    :param int height: Display height in pixels.
+    :param float refresh_time: Seconds BUSY stays high after a display update (0x20), default: `0`.
+    :param float reset_time: Seconds BUSY stays high after a soft reset (0x12), default: `0`.
+    :param float temperature: Degrees C the emulated temperature sensor reads, default: `20`.
+    """
+
+    def __init__(self, width=400, height=300, refresh_time=0.0, reset_time=0.0, temperature=20.0):
+        self.width = width
+        self.height = height
+        self.refresh_time = refresh_time
+        self.reset_time = reset_time
+        self.temperature = temperature
+        self.stride = (width + 7) >> 3
+        self.bw_ram = bytearray(self.stride * height)
+        self.colour_ram = bytearray(self.stride * height)
+        self.log = []  # [command, bytearray of data] in the order they were sent
+        self.resets = 0
+        self.refreshes = 0
+        self.asleep = False
+        self.selects = 0  # Chip select cycles, one per write or per `with transport:` block
+        self._depth = 0
+        self._busy_until = 0.0
+        self._window = [0, self.stride - 1, 0, height - 1]
+        self._entry_mode = 0x03
+        self._update_control = 0xff
+        self._x = 0
+        self._y = 0
+        self._fill_heights = _FILL_STEPS + (height, height)
+        self._fill_widths = _FILL_STEPS + (self.stride << 3, self.stride << 3)  # Whole bytes of RAM
+
+    def setup(self):
+        """Nothing to set up on a host."""
+
+    def reset(self):
+        """Hardware reset, wakes the controller from deep sleep."""
+        self.resets += 1
+        self.asleep = False
+
+    @property
+    def busy(self):
+        """True while the emulated controller is busy."""
+        return time.monotonic() < self._busy_until
+
+    def __enter__(self):
+        """Hold chip select for all writes until the matching ``__exit__``, like :class:`inky_transport.SPITransport`."""
+        if not self._depth:
+            self.selects += 1
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+
+    def read(self, command, length):
+        """Record a command and answer like the controller, only the temperature register (0x1b) reads as non-zero."""
+        self.write(False, bytes((command,)))
+        data = bytearray(length)
+        if command == 0x1b and length >= 2:
+            value = int(round(self.temperature * 16)) & 0xFFF
+            data[0:2] = bytes((value >> 4, (value & 0x0F) << 4))
+        return data
+
+    def write(self, dc, values, start=0, end=None):
+        """Record a command (dc False) or data (dc True) and apply it to the emulated controller."""
+        if not self._depth:
+            self.selects += 1
+        data = bytes(memoryview(values)[start:end])
+        if self.asleep:
+            return  # A controller in deep sleep ignores everything until it is reset
+        if not dc:
+            for command in data:
+                self._command(command)
+            return
+        if not self.log:
+            return
+        entry = self.log[-1]
+        entry[1].extend(data)
+        if entry[0] in (0x24, 0x26):
+            self._write_ram(entry[0], data)
+        else:
+            self._parameters(entry[0], entry[1])
+
+    def commands(self):
+        """The recorded commands as a list of (command, data) with data as `bytes`."""
+        return [(command, bytes(data)) for command, data in self.log]
+
+    def clear_log(self):
+        """Forget the recorded commands, the emulated RAM is kept."""
+        self.log = []
+
+    def play_displayio(self, sequence):
+        """Replay a ``displayio`` init sequence, such as the start sequence of :class:`ssd1619a.SSD1619A`."""
+        i = 0
+        while i < len(sequence):
+            length = sequence[i + 1] & 0x7F
+            self.write(False, sequence, i, i + 1)
+            if length:
+                self.write(True, sequence, i + 2, i + 2 + length)
+            i += 2 + length + (1 if sequence[i + 1] & 0x80 else 0)
+
+    def _command(self, command):
+        self.log.append([command, bytearray()])
+        if command == 0x12:  # Soft reset
+            self._busy_until = time.monotonic() + self.reset_time
+            self._window = [0, self.stride - 1, 0, self.height - 1]
+            self._entry_mode = 0x03
+            self._update_control = 0xff
+        elif command == 0x20 and self._update_control & 0x04:  # Display update
+            self.refreshes += 1
+            self._busy_until = time.monotonic() + self.refresh_time
+        elif command == 0x20:  # Update sequence without the display, such as loading the temperature
+            self._busy_until = time.monotonic() + self.reset_time
+
+    def _parameters(self, command, data):
+        if command == 0x44 and len(data) >= 2:
+            self._window[0:2] = data[0], data[1]
+        elif command == 0x45 and len(data) >= 4:
+            self._window[2:4] = struct.unpack('<HH', data[:4])
+        elif command == 0x4e and len(data) >= 1:
+            self._x = data[0]
+        elif command == 0x4f and len(data) >= 2:
+            self._y = struct.unpack('<H', data[:2])[0]
+        elif command == 0x11 and len(data) >= 1:
+            self._entry_mode = data[0]
+        elif command == 0x22 and len(data) >= 1:
+            self._update_control = data[0]
+        elif command in (0x46, 0x47) and len(data) >= 1:
+            self._fill(self.colour_ram if command == 0x46 else self.bw_ram, data[0])
+        elif command == 0x10 and len(data) >= 1 and data[0]:
+            self.asleep = True
+
+    def _fill(self, ram, pattern):
+        # Auto write: a checkerboard of steps, bit 7 is the value of the first step,
+        # bits 6-4 select the step height and bits 2-0 the step width
+        height = self._fill_heights[(pattern >> 4) & 0x07]
+        width = self._fill_widths[pattern & 0x07] >> 3
+        first = pattern >> 7
+        for y in range(self.height):
+            for x in range(self.stride):
+                ram[y * self.stride + x] = 0xFF if first ^ ((y // height + x // width) & 1) else 0x00
+        self._busy_until = time.monotonic() + self.reset_time
+
+    def _write_ram(self, command, data):
+        ram = self.bw_ram if command == 0x24 else self.colour_ram
+        x_start, x_end, y_start, y_end = self._window
+        # Data entry mode: bit 0 set for X increment, bit 1 for Y increment. X moves first,
+        # at the end of the window it goes back to the start and Y moves.
+        x_step = 1 if self._entry_mode & 0x01 else -1
+        y_step = 1 if self._entry_mode & 0x02 else -1
+        for value in data:
+            if 0 <= self._x < self.stride and 0 <= self._y < self.height:
+                ram[self._y * self.stride + self._x] = value
+            if self._x == x_end:
+                self._x = x_start
+                if self._y == y_end:
+                    self._y = y_start
+                else:
+                    self._y += y_step
+            else:
+                self._x += x_step
+
+    def image(self):
+        """Reconstruct the image in the emulated RAM as a :class:`Bitmap` of `WHITE`, `BLACK` and `RED`."""
+        image = Bitmap(self.width, self.height, 4)
+        for y in range(self.height):
+            for x in range(self.width):
+                index = y * self.stride + (x >> 3)
+                bit = 0x80 >> (x & 7)
+                if self.colour_ram[index] & bit:
+                    image[x, y] = RED
+                elif self.bw_ram[index] & bit:
+                    image[x, y] = BLACK
+        return image
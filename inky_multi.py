@@ -0,0 +1,125 @@
+"""Refresh several Inky displays at the same time.
+
+An e-Ink refresh keeps the display busy for seconds, but the SPI bus is only
+needed to send the frame. With one chip select, data/command and BUSY pin per
+display, all displays can share one bus: :func:`show_all` sends the frame of
+every display back to back, triggers their refreshes and then polls all BUSY
+pins together, so refreshing N displays takes about as long as refreshing one.
+
+    left = inky.Inky(colour='red', spi_bus=spi, cs_pin=board.IO7, dc_pin=board.IO6,
+                     reset_pin=board.IO5, busy_pin=board.IO4)
+    right = inky.Inky(colour='red', spi_bus=spi, cs_pin=board.IO10, dc_pin=board.IO11,
+                      reset_pin=board.IO12, busy_pin=board.IO13, epd_type=False)
+    inky_multi.show_all((left, right))
+
+Works with :class:`inky.Inky` and :class:`ssd1619a.SSD1619A` displays, mixed
+as well. ``displayio`` displays are refreshed with ``refresh()`` as soon as
+they accept one (see ``time_to_refresh``).
+"""
+
+import time
+
+from inky_stats import ticks_diff, ticks_ms
+
+_POLL_INTERVAL = 0.01  # seconds
+
+
+def _start(display, force, wait=True):
+    """Send a frame to a display and trigger its refresh.
+    :param bool wait: Wait until a ``displayio`` display accepts a refresh, False if the caller already did.
+    :return: True if the display is refreshing.
+    """
+    if hasattr(display, 'start_show'):
+        return display.start_show(force)
+    if wait:
+        # displayio refuses a refresh that comes too soon after the last one
+        time.sleep(display.time_to_refresh)
+        while display.busy:
+            time.sleep(_POLL_INTERVAL)
+    display.refresh()
+    return True
+
+
+async def _ready_async(display, poll_interval):
+    """Wait until a ``displayio`` display accepts a refresh, like :func:`_start`, yielding to other tasks."""
+    import asyncio  # Only needed by the asyncio API
+
+    await asyncio.sleep(display.time_to_refresh)
+    while display.busy:
+        await asyncio.sleep(poll_interval)
+
+
+def _finish(display):
+    if hasattr(display, 'finish_show'):
+        display.finish_show()
+
+
+def start_all(displays, force=False):
+    """Send the frame of every display and trigger the refreshes, without waiting for them.
+    :param displays: :class:`inky.Inky` or :class:`ssd1619a.SSD1619A` displays.
+    :param bool force: If True, refresh :class:`inky.Inky` displays even if nothing changed, default: `False`.
+    :return: list of the displays that are refreshing, pass it to :func:`finish_all`.
+    """
+    return [display for display in displays if _start(display, force)]
+
+
+def _poll(displays, timeout):
+    """Finish each display as soon as it is idle, yielding whenever some are still busy.
+    The caller waits between polls, so :func:`finish_all` and :func:`show_all_async` share this.
+    :raises TimeoutError: if a display is still busy after `timeout`.
+    """
+    pending = list(displays)
+    start = ticks_ms()
+    while pending:
+        for display in [display for display in pending if not display.busy]:
+            _finish(display)
+            pending.remove(display)
+        if not pending:
+            break
+        if timeout is not None and ticks_diff(ticks_ms(), start) > timeout * 1000:
+            raise TimeoutError('{} of {} displays still busy after {}s'.format(len(pending), len(displays), timeout))
+        yield
+
+
+def finish_all(displays, timeout=None, poll_interval=_POLL_INTERVAL):
+    """Wait for the refreshes started by :func:`start_all`, polling all BUSY pins together.
+    Each display is finished (and put to sleep) as soon as it is idle.
+    :param displays: Displays returned by :func:`start_all`.
+    :param float timeout: Seconds to wait for all displays, default: wait forever.
+    :param float poll_interval: Seconds between polls, default: `0.01`.
+    :raises TimeoutError: if a display is still busy after `timeout`.
+    """
+    for _ in _poll(displays, timeout):
+        time.sleep(poll_interval)
+
+
+def show_all(displays, force=False, timeout=None, poll_interval=_POLL_INTERVAL):
+    """Show the frame of every display, refreshing them all at the same time.
+    :param displays: :class:`inky.Inky` or :class:`ssd1619a.SSD1619A` displays.
+    :param bool force: If True, refresh :class:`inky.Inky` displays even if nothing changed, default: `False`.
+    :param float timeout: Seconds to wait for the refreshes, default: wait forever.
+    :param float poll_interval: Seconds between polls of the BUSY pins, default: `0.01`.
+    :return: list of the displays that were refreshed.
+    :raises TimeoutError: if a display is still busy after `timeout`.
+    """
+    refreshing = start_all(displays, force)
+    finish_all(refreshing, timeout, poll_interval)
+    return refreshing
+
+
+async def show_all_async(displays, force=False, timeout=None, poll_interval=_POLL_INTERVAL):
+    """Like :func:`show_all`, but yields to other ``asyncio`` tasks while the displays refresh.
+    Sending the frames still blocks, waiting for the refreshes and for ``displayio`` displays
+    to accept one (see ``time_to_refresh``) yields.
+    """
+    import asyncio  # Only needed by the asyncio API
+
+    refreshing = []
+    for display in displays:
+        if not hasattr(display, 'start_show'):
+            await _ready_async(display, poll_interval)
+        if _start(display, force, wait=False):
+            refreshing.append(display)
+    for _ in _poll(refreshing, timeout):
+        await asyncio.sleep(poll_interval)
+    return refreshing
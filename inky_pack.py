@@ -0,0 +1,408 @@
+"""Plane packing for Inky e-Ink displays.
+
+The SSD1619A takes two 1 bit per pixel planes: black/white (RAM 0x24) and
+red/yellow (RAM 0x26). This module splits a palette indexed image into both
+planes in a single pass using whole-row array operations and per byte lookup
+tables (see :class:`PlaneMap`) instead of a Python loop per pixel.
+
+It runs on CircuitPython with ``ulab`` and falls back to numpy on CPython,
+so packing can be benchmarked and checked against :meth:`inky.Inky.packbits`
+on a regular computer.
+"""
+
+try:
+    from ulab import numpy as np
+except ImportError:
+    import numpy as np  # CPython host, for benchmarking and testing
+
+# Display colour codes
+WHITE = 0
+BLACK = 1
+RED = YELLOW = 2
+
+# Rows unpacked at a time, keeps the temporary arrays small
+_BAND_ROWS = 16
+
+
+def row_bytes(width):
+    """Number of bytes in one packed row of `width` pixels."""
+    return (width + 7) >> 3
+
+
+def bits_per_value(image):
+    """Bits per pixel of a :class:`displayio.Bitmap`."""
+    bits = getattr(image, 'bits_per_value', None)
+    if bits is None:
+        # Older CircuitPython builds don't expose bits_per_value, rows are 32 bit aligned
+        stride = len(memoryview(image)) // image.height
+        bits = 1
+        while ((image.width * bits + 31) // 32) * 4 < stride:
+            bits *= 2
+    return bits
+
+
+def bitmap_stride(image, bits):
+    """Bytes per row of a :class:`displayio.Bitmap`, rows are padded to 32 bits.
+
+    Taken from the geometry, the length of the bitmap's buffer counts 16 and 32 bit values, not bytes.
+    """
+    return ((image.width * bits + 31) // 32) * 4
+
+
+def pixels(image, y0=0, y1=None):
+    """Read rows `y0` up to `y1` of an image as palette indices, one byte per pixel.
+
+    The result is padded with `WHITE` to a multiple of 8 columns.
+
+    :param image: :class:`displayio.Bitmap` or a 2D uint8 array of palette indices.
+    :param int y0: First row.
+    :param int y1: End row (exclusive), default: image height.
+    """
+    width, height = size(image)
+    if y1 is None:
+        y1 = height
+    count = y1 - y0
+    padded = row_bytes(width) << 3
+
+    if hasattr(image, 'shape'):
+        rows = np.zeros((count, padded), dtype=np.uint8)
+        rows[:, :width] = image[y0:y1, :]
+        return rows
+
+    # displayio.Bitmap stores each row as little endian 32 bit words,
+    # with the first pixel in the most significant bits of the word.
+    bits = bits_per_value(image)
+    stride = bitmap_stride(image, bits)
+    raw = np.frombuffer(image, dtype=np.uint8, count=count * stride, offset=y0 * stride)
+    raw = raw.reshape((count, stride))
+
+    if bits == 8:
+        rows = np.zeros((count, padded), dtype=np.uint8)
+        rows[:, :width] = raw[:, :width]
+        return rows
+    if bits > 8:
+        raise ValueError('Bitmaps with {} bits per value are not supported'.format(bits))
+
+    ordered = _pixel_order(raw)
+    per_byte = 8 // bits
+    mask = (1 << bits) - 1
+    rows = np.zeros((count, stride * per_byte), dtype=np.uint8)
+    for k in range(per_byte):
+        rows[:, k::per_byte] = (ordered >> (8 - (k + 1) * bits)) & mask
+    if padded > width:
+        rows[:, width:padded] = WHITE
+    return rows[:, :padded]
+
+
+def _pixel_order(raw):
+    """Put the bytes of each little endian 32 bit word of bitmap rows in pixel order."""
+    ordered = np.zeros(raw.shape, dtype=np.uint8)
+    for k in range(4):
+        ordered[:, k::4] = raw[:, 3 - k::4]
+    return ordered
+
+
+def size(image):
+    """(width, height) of a :class:`displayio.Bitmap` or 2D array."""
+    if hasattr(image, 'shape'):
+        height, width = image.shape
+        return width, height
+    return image.width, image.height
+
+
+def plane_view(buffer, width, height):
+    """View a packed plane buffer as a 2D array of `height` rows, without copying.
+
+    :param buffer: `bytearray` of ``row_bytes(width) * height`` bytes.
+    :param int width: Image width in pixels.
+    :param int height: Image height in pixels.
+    """
+    return np.frombuffer(buffer, dtype=np.uint8).reshape((height, row_bytes(width)))
+
+
+def pack_columns(bits, out):
+    """OR each group of 8 columns of a 0/1 array into one byte, first column in the MSB.
+
+    :param bits: 2D uint8 array of 0/1 values, width a multiple of 8.
+    :param out: 2D uint8 array to receive the packed bytes, must be zeroed.
+    """
+    for k in range(8):
+        out |= bits[:, k::8] << (7 - k)
+    return out
+
+
+class PlaneMap:
+    """Which plane bits each palette index sets, with lookup tables for packing.
+
+    By default an index sets the black/white bit unless it is `WHITE`, and
+    `RED`/`YELLOW` also sets the colour bit, as the planes :meth:`inky.Inky.show`
+    has always sent. `mapping` changes the display colour of palette indices.
+
+    The tables map every byte of a bitmap row, up to 8 pixels, straight to its
+    bits in both planes, so packing is a table lookup per byte instead of
+    separate comparisons and shifts per plane.
+
+    :param dict mapping: Display colour (`WHITE`, `BLACK` or `RED`) of palette indices, for example
+        ``{3: RED}`` to show index 3 in red. Indices not in `mapping` keep the default.
+    :param bool colour: False for black/white displays, `RED` indices then show as black. Default: `True`.
+    """
+
+    def __init__(self, mapping=None, colour=True):
+        self.mapping = dict(mapping or {})
+        self.colour = colour
+        self._luts = {}
+
+    def bits(self, index):
+        """(black bit, colour bit) set by a palette index."""
+        value = self.mapping.get(index, WHITE if index == WHITE else (RED if index == RED else BLACK))
+        if value == WHITE:
+            return 0, 0
+        if value == RED and self.colour:
+            return 1, 1
+        return 1, 0
+
+    def luts(self, bits):
+        """Lookup tables for bitmaps of `bits` bits per value.
+
+        :return: tuple of (black, colour) uint8 arrays of 256 entries, holding the plane bits of the
+            ``8 // bits`` pixels in a byte, first pixel in the most significant bit.
+        """
+        luts = self._luts.get(bits)
+        if luts is None:
+            per_byte = 8 // bits
+            mask = (1 << bits) - 1
+            table = [self.bits(index) for index in range(1 << bits)]
+            black = np.zeros(256, dtype=np.uint8)
+            colour = np.zeros(256, dtype=np.uint8)
+            for value in range(256):
+                b = c = 0
+                for k in range(per_byte):
+                    bit_b, bit_c = table[(value >> (8 - (k + 1) * bits)) & mask]
+                    b = (b << 1) | bit_b
+                    c = (c << 1) | bit_c
+                black[value] = b
+                colour[value] = c
+            luts = self._luts[bits] = (black, colour)
+        return luts
+
+
+DEFAULT_MAP = PlaneMap()
+
+_take = getattr(np, 'take', None)  # Older ulab builds don't have take()
+
+
+def _lookup(lut, values):
+    """`lut` applied to every value of a 2D uint8 array."""
+    return _take(lut, values.flatten()).reshape(values.shape)
+
+
+def _bitmap_bytes(image, y0, y1):
+    """Rows of a bitmap as raw bytes in pixel order, and its bits per value."""
+    if hasattr(image, 'shape'):
+        return pixels(image, y0, y1), 8
+    bits = bits_per_value(image)
+    if bits > 8:
+        raise ValueError('Bitmaps with {} bits per value are not supported'.format(bits))
+    stride = bitmap_stride(image, bits)
+    raw = np.frombuffer(image, dtype=np.uint8, count=(y1 - y0) * stride, offset=y0 * stride)
+    raw = raw.reshape((y1 - y0, stride))
+    if bits == 8:
+        return raw, bits
+    return _pixel_order(raw), bits
+
+
+def _pack_band(image, plane_map, y0, y1, black, colour):
+    """Pack rows `y0` up to `y1` into `black` and `colour`, one table lookup per source byte."""
+    width = size(image)[0]
+    stride = row_bytes(width)
+    data, bits = _bitmap_bytes(image, y0, y1)
+    lut_black, lut_colour = plane_map.luts(bits)
+    black_bits = _lookup(lut_black, data)
+    colour_bits = _lookup(lut_colour, data)
+    per_byte = 8 // bits
+    packed_b = np.zeros((y1 - y0, stride), dtype=np.uint8)
+    packed_c = np.zeros((y1 - y0, stride), dtype=np.uint8)
+    # `bits` source bytes make up one plane byte
+    for k in range(bits):
+        columns = black_bits[:, k::bits]
+        shift = 8 - (k + 1) * per_byte
+        count = min(stride, columns.shape[1])
+        packed_b[:, :count] |= columns[:, :count] << shift
+        packed_c[:, :count] |= colour_bits[:, k::bits][:, :count] << shift
+    if width & 7:
+        # Pixels past the width are padding, keep them white
+        keep = (0xFF << (8 - (width & 7))) & 0xFF
+        packed_b[:, stride - 1] &= keep
+        packed_c[:, stride - 1] &= keep
+    black[:, :] = packed_b
+    colour[:, :] = packed_c
+
+
+def _pixel_bits(rows, plane_map):
+    """Black/white and colour bits (0 or 1) of one byte per pixel palette indices."""
+    if _take is not None:
+        lut_black, lut_colour = plane_map.luts(8)
+        return _lookup(lut_black, rows), _lookup(lut_colour, rows)
+    # One comparison per palette index, for ulab builds without take()
+    bits_b = np.zeros(rows.shape, dtype=np.uint8)
+    bits_c = np.zeros(rows.shape, dtype=np.uint8)
+    for index in range(int(np.max(rows)) + 1):
+        bit_b, bit_c = plane_map.bits(index)
+        if bit_b or bit_c:
+            mask = np.array(rows == index, dtype=np.uint8)
+            bits_b |= mask * bit_b
+            bits_c |= mask * bit_c
+    return bits_b, bits_c
+
+
+def _pack_bits(bits_b, bits_c, black, colour):
+    """Pack 0/1 arrays, padded to a multiple of 8 columns, into `black` and `colour`."""
+    band = np.zeros(black.shape, dtype=np.uint8)
+    black[:, :] = pack_columns(bits_b, band)
+    band = np.zeros(colour.shape, dtype=np.uint8)
+    colour[:, :] = pack_columns(bits_c, band)
+
+
+def _pack_band_pixels(image, plane_map, y0, y1, black, colour, reverse=False):
+    """Pack rows from one byte per pixel, optionally right to left."""
+    width = size(image)[0]
+    rows = pixels(image, y0, y1)
+    if reverse:
+        bits_b, bits_c = _pixel_bits(rows[:, :width][:, ::-1], plane_map)
+        # Padding stays on the right
+        padded_b = np.zeros(rows.shape, dtype=np.uint8)
+        padded_c = np.zeros(rows.shape, dtype=np.uint8)
+        padded_b[:, :width] = bits_b
+        padded_c[:, :width] = bits_c
+        _pack_bits(padded_b, padded_c, black, colour)
+        return
+    bits_b, bits_c = _pixel_bits(rows, plane_map)
+    _pack_bits(bits_b, bits_c, black, colour)
+
+
+def _pack_transposed(image, plane_map, y0, y1, black, colour, reverse=False):
+    """Pack image columns `y0` up to `y1` as plane rows, image rows become plane columns.
+
+    The image is read once, a few rows at a time, each group of rows filling
+    whole bytes of the planes.
+    """
+    height = size(image)[1]
+    columns = row_bytes(height) << 3
+    for p0 in range(0, columns, _BAND_ROWS):
+        p1 = min(p0 + _BAND_ROWS, columns)
+        # Image rows shown in plane columns p0 up to p1
+        r0, r1 = (height - p1, height - p0) if reverse else (p0, p1)
+        r0, r1 = max(r0, 0), min(r1, height)
+        bits_b = np.zeros((p1 - p0, y1 - y0), dtype=np.uint8)
+        bits_c = np.zeros((p1 - p0, y1 - y0), dtype=np.uint8)
+        if r1 > r0:
+            rows = pixels(image, r0, r1)[:, y0:y1]
+            if reverse:
+                rows = rows[::-1, :]
+                first = height - r1 - p0
+            else:
+                first = r0 - p0
+            band_b, band_c = _pixel_bits(rows, plane_map)
+            bits_b[first:first + r1 - r0, :] = band_b
+            bits_c[first:first + r1 - r0, :] = band_c
+        _pack_bits(bits_b.transpose(), bits_c.transpose(),
+                   black[:, p0 >> 3:p1 >> 3], colour[:, p0 >> 3:p1 >> 3])
+
+
+def pack_planes(image, black=None, colour=None, y0=0, y1=None, plane_map=DEFAULT_MAP, transpose=False, reverse=False):
+    """Split an image into packed black/white and red/yellow planes.
+
+    Both planes are built from a single read of the source pixels, through the
+    lookup tables of `plane_map`. This doesn't depend on a driver, so it also
+    packs bitmaps for an SSD1619A driven outside ``displayio``.
+
+    Rotation and mirroring are part of the same pass: with `transpose` plane
+    row ``n`` is image column ``n``, with `reverse` each plane row runs from
+    the end of the image row (or column) to its start.
+
+    :param image: :class:`displayio.Bitmap` or a 2D uint8 array of palette indices.
+    :param black: Optional 2D uint8 array to receive the black/white plane.
+    :param colour: Optional 2D uint8 array to receive the red/yellow plane.
+    :param int y0: First plane row to pack, default: `0`.
+    :param int y1: End plane row (exclusive), default: image height, or width with `transpose`.
+    :param plane_map: :class:`PlaneMap` with the plane bits of each palette index, default: :data:`DEFAULT_MAP`.
+    :param bool transpose: Pack image columns as plane rows, default: `False`.
+    :param bool reverse: Mirror each plane row, default: `False`.
+    :return: tuple of (black, colour) arrays, one row per plane row.
+    """
+    width, height = size(image)
+    if transpose:
+        width, height = height, width
+    if y1 is None:
+        y1 = height
+    shape = (y1 - y0, row_bytes(width))
+    if black is None:
+        black = np.zeros(shape, dtype=np.uint8)
+    if colour is None:
+        colour = np.zeros(shape, dtype=np.uint8)
+
+    if transpose:
+        _pack_transposed(image, plane_map, y0, y1, black, colour, reverse)
+        return black, colour
+
+    for start in range(y0, y1, _BAND_ROWS):
+        end = min(start + _BAND_ROWS, y1)
+        band = (black[start - y0:end - y0, :], colour[start - y0:end - y0, :])
+        if reverse:
+            _pack_band_pixels(image, plane_map, start, end, band[0], band[1], reverse)
+        elif _take is not None:
+            _pack_band(image, plane_map, start, end, band[0], band[1])
+        else:
+            _pack_band_pixels(image, plane_map, start, end, band[0], band[1])
+
+    return black, colour
+
+
+def changed_rows(plane, last):
+    """Find the rows where two packed planes differ.
+
+    :param plane: 2D uint8 array, one row per image row.
+    :param last: 2D uint8 array of the same shape to compare with.
+    :return: (first row, end row) or `None` if the planes are equal.
+    """
+    rows = np.array(np.any(plane != last, axis=1), dtype=np.uint8)
+    if not np.any(rows):
+        return None
+    first = int(np.argmax(rows))
+    return first, len(rows) - int(np.argmax(rows[::-1]))
+
+
+def row_spans(plane, reference, gap=0):
+    """Find the runs of rows where a packed plane differs from a reference.
+
+    :param plane: 2D uint8 array, one row per image row.
+    :param reference: 2D uint8 array of the same shape, or a byte value every row is compared with.
+    :param int gap: Join runs separated by at most this many equal rows, default: `0`.
+    :return: list of (first row, end row), empty if the plane matches the reference.
+    """
+    rows = np.array(np.any(plane != reference, axis=1), dtype=np.uint8)
+    spans = []
+    start = end = None
+    for y in range(len(rows)):
+        if not rows[y]:
+            continue
+        if start is None:
+            start = y
+        elif y - end > gap:
+            spans.append((start, end))
+            start = y
+        end = y + 1
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+def fill_value(plane):
+    """The byte that fills most whole rows of a packed plane, 0x00 (no ink) or 0xFF.
+
+    :param plane: 2D uint8 array, one row per image row.
+    :return: tuple of (value, number of rows filled with it).
+    """
+    blank = int(np.sum(np.array(np.all(plane == 0x00, axis=1), dtype=np.uint16)))
+    full = int(np.sum(np.array(np.all(plane == 0xFF, axis=1), dtype=np.uint16)))
+    return (0x00, blank) if blank >= full else (0xFF, full)
@@ -0,0 +1,138 @@
+"""Choose between fast and full refreshes by how much ghosting has built up.
+
+The fast black/white waveform takes a fraction of the time of a full colour
+refresh, but every fast refresh leaves a little ghosting where pixels changed
+and it doesn't drive the red/yellow pixels at all. A full refresh clears the
+whole panel again. :class:`RefreshPolicy` keeps the history of the panel and
+picks the cheaper waveform until the ghosting has to be cleared:
+
+    screen.refresh_policy = inky_policy.RefreshPolicy(max_fast=10, max_age=3600)
+    screen.stats = inky_stats.Stats()
+    screen.show()
+    print(screen.stats.waveform, screen.stats.reason)  # 'fast' 'fast', or 'full' and why
+
+The panel is split into `regions` bands of rows. Each band counts the fast
+refreshes that changed it since the last full refresh, so updating a clock in
+one corner doesn't use up the budget of the rest of the screen. Bands with a
+lot of red/yellow get a smaller budget (`max_fast_colour`): the fast waveform
+leaves those pixels alone and they fade. A full refresh always drives the
+whole panel, so it resets every band and the age.
+
+Works with :class:`inky.Inky` and :class:`ssd1619a.SSD1619A`. ``displayio``
+doesn't tell the driver what changed or what is in the red/yellow plane, so
+on the ``SSD1619A`` every refresh touches all bands and only the fast refresh
+count and the age apply. Red and yellow ``SSD1619A`` displays only get a fast
+refresh when the caller knows the colour didn't change: ``refresh(colour_changed=False)``.
+"""
+
+from inky_stats import ticks_diff, ticks_ms
+
+# Reasons for a decision, see RefreshPolicy.decide()
+FAST = 'fast'  # Nothing forces a full refresh
+FIRST = 'first'  # The panel content isn't known, after start up or a frame written without the frame buffer
+COLOUR = 'colour'  # The red/yellow plane changed, only the full waveform draws it
+AGE = 'age'  # The last full refresh is more than max_age seconds ago
+GHOSTING = 'ghosting'  # A band that changed has had its share of fast refreshes
+
+
+class RefreshPolicy:
+    """History of a panel and the thresholds for a full refresh.
+
+    :param int regions: Number of bands of rows the panel is split into, default: `4`.
+    :param int max_fast: Fast refreshes of a band before a full refresh, default: `10`.
+    :param int max_fast_colour: Fast refreshes of a band with red/yellow content, default: `3`.
+    :param float colour_threshold: Share of the bytes of a band with red/yellow ink above which
+        `max_fast_colour` applies, default: `0.05`.
+    :param float max_age: Seconds after a full refresh before the next refresh is full again,
+        `None` for no limit. Must be shorter than the 6 day period of ``supervisor.ticks_ms()``.
+        Default: `86400` (a day).
+    """
+
+    def __init__(self, regions=4, max_fast=10, max_fast_colour=3, colour_threshold=0.05, max_age=86400):
+        self.regions = regions
+        self.max_fast = max_fast
+        self.max_fast_colour = max_fast_colour
+        self.colour_threshold = colour_threshold
+        self.max_age = max_age
+        self.reset()
+
+    def reset(self):
+        """Forget the history, the next refresh is a full one."""
+        self.fast_updates = [0] * self.regions  # Fast refreshes per band since the last full refresh
+        self.colour = [0.0] * self.regions  # Share of red/yellow bytes per band, as of the last refresh
+        self.last_full = None  # ticks_ms() of the last full refresh
+        self.decision = None  # (waveform, reason) of the last refresh
+
+    @property
+    def age(self):
+        """Seconds since the last full refresh, `None` if there wasn't one."""
+        if self.last_full is None:
+            return None
+        return ticks_diff(ticks_ms(), self.last_full) / 1000
+
+    def bands(self, rows, changed=None):
+        """Bands of rows a range of panel rows falls in.
+
+        :param int rows: Number of panel rows.
+        :param changed: (first row, end row), default: all rows.
+        :return: range of band indices.
+        """
+        if changed is None:
+            return range(self.regions)
+        first, end = changed
+        return range(first * self.regions // rows, ((end - 1) * self.regions // rows) + 1)
+
+    def _measure_colour(self, rows, bands, colour_plane):
+        """Update the share of red/yellow bytes of some bands from a packed plane."""
+        from inky_pack import np  # Only needed with a frame buffer
+
+        for band in bands:
+            y0, y1 = band * rows // self.regions, (band + 1) * rows // self.regions
+            area = colour_plane[y0:y1, :]
+            inked = int(np.sum(np.array(area != 0, dtype=np.uint16)))
+            self.colour[band] = inked / max(1, (y1 - y0) * area.shape[1])
+
+    def _limit(self, band):
+        return self.max_fast_colour if self.colour[band] > self.colour_threshold else self.max_fast
+
+    def decide(self, rows, changed=None, colour_changed=False, colour_plane=None, known=True):
+        """Pick the waveform for the next refresh and add it to the history.
+
+        :param int rows: Number of panel rows.
+        :param changed: Panel rows that changed as (first row, end row), default: all rows.
+        :param bool colour_changed: True if the red/yellow plane changed.
+        :param colour_plane: Packed red/yellow plane of the new frame (2D uint8 array), to measure
+            the colour content of the bands that changed. Default: `None`, colour content unknown.
+        :param bool known: False if the content of the panel isn't known, default: `True`.
+        :return: tuple of (waveform, reason), waveform is 'fast' or 'full'.
+        """
+        bands = self.bands(rows, changed)
+        if colour_plane is not None:
+            self._measure_colour(rows, bands, colour_plane)
+
+        reason = FAST
+        if not known or self.last_full is None:
+            reason = FIRST
+        elif colour_changed:
+            reason = COLOUR
+        elif self.max_age is not None and self.age >= self.max_age:
+            reason = AGE
+        else:
+            for band in bands:
+                if self.fast_updates[band] >= self._limit(band):
+                    reason = GHOSTING
+                    break
+
+        if reason == FAST:
+            for band in bands:
+                self.fast_updates[band] += 1
+            self.decision = ('fast', reason)
+        else:
+            self.full_refresh()
+            self.decision = ('full', reason)
+        return self.decision
+
+    def full_refresh(self):
+        """Record a full refresh, also one the driver did without asking the policy."""
+        self.fast_updates = [0] * self.regions
+        self.last_full = ticks_ms()
@@ -0,0 +1,341 @@
+"""Command sequences for SSD1619A based Inky displays.
+
+The configuration, LUT and RAM window commands only depend on the display
+(resolution, colour, border and waveform), so they are compiled once into
+`bytes` and cached. :class:`inky.Inky` sends them as its command stream and
+:class:`ssd1619a.SSD1619A` uses the same commands as its ``displayio`` start
+sequence, so neither driver builds command data when it refreshes.
+
+A compiled sequence is a tuple of (command, data) pairs, data is `bytes`.
+"""
+
+import struct
+
+# Display colour codes
+WHITE = 0
+BLACK = 1
+RED = YELLOW = 2
+
+_WINDOW_CACHE_SIZE = 32  # Compiled RAM windows kept, whole-display windows are the common case
+
+# Inky Lookup Tables.
+# These lookup tables comprise of two sets of values.
+# The first set of values, formatted as binary, describe the voltages applied during the six update phases:
+#   Phase 0     Phase 1     Phase 2     Phase 3     Phase 4     Phase 5     Phase 6
+#   A B C D
+# 0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,  LUT0 - Black
+# 0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,  LUT1 - White
+# 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  NOT USED BY HARDWARE
+# 0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,  LUT3 - Yellow or Red
+# 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  LUT4 - VCOM
+# There are seven possible phases, arranged horizontally, and only the phases with duration/repeat information
+# (see below) are used during the update cycle.
+# Each phase has four steps: A, B, C and D. Each step is represented by two binary bits and these bits can
+# have one of four possible values representing the voltages to be applied. The default values follow:
+# 0b00: VSS or Ground
+# 0b01: VSH1 or 15V
+# 0b10: VSL or -15V
+# 0b11: VSH2 or 5.4V
+# During each phase the Black, White and Yellow (or Red) stages are applied in turn, creating a voltage
+# differential across each display pixel. This is what moves the physical ink particles in their suspension.
+# The second set of values, formatted as hex, describe the duration of each step in a phase, and the number
+# of times that phase should be repeated:
+#   Duration                Repeat
+#   A     B     C     D
+# 0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 0
+# 0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 1
+# 0x04, 0x08, 0x08, 0x10, 0x10,      etc
+# 0x00, 0x00, 0x00, 0x00, 0x00,
+# 0x00, 0x00, 0x00, 0x00, 0x00,
+# 0x00, 0x00, 0x00, 0x00, 0x00,
+# 0x00, 0x00, 0x00, 0x00, 0x00,
+# The duration and repeat parameters allow you to take a single sequence of A, B, C and D voltage values and
+# transform them into a waveform that - effectively - wiggles the ink particles into the desired position.
+# In all of our LUT definitions we use the first and second phases to flash/pulse and clear the display to
+# mitigate image retention. The flashing effect is actually the ink particles being moved from the bottom to
+# the top of the display repeatedly in an attempt to reset them back into a sensible resting position.
+
+LUTS = {
+    'black': bytes([
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x10, 0x04, 0x04, 0x04, 0x04,
+        0x10, 0x04, 0x04, 0x04, 0x04,
+        0x04, 0x08, 0x08, 0x10, 0x10,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+    ]),
+    'red': bytes([
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x40, 0x0C, 0x20, 0x0C, 0x06,
+        0x10, 0x08, 0x04, 0x04, 0x06,
+        0x04, 0x08, 0x08, 0x10, 0x10,
+        0x02, 0x02, 0x02, 0x40, 0x20,
+        0x02, 0x02, 0x02, 0x02, 0x02,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00
+    ]),
+    'red_ht': bytes([
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00010000, 0b00010000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b10000000, 0b10000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b01001000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x43, 0x0A, 0x1F, 0x0A, 0x04,
+        0x10, 0x08, 0x04, 0x04, 0x06,
+        0x04, 0x08, 0x08, 0x10, 0x0B,
+        0x02, 0x04, 0x04, 0x40, 0x10,
+        0x06, 0x06, 0x06, 0x02, 0x02,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00
+    ]),
+    'yellow': bytes([
+        0b11111010, 0b10010100, 0b10001100, 0b11000000, 0b11010000, 0b00000000, 0b00000000,
+        0b11111010, 0b10010100, 0b00101100, 0b10000000, 0b11100000, 0b00000000, 0b00000000,
+        0b11111010, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b11111010, 0b10010100, 0b11111000, 0b10000000, 0b01010000, 0b00000000, 0b11001100,
+        0b10111111, 0b01011000, 0b11111100, 0b10000000, 0b11010000, 0b00000000, 0b00010001,
+        0x40, 0x10, 0x40, 0x10, 0x08,
+        0x08, 0x10, 0x04, 0x04, 0x10,
+        0x08, 0x08, 0x03, 0x08, 0x20,
+        0x08, 0x04, 0x00, 0x00, 0x10,
+        0x10, 0x08, 0x08, 0x00, 0x20,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+    ]),
+    # Fast black/white update: only the image phase of the 'black' waveform (phase 2, repeated as
+    # often), without the flash/clear phases. LUT3 is left empty so red/yellow pixels are not driven.
+    'fast': bytes([
+        0b00010000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b10000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x04, 0x08, 0x08, 0x10, 0x10,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+    ]),
+}
+
+# Offset of the phase timings in a LUT: 4 durations and a repeat count for each of the 7 phases
+_LUT_TIMINGS = 35
+
+# Temperature bands as (upper limit in degrees C, factor for the phase durations), coldest first.
+# Ink moves slowly in the cold, so the phases are stretched there and shortened when warm.
+TEMPERATURE_BANDS = (
+    (5, 1.5),
+    (15, 1.25),
+    (28, 1.0),
+    (None, 0.75),
+)
+
+_compiled = {}
+_windows = {}
+
+
+def _cached(cache, key, build, size=None):
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    if size is not None and len(cache) >= size:
+        cache.clear()
+    value = cache[key] = build()
+    return value
+
+
+def temperature_band(celsius):
+    """Index of the band in `TEMPERATURE_BANDS` a temperature falls in, `None` if the temperature is unknown."""
+    if celsius is None:
+        return None
+    for band, (limit, factor) in enumerate(TEMPERATURE_BANDS):
+        if limit is None or celsius < limit:
+            return band
+
+
+def waveform(lut, band=None):
+    """A LUT adjusted to a temperature band, compiled once and cached.
+
+    :param str lut: Name of the waveform in `LUTS`.
+    :param int band: Index into `TEMPERATURE_BANDS`, default: `None`, the LUT as it is.
+    """
+    if band is None or TEMPERATURE_BANDS[band][1] == 1:
+        return LUTS[lut]
+
+    def build():
+        factor = TEMPERATURE_BANDS[band][1]
+        data = bytearray(LUTS[lut])
+        for phase in range(_LUT_TIMINGS, len(data), 5):
+            for i in range(phase, phase + 4):  # The repeat count stays
+                if data[i]:
+                    data[i] = min(0xFF, max(1, int(data[i] * factor + 0.5)))
+        return bytes(data)
+    return _cached(_compiled, ('waveform', lut, band), build)
+
+
+def border_value(border, colour):
+    """Border waveform setting (0x3c) for a border colour.
+
+    :param int border: One of `WHITE`, `BLACK`, `RED` or `YELLOW`.
+    :param str colour: Display colour, one of 'red', 'black' or 'yellow'.
+    """
+    if border == BLACK:
+        return 0b00000000  # GS Transition Define A + VSS + LUT0
+    elif border == RED and colour == 'red':
+        return 0b01110011  # Fix Level Define A + VSH2 + LUT3
+    elif border == YELLOW and colour == 'yellow':
+        return 0b00110011  # GS Transition Define A + VSH2 + LUT3
+    elif border == WHITE:
+        return 0b00110001  # GS Transition Define A + VSH2 + LUT1
+    return 0b00000000
+
+
+def _source_voltage(colour, resolution):
+    if colour == 'yellow':
+        return b'\x07\xac\x32'  # Set voltage of VSH and VSL
+    if colour == 'red' and resolution == (400, 300):
+        return b'\x30\xac\x22'
+    return b'\x41\xac\x32'
+
+
+def config(rows, colour, lut, border, resolution=(400, 300), flip_rows=False, band=None):
+    """Configuration commands for a display, compiled once and cached.
+
+    :param int rows: Number of gate lines (display rows).
+    :param str colour: Display colour, one of 'red', 'black' or 'yellow'.
+    :param str lut: Name of the waveform in `LUTS`.
+    :param int border: Border colour, one of `WHITE`, `BLACK`, `RED` or `YELLOW`.
+    :param resolution: Display resolution (width, height), selects the source voltages.
+    :param bool flip_rows: Write RAM rows bottom up (Y decrement), which mirrors the image vertically
+        for free. RAM windows and pointers must then be flipped too, see :func:`ram_window`.
+    :param int band: Temperature band to adjust the waveform to, see :func:`waveform`. Default: `None`.
+    """
+    key = ('config', rows, colour, lut, border, resolution, flip_rows, band)
+    return _cached(_compiled, key, lambda: (
+        (0x74, b'\x54'),  # Set Analog Block Control
+        (0x7e, b'\x3b'),  # Set Digital Block Control
+        (0x01, struct.pack('<HB', rows - 1, 0x00)),  # Gate setting
+        (0x03, b'\x17'),  # Gate Driving Voltage
+        (0x04, _source_voltage(colour, resolution)),  # Source Driving Voltage
+        (0x3a, b'\x07'),  # Dummy line period
+        (0x3b, b'\x04'),  # Gate line width
+        (0x11, b'\x01' if flip_rows else b'\x03'),  # Data entry mode setting 0x03 = X/Y increment, 0x01 = Y decrement
+        (0x2c, b'\x3c'),  # VCOM Register, 0x3c = -1.5v?
+        (0x22, b'\xc7'),  # Display Update Sequence
+        (0x3c, bytes((border_value(border, colour),))),  # Border waveform
+        (0x32, waveform(lut, band)),  # Set LUTs
+    ))
+
+
+def precompile(rows, colour, lut, resolution=(400, 300), flip_rows=False, bands=(None,)):
+    """Compile the configuration of a display for every border colour and waveform up front.
+
+    See :func:`config` for the parameters.
+
+    :param bands: Temperature bands to compile for, default: only the unadjusted waveforms.
+    """
+    for band in bands:
+        for border in (WHITE, BLACK, RED):
+            for name in (lut, 'fast'):
+                config(rows, colour, name, border, resolution, flip_rows, band)
+
+
+def ram_window(c0, y0, c1, y1, flip_rows=0):
+    """RAM window commands (0x44/0x45) for byte columns `c0` to `c1` and rows `y0` to `y1` (exclusive).
+
+    :param int flip_rows: Number of display rows when rows are written bottom up (see :func:`config`),
+        row `y` then goes to RAM row ``flip_rows - 1 - y``. Default: `0`, top down.
+    """
+    key = ('window', c0, y0, c1, y1, flip_rows)
+    if flip_rows:
+        first, last = flip_rows - 1 - y0, flip_rows - y1
+    else:
+        first, last = y0, y1 - 1
+    return _cached(_windows, key, lambda: (
+        (0x44, bytes((c0, c1 - 1))),  # Set RAM X Start/End
+        (0x45, struct.pack('<HH', first, last)),  # Set RAM Y Start/End
+    ), _WINDOW_CACHE_SIZE)
+
+
+def ram_pointer(c0, y0, flip_rows=0):
+    """RAM pointer commands (0x4e/0x4f) for byte column `c0` and row `y0`, see :func:`ram_window`."""
+    key = ('pointer', c0, y0, flip_rows)
+    return _cached(_windows, key, lambda: (
+        (0x4e, bytes((c0,))),  # Set RAM X Pointer Start
+        (0x4f, struct.pack('<H', flip_rows - 1 - y0 if flip_rows else y0)),  # Set RAM Y Pointer Start
+    ), _WINDOW_CACHE_SIZE)
+
+
+# Largest RAM a single-step pattern fill covers, steps of 400 sources by 300 gates
+PATTERN_FILL_SIZE = (400, 300)
+
+
+def pattern_fill(command, value):
+    """Auto write command (0x47 black/white RAM, 0x46 red/yellow RAM) that fills the whole RAM with one value.
+
+    The controller writes a checkerboard of steps into the RAM by itself, with a single step
+    of the largest size (step height and width 0b110) the whole RAM takes the value of the
+    first step. BUSY is high while it writes. Only covers displays up to :data:`PATTERN_FILL_SIZE`.
+
+    :param int command: 0x24 or 0x26, the RAM to fill.
+    :param int value: 0x00 or 0xFF.
+    :return: (command, data) pair.
+    """
+    return (0x47 if command == 0x24 else 0x46), (b'\xe6' if value else b'\x66')
+
+
+def to_displayio(commands, delay_ms=None):
+    """Serialize commands in the ``displayio`` init sequence format.
+
+    :param commands: Iterable of (command, data) pairs.
+    :param delay_ms: Optional dict of command to delay after it in milliseconds (max 255).
+    """
+    sequence = bytearray()
+    for command, data in commands:
+        delay = delay_ms.get(command) if delay_ms else None
+        sequence.append(command)
+        sequence.append(len(data) | (0x80 if delay is not None else 0))
+        sequence.extend(data)
+        if delay is not None:
+            sequence.append(delay)
+    return bytes(sequence)
+
+
+def start_sequence(width, height, colour, lut, border):
+    """Start sequence for a ``displayio.EPaperDisplay``, compiled once and cached.
+
+    Resets the controller, configures it and sets the RAM window to the whole display.
+    """
+    key = ('start', width, height, colour, lut, border)
+    return _cached(_compiled, key, lambda: (
+        to_displayio(((0x12, b''),), {0x12: 0x80}) * 2  # Software reset
+        + to_displayio(config(height, colour, lut, border, (width, height)))
+        + to_displayio(ram_window(0, 0, (width + 7) >> 3, height))
+    ))
+
+
+def find_command(sequence, command):
+    """Find the data of a command in a ``displayio`` init sequence.
+
+    :return: Offset of the first data byte.
+    """
+    i = 0
+    while i < len(sequence):
+        length = sequence[i + 1]
+        if sequence[i] == command:
+            return i + 2
+        i += 2 + (length & 0x7F) + (1 if length & 0x80 else 0)
+    raise ValueError('Command 0x{:02x} not in sequence'.format(command))
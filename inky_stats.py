@@ -0,0 +1,123 @@
+"""Refresh instrumentation for Inky displays.
+
+Assign a :class:`Stats` to the `stats` attribute of :class:`inky.Inky` or
+:class:`ssd1619a.SSD1619A` to record how long each phase of a refresh takes
+and how much is sent to the display. Drivers skip all bookkeeping while
+`stats` is `None`, which is the default.
+
+    screen.stats = inky_stats.Stats(trace_size=32)
+    screen.show()
+    print(screen.stats)
+"""
+
+try:
+    from supervisor import ticks_ms
+except ImportError:
+    import time
+
+    def ticks_ms():
+        """Millisecond counter, wraps around like supervisor.ticks_ms()."""
+        return int(time.monotonic() * 1000) % _TICKS_PERIOD
+
+_TICKS_PERIOD = 1 << 29  # supervisor.ticks_ms() wraps around
+
+
+def ticks_diff(end, start):
+    """Milliseconds between two ticks_ms() values."""
+    return (end - start) % _TICKS_PERIOD
+
+
+class Stats:
+    """Timings and counters for display refreshes.
+
+    Phases recorded by the drivers (in ms, for the last refresh):
+
+    * ``setup``: reset and configuration of the controller
+    * ``pack``: splitting the image into packed planes
+    * ``load``: reading a frame from an :class:`inky_cache.FrameCache`
+    * ``transfer_bw``, ``transfer_colour``: writing the black/white and red/yellow RAM
+    * ``refresh``: the ``displayio`` refresh call of :class:`ssd1619a.SSD1619A`
+    * ``busy``: waiting for the display to finish the update
+
+    With an :class:`inky_policy.RefreshPolicy`, :attr:`waveform` and :attr:`reason` tell which
+    waveform it picked for the last refresh and why, :attr:`decisions` counts the reasons.
+
+    :param int trace_size: Number of recent commands to keep in :attr:`trace`, `0` for none.
+    """
+
+    def __init__(self, trace_size=0):
+        self.timings = {}
+        self.refreshes = 0
+        # Totals since creation or reset()
+        self.commands = 0
+        self.bytes = 0
+        self.bytes_saved = 0
+        # Counters for the last refresh
+        self.refresh_commands = 0
+        self.refresh_bytes = 0
+        self.refresh_bytes_saved = 0
+        # Refresh policy decisions
+        self.decisions = {}
+        self.waveform = None
+        self.reason = None
+        self._trace = [None] * trace_size
+        self._trace_index = 0
+
+    def begin(self):
+        """Start recording a new refresh."""
+        self.timings.clear()
+        self.refresh_commands = 0
+        self.refresh_bytes = 0
+        self.refresh_bytes_saved = 0
+        self.waveform = None
+        self.reason = None
+
+    def phase(self, name, start):
+        """Add the time since `start` (a ticks_ms() value) to a phase of this refresh."""
+        self.timings[name] = self.timings.get(name, 0) + ticks_diff(ticks_ms(), start)
+
+    def command(self, command, length):
+        """Count a command and `length` bytes of data sent to the display."""
+        self.commands += 1
+        self.bytes += 1 + length
+        self.refresh_commands += 1
+        self.refresh_bytes += 1 + length
+        if self._trace:
+            self._trace[self._trace_index] = (ticks_ms(), command, length)
+            self._trace_index = (self._trace_index + 1) % len(self._trace)
+
+    def saved(self, length):
+        """Count `length` bytes that didn't have to be sent, because the display RAM already held them."""
+        self.bytes_saved += length
+        self.refresh_bytes_saved += length
+
+    def decision(self, waveform, reason):
+        """Record the waveform a refresh policy picked for this refresh and why."""
+        self.waveform = waveform
+        self.reason = reason
+        self.decisions[reason] = self.decisions.get(reason, 0) + 1
+
+    @property
+    def trace(self):
+        """Recent commands as (ticks_ms, command, data length), oldest first."""
+        index = self._trace_index
+        return [entry for entry in self._trace[index:] + self._trace[:index] if entry is not None]
+
+    def reset(self):
+        """Clear all timings, counters and the trace."""
+        self.begin()
+        self.refreshes = 0
+        self.commands = 0
+        self.bytes = 0
+        self.bytes_saved = 0
+        self.decisions = {}
+        self._trace = [None] * len(self._trace)
+        self._trace_index = 0
+
+    def __repr__(self):
+        text = 'Refreshes: {} Commands: {} ({} last refresh) Bytes: {} ({} last refresh) Saved: {} ({} last refresh) Timings (ms): {}'.format(
+            self.refreshes, self.commands, self.refresh_commands, self.bytes, self.refresh_bytes, self.bytes_saved,
+            self.refresh_bytes_saved, self.timings)
+        if self.decisions:
+            text += ' Waveform: {} ({}) Decisions: {}'.format(self.waveform, self.reason, self.decisions)
+        return text
@@ -0,0 +1,148 @@
+"""SPI and GPIO transport for Inky e-Ink displays.
+
+:class:`inky.Inky` talks to the display controller through a transport with
+four operations: ``setup()``, ``reset()``, ``write(dc, buffer, start, end)``
+and a ``busy`` property, ``read(command, length)`` is only needed to read the
+temperature sensor. Used as a context manager (``with transport:``) a
+transport keeps the bus for all writes inside, :class:`inky.Inky` does that
+for each RAM write. :class:`SPITransport` drives a real display, the host
+implementation in :mod:`inky_host` records everything instead.
+"""
+
+import time
+import board
+from digitalio import DigitalInOut, Direction
+from adafruit_bus_device.spi_device import SPIDevice
+
+from inky_stats import ticks_diff, ticks_ms
+
+_SPI_CHUNK_SIZE = 4096
+_SPI_BAUDRATE = 488000
+MAX_BAUDRATE = 20000000  # Fastest SSD1619A write clock, the wiring usually allows less
+
+
+class SPITransport:
+    """Display controller on an SPI bus, with data/command, reset and busy pins.
+
+    The SPI device is created once. Each write, or all writes inside a ``with transport:``
+    block, takes the bus and asserts chip select once, however many chunks it is sent in.
+
+    :param spi_bus: SPI bus, default: `board.SPI()` on first use.
+    :param cs_pin: Chip select pin.
+    :param dc_pin: Data/command pin.
+    :param reset_pin: Reset pin.
+    :param busy_pin: Busy pin.
+    :param int baudrate: SPI clock, up to :data:`MAX_BAUDRATE`. Long wires may need less. Default: `488000`.
+    :param int chunk_size: Bytes per SPI write call, some ports limit the size of a transfer. Default: `4096`.
+    """
+
+    def __init__(self, spi_bus, cs_pin, dc_pin, reset_pin, busy_pin, baudrate=_SPI_BAUDRATE, chunk_size=_SPI_CHUNK_SIZE):
+        if not 0 < baudrate <= MAX_BAUDRATE:
+            raise ValueError('Baudrate {} is not supported!'.format(baudrate))
+        self.spi_bus = spi_bus
+        self.baudrate = baudrate
+        self.chunk_size = chunk_size
+        self.frequency = None  # Clock the bus actually runs at, known after the first write
+        self.dc_pin = DigitalInOut(dc_pin)
+        self.reset_pin = DigitalInOut(reset_pin)
+        self.busy_pin = DigitalInOut(busy_pin)
+        self.cs_pin = DigitalInOut(cs_pin)
+        self._gpio_setup = False
+        self._device = None
+        self._spi = None  # The configured bus while it is held
+        self._depth = 0
+        self._start = None
+        # Throughput counters, see throughput
+        self.bytes_written = 0
+        self.write_ms = 0
+
+    def setup(self):
+        """Set up the GPIO pins and SPI bus, once."""
+        if self._gpio_setup:
+            return
+        self.dc_pin.direction = Direction.OUTPUT
+        self.dc_pin.value = False
+        self.reset_pin.direction = Direction.OUTPUT
+        self.reset_pin.value = True
+        self.busy_pin.direction = Direction.INPUT
+
+        if self.spi_bus is None:
+            self.spi_bus = board.SPI()
+        self._device = SPIDevice(spi=self.spi_bus, chip_select=self.cs_pin, baudrate=self.baudrate)
+
+        self._gpio_setup = True
+
+    def reset(self):
+        """Hardware reset of the display controller."""
+        self.reset_pin.value = False
+        time.sleep(0.1)
+        self.reset_pin.value = True
+        time.sleep(0.1)
+
+    @property
+    def busy(self):
+        """True while the controller is busy."""
+        return self.busy_pin.value
+
+    @property
+    def throughput(self):
+        """Bytes per second written since the last :meth:`clear_counters`, including bus and chip select overhead.
+        `None` until enough has been written to time it.
+        """
+        if not self.write_ms:
+            return None
+        return self.bytes_written * 1000 // self.write_ms
+
+    def clear_counters(self):
+        """Start measuring :attr:`throughput` again."""
+        self.bytes_written = 0
+        self.write_ms = 0
+
+    def __enter__(self):
+        """Take the bus and assert chip select until the matching ``__exit__``, blocks can be nested."""
+        if not self._depth:
+            self._spi = self._device.__enter__()
+            self.frequency = getattr(self._spi, 'frequency', self.baudrate)
+            self._start = ticks_ms()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if not self._depth:
+            self._device.__exit__(*exc)
+            self._spi = None
+            self.write_ms += ticks_diff(ticks_ms(), self._start)
+
+    def read(self, command, length):
+        """Send a command and read the data the controller answers with.
+        The SSD1619A has no data out pin, it answers on its bidirectional SDA line (MOSI on the Inky header).
+        MISO must be tied to that line, with a resistor (1-10k) between it and the board's MOSI pin.
+
+        :param int command: command byte
+        :param int length: number of bytes to read
+        :return: bytearray of `length` bytes.
+        """
+        data = bytearray(length)
+        with self:
+            self.write(False, bytes((command,)))
+            self.dc_pin.value = True
+            self._spi.readinto(data)
+        return data
+
+    def write(self, dc, values, start=0, end=None):
+        """Write values over SPI.
+
+        :param bool dc: whether to write as data (True) or command (False)
+        :param values: buffer of values to write, written in place without copying
+        :param int start: index of the first value to write, default: `0`.
+        :param int end: index after the last value to write, default: `len(values)`.
+        """
+        self.dc_pin.value = dc
+
+        transferLength=len(values) if end is None else end
+        with self:
+            for offset in range(start, transferLength, self.chunk_size):
+                # Chunked transfer, chip select stays asserted
+                self._spi.write(buffer=values, start=offset, end=min(offset+self.chunk_size, transferLength))
+        self.bytes_written += max(transferLength - start, 0)
@@ -26,75 +26,60 @@ Implementation Notes
 """
 
 import displayio
-import microcontroller
 import supervisor, time
 
+import inky_sequence
+from inky_stats import ticks_diff
+
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/alanta/CircuitPython_InkyWhat.git"
 
-_START_SEQUENCE = (
-    b"\x12\x80\x80"  # Software reset ✅ TODO wait for busy instead of fixed delay
-    b"\x12\x80\x80"  # Software reset ✅ TODO wait for busy instead of fixed delay
-    b"\x74\x01\x54"  # set analog block control ✅
-    b"\x7e\x01\x3b"  # set digital block control ✅
-    b"\x01\x03\x2b\x01\x00"  # driver output control 
-    b"\x03\x01\x17"  # Gate driving voltage ✅
-    b"\x04\x03\x07\xac\x32"  # Source Driving voltage ✅
-    b"\x3a\x01\x07"  # Dummy line period ✅
-    b"\x3b\x01\x04"  # Gate line width ✅
-    b"\x3c\x01\x00"  # Border color
-    b"\x2c\x01\x3c"  # VCOM Register, 0x3c = -1.5v? ✅
-    b"\x22\x01\xc7"  # Display update sequence ✅
-    
-    b"\x04\x03\x07\xac\x32" # Set voltage of VSH and VSL (yellow)
-    #LUT (yellow)
-    b"\x32\x46"
-       b"\xfa\x94\x8c\xc0\xd0\x00\x00"
-       b"\xfa\x94\x2c\x80\xe0\x00\x00"
-       b"\xfa\x00\x00\x00\x00\x00\x00"
-       b"\xfa\x94\xf8\x80\x50\x00\xcc"
-       b"\xbf\x58\xfc\x80\xd0\x00\x11"
-       b"\x40\x10\x40\x10\x08"
-       b"\x08\x10\x04\x04\x10"
-       b"\x08\x08\x03\x08\x20"
-       b"\x08\x04\x00\x00\x10"
-       b"\x10\x08\x08\x00\x20"
-       b"\x00\x00\x00\x00\x00"
-       b"\x00\x00\x00\x00\x00"
-    
-    b"\x11\x01\x03"  # Data entry mode setting 0x03 = X/Y increment ✅
-    #         self._send_command(0x44, [0x00, (self.cols // 8) - 1])  # Set RAM X Start/End
-    b"\x44\x02\x00\x31"  # Set RAM X Start/End
-    #         self._send_command(0x45, [0x00, 0x00] + packed_height)  # Set RAM Y Start/End
-    b"\x45\x04\x00\x00\x2b\x01"  # Set RAM Y Start/End
-)
-
 _STOP_SEQUENCE = b"\x10\x01\x01"  # Enter deep sleep ✅
 
+_BUSY_POLL_INTERVAL = 0.01  # seconds
+_LUT_LENGTH = 70
+
 
 # pylint: disable=too-few-public-methods
 class SSD1619A(displayio.EPaperDisplay):
-    """SSD1619A driver"""
-
-    def __init__(self, bus: displayio.FourWire, color:str, **kwargs) -> None:
+    """SSD1619A driver
+
+    :param bus: The display bus.
+    :param str color: One of 'red', 'black' or 'yellow'.
+    :param str lut: Waveform for full refreshes, a key of :data:`inky_sequence.LUTS`. Default: `color`,
+        the red high temperature panels need 'red_ht', see :meth:`inky_eeprom.EPDType.get_lut`.
+    :param bool partial_update: Only write the areas of the display RAM that changed since the last
+        refresh. ``displayio`` then sets the RAM X/Y window (0x44/0x45) and pointers for each dirty
+        area it tracks instead of sending the whole frame. Only for displays less than 256 pixels wide:
+        from a RAM width of 256 ``displayio`` sends 16 bit column addresses, while 0x44 takes one byte
+        for the start and one for the end. Default: `False`.
+    :raises ValueError: if `partial_update` is set for a display 256 pixels wide or more.
+    """
+
+    def __init__(self, bus: displayio.FourWire, color:str, partial_update:bool=False, lut:str=None, **kwargs) -> None:
 
         if color not in ('red', 'black', 'yellow'):
             raise ValueError('Colour {} is not supported!'.format(color))
+        if lut is None:
+            lut = color
+        if lut not in inky_sequence.LUTS:
+            raise ValueError('Waveform {} is not supported!'.format(lut))
         self.color=color
+        self.lut = lut
 
         width = kwargs["width"]
         height = kwargs["height"]
-        
-        #print('width: {:0} height: {:0}'.format(width, height))
-        
-        start_sequence = bytearray(_START_SEQUENCE)
-        #start_sequence[14] = (height-1) & 0xFF
-        #start_sequence[15] = ((height-1) >> 8) & 0xFF
-
-        
 
-        #print('packed_height: \\x{:02x}\\x{:02x}'.format(start_sequence[10], start_sequence[11]))
+        # Compiled once per colour and size, copied so set_update_mode() can swap the LUT
+        start_sequence = bytearray(inky_sequence.start_sequence(width, height, color, lut, inky_sequence.BLACK))
 
+        if partial_update:
+            if width >= 256:
+                raise ValueError('partial_update needs a display less than 256 pixels wide, not {}'.format(width))
+            # The SSD1619A takes the RAM X window in bytes and row addresses as 16 bit little endian
+            kwargs.setdefault("set_column_window_command", 0x44)
+            kwargs.setdefault("set_row_window_command", 0x45)
+            kwargs.setdefault("address_little_endian", True)
 
         stop_sequence = _STOP_SEQUENCE
         try:
@@ -102,102 +87,23 @@ class SSD1619A(displayio.EPaperDisplay):
         except RuntimeError:
             stop_sequence = b""
 
-        """Inky Lookup Tables.
-        These lookup tables comprise of two sets of values.
-        The first set of values, formatted as binary, describe the voltages applied during the six update phases:
-          Phase 0     Phase 1     Phase 2     Phase 3     Phase 4     Phase 5     Phase 6
-          A B C D
-        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,  LUT0 - Black
-        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,  LUT1 - White
-        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  NOT USED BY HARDWARE
-        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,  LUT3 - Yellow or Red
-        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  LUT4 - VCOM
-        There are seven possible phases, arranged horizontally, and only the phases with duration/repeat information
-        (see below) are used during the update cycle.
-        Each phase has four steps: A, B, C and D. Each step is represented by two binary bits and these bits can
-        have one of four possible values representing the voltages to be applied. The default values follow:
-        0b00: VSS or Ground
-        0b01: VSH1 or 15V
-        0b10: VSL or -15V
-        0b11: VSH2 or 5.4V
-        During each phase the Black, White and Yellow (or Red) stages are applied in turn, creating a voltage
-        differential across each display pixel. This is what moves the physical ink particles in their suspension.
-        The second set of values, formatted as hex, describe the duration of each step in a phase, and the number
-        of times that phase should be repeated:
-          Duration                Repeat
-          A     B     C     D
-        0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 0
-        0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 1
-        0x04, 0x08, 0x08, 0x10, 0x10,      etc
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        The duration and repeat parameters allow you to take a single sequence of A, B, C and D voltage values and
-        transform them into a waveform that - effectively - wiggles the ink particles into the desired position.
-        In all of our LUT definitions we use the first and second phases to flash/pulse and clear the display to
-        mitigate image retention. The flashing effect is actually the ink particles being moved from the bottom to
-        the top of the display repeatedly in an attempt to reset them back into a sensible resting position.
-        """
-        self._luts = {
-            'black': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x10, 0x04, 0x04, 0x04, 0x04,
-                0x10, 0x04, 0x04, 0x04, 0x04,
-                0x04, 0x08, 0x08, 0x10, 0x10,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-            ],
-            'red': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x40, 0x0C, 0x20, 0x0C, 0x06,
-                0x10, 0x08, 0x04, 0x04, 0x06,
-                0x04, 0x08, 0x08, 0x10, 0x10,
-                0x02, 0x02, 0x02, 0x40, 0x20,
-                0x02, 0x02, 0x02, 0x02, 0x02,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00
-            ],
-            'red_ht': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00010000, 0b00010000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b10000000, 0b10000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b01001000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x43, 0x0A, 0x1F, 0x0A, 0x04,
-                0x10, 0x08, 0x04, 0x04, 0x06,
-                0x04, 0x08, 0x08, 0x10, 0x0B,
-                0x02, 0x04, 0x04, 0x40, 0x10,
-                0x06, 0x06, 0x06, 0x02, 0x02,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00
-            ],
-            'yellow': [
-                0b11111010, 0b10010100, 0b10001100, 0b11000000, 0b11010000, 0b00000000, 0b00000000,
-                0b11111010, 0b10010100, 0b00101100, 0b10000000, 0b11100000, 0b00000000, 0b00000000,
-                0b11111010, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b11111010, 0b10010100, 0b11111000, 0b10000000, 0b01010000, 0b00000000, 0b11001100,
-                0b10111111, 0b01011000, 0b11111100, 0b10000000, 0b11010000, 0b00000000, 0b00010001,
-                0x40, 0x10, 0x40, 0x10, 0x08,
-                0x08, 0x10, 0x04, 0x04, 0x10,
-                0x08, 0x08, 0x03, 0x08, 0x20,
-                0x08, 0x04, 0x00, 0x00, 0x10,
-                0x10, 0x08, 0x08, 0x00, 0x20,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-            ]
-        }
-
+        # displayio sends the start sequence from this buffer on every refresh,
+        # set_update_mode() swaps the LUT in place.
+        self._start_sequence = start_sequence
+        self._lut_offset = inky_sequence.find_command(start_sequence, 0x32)
+        self._lut = None  # (LUT, temperature band) in the start sequence
+        # Temperature in degrees C the waveform is adjusted to, a number or a function that reads a sensor.
+        # None uses the waveforms as they are.
+        self.temperature = None
+        self.temperature_band = None
+        self.update_mode = 'full'
+        self.full_every = 0
+        self.last_update_mode = None
+        self._fast_updates = 0
+        # Assign an inky_policy.RefreshPolicy to choose the waveform by the ghosting history instead
+        self.refresh_policy = None
+        # Instrumentation, assign an inky_stats.Stats to record refreshes
+        self.stats = None
 
         super().__init__(
             bus,
@@ -216,10 +122,117 @@ class SSD1619A(displayio.EPaperDisplay):
 
         )
     
+    def set_update_mode(self, mode:str, full_every:int=10) -> None:
+        """Select the waveform used to refresh the display.
+
+        'fast' uses a short black/white waveform that doesn't drive red/yellow pixels, so updates
+        are much quicker but leave some ghosting. The first refresh and every refresh after
+        `full_every` fast ones use the full waveform.
+
+        :param str mode: One of 'full' or 'fast'.
+        :param int full_every: Number of fast refreshes before a full refresh clears the ghosting,
+            `0` to never force a full refresh. Default: `10`.
+
+        The mode is ignored while a :attr:`refresh_policy` is assigned.
+        """
+        if mode not in ('full', 'fast'):
+            raise ValueError('Update mode {} is not supported!'.format(mode))
+        self.update_mode = mode
+        self.full_every = full_every
+        self._fast_updates = 0
+
+    def set_temperature(self, celsius) -> None:
+        """Adjust the waveform to the temperature of the display, from an external sensor.
+
+        Cold displays get longer phases for full colour, warm displays shorter ones for quicker refreshes.
+        The controller's own sensor can't be read through ``displayio``.
+
+        :param celsius: Temperature in degrees C, a function returning it (called before every refresh),
+            or `None` to use the waveforms as they are.
+        """
+        self.temperature = celsius
+
+    def refresh(self, colour_changed:bool=None) -> None:
+        """Refresh the display with the waveform selected by :meth:`set_update_mode` or the :attr:`refresh_policy`.
+
+        :param bool colour_changed: Whether the red/yellow content changed since the last refresh, for the
+            :attr:`refresh_policy`. ``displayio`` doesn't tell, and the fast waveform doesn't draw red/yellow,
+            so on red and yellow displays the policy always picks a full refresh unless this is `False`.
+            Default: `None`, unknown.
+        """
+        decision = None
+        if self.refresh_policy is not None:
+            if colour_changed is None:
+                colour_changed = self.color != 'black'
+            # displayio doesn't say which rows changed, every refresh counts for the whole panel
+            decision = self.refresh_policy.decide(self.height, colour_changed=colour_changed,
+                                                  known=self.last_update_mode is not None)
+            fast = decision[0] == 'fast'
+        else:
+            fast = (self.update_mode == 'fast' and self.last_update_mode is not None
+                    and not (self.full_every and self._fast_updates >= self.full_every))
+        temperature = self.temperature() if callable(self.temperature) else self.temperature
+        self.temperature_band = inky_sequence.temperature_band(temperature)
+        lut = ('fast' if fast else self.lut, self.temperature_band)
+        if lut != self._lut:
+            self._start_sequence[self._lut_offset:self._lut_offset + _LUT_LENGTH] = inky_sequence.waveform(*lut)
+            self._lut = lut
+        stats = self.stats
+        if stats is not None:
+            stats.begin()
+            stats.refreshes += 1
+            if decision is not None:
+                stats.decision(*decision)
+            start = supervisor.ticks_ms()
+        super().refresh()
+        if stats is not None:
+            stats.phase('refresh', start)
+        self._fast_updates = self._fast_updates + 1 if fast else 0
+        self.last_update_mode = 'fast' if fast else 'full'
+
     def busy_wait(self):
         """Wait for busy/wait pin."""
         start= supervisor.ticks_ms()
         while self.busy == True:
-            time.sleep(0.01)
-        stop = supervisor.ticks_ms()
-        print("Waited for busy: ", (stop - start)/1000)
\ No newline at end of file
+            time.sleep(_BUSY_POLL_INTERVAL)
+        if self.stats is not None:
+            self.stats.phase('busy', start)
+
+    async def wait_idle(self, timeout:float=None) -> bool:
+        """Wait for the display to finish refreshing, yielding to other tasks while polling busy.
+
+        :param float timeout: Seconds to wait, default: wait forever.
+        :return: False if the display was still busy after `timeout`.
+        """
+        import asyncio  # Only needed by the asyncio API
+
+        start = supervisor.ticks_ms()
+        while self.busy:
+            if timeout is not None and ticks_diff(supervisor.ticks_ms(), start) > timeout * 1000:
+                return False
+            await asyncio.sleep(_BUSY_POLL_INTERVAL)
+        if self.stats is not None:
+            self.stats.phase('busy', start)
+        return True
+
+    async def refresh_async(self, timeout:float=None, callback=None, colour_changed:bool=None) -> None:
+        """Refresh the display without blocking the asyncio event loop.
+
+        Waits until the display accepts a new refresh (see ``time_to_refresh``) and the previous
+        refresh has finished, refreshes and then waits for the display to become idle.
+
+        :param float timeout: Seconds to wait for the display each time it is busy, default: wait forever.
+        :param callback: Called with this display when the refresh has finished, default: `None`.
+        :param bool colour_changed: Whether the red/yellow content changed, see :meth:`refresh`.
+        :raises TimeoutError: if the display is still busy after `timeout`.
+        """
+        import asyncio  # Only needed by the asyncio API
+
+        await asyncio.sleep(self.time_to_refresh)
+        if not await self.wait_idle(timeout):
+            raise TimeoutError('Display still busy after {}s'.format(timeout))
+        self.refresh(colour_changed)
+        if not await self.wait_idle(timeout):
+            raise TimeoutError('Display still busy after {}s'.format(timeout))
+        if callback is not None:
+            callback(self)
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""Tests of the benchmark models, on a computer. Run with ``pytest``."""
+
+import benchmark
+
+
+def test_ssd1619a_phat_geometry():
+    # The RAM of both planes is written for the panel: 104 sources (13 bytes) by 212 gates on the pHAT.
+    # Everything else is the same commands at every size.
+    phat = benchmark.bench_ssd1619a((212, 104), 'red', 488000)
+    what = benchmark.bench_ssd1619a((400, 300), 'red', 488000)
+    assert phat['bytes'] - 2 * 13 * 212 == what['bytes'] - 2 * 50 * 300
+
+
+def test_inky_results():
+    result = benchmark.bench_inky((400, 300), 'red', 488000, repeat=1)
+    assert 'pack_plane_ms' not in result
+    assert result['pack_ms'] >= 0
+    assert result['delta_bytes'] < result['bytes']
@@ -0,0 +1,365 @@
+"""Tests of the Inky driver on a computer, through :class:`inky_host.HostTransport`.
+
+Run with ``pytest`` from the repository root, needs numpy.
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+import inky
+import inky_cache
+import inky_host
+import inky_policy
+import inky_sequence
+import inky_stats
+
+
+def _source(width, height):
+    """Bitmap of every colour that looks different turned or mirrored in any way."""
+    image = inky_host.Bitmap(width, height, 4)
+    for y in range(height):
+        for x in range(width):
+            image[x, y] = (x * 7 + y * 3 + x * y // 11) // 5 % 3
+    return image
+
+
+def _pixels(bitmap):
+    """Pixels of a bitmap as a 2D array, row by row."""
+    return np.array([[bitmap[x, y] for x in range(bitmap.width)] for y in range(bitmap.height)], dtype=np.uint8)
+
+
+def _panel(pixels, screen):
+    """What the panel should show for an image: mirrored as viewed, then turned counter clockwise."""
+    if screen.h_flip:
+        pixels = pixels[:, ::-1]
+    if screen.v_flip:
+        pixels = pixels[::-1, :]
+    return np.rot90(pixels, screen.rotation // 90)
+
+
+def _display(resolution=(212, 104), **options):
+    cols, rows, _ = inky._RESOLUTION[resolution]
+    transport = inky_host.HostTransport(cols, rows)
+    return inky.Inky(resolution, 'red', transport=transport, **options), transport
+
+
+ORIENTATIONS = [(rotation, h_flip, v_flip) for rotation in (0, 90, 180, 270)
+                for h_flip in (False, True) for v_flip in (False, True)]
+
+
+@pytest.mark.parametrize('rotation, h_flip, v_flip', ORIENTATIONS)
+def test_show_orientation(rotation, h_flip, v_flip):
+    screen, transport = _display(rotation=rotation, h_flip=h_flip, v_flip=v_flip)
+    source = _source(screen.width, screen.height)
+    screen.set_image(source)
+    screen.show()
+    assert np.array_equal(_pixels(transport.image()), _panel(_pixels(source), screen))
+
+
+def test_show_orientation_wide():
+    screen, transport = _display((400, 300), h_flip=True)
+    source = _source(screen.width, screen.height)
+    screen.set_image(source)
+    screen.show()
+    assert np.array_equal(_pixels(transport.image()), _panel(_pixels(source), screen))
+
+
+@pytest.mark.parametrize('rotation, h_flip, v_flip', ORIENTATIONS)
+def test_show_region(rotation, h_flip, v_flip):
+    screen, transport = _display(rotation=rotation, h_flip=h_flip, v_flip=v_flip)
+    screen.show(force=True)
+    source = _source(screen.width, screen.height)
+    screen.set_image(source)
+    x, y, w, h = screen.show_region(21, 13, 30, 17)
+    assert x <= 21 and y <= 13 and x + w >= 51 and y + h >= 30
+
+    expected = np.zeros((screen.height, screen.width), dtype=np.uint8)
+    expected[y:y + h, x:x + w] = _pixels(source)[y:y + h, x:x + w]
+    assert np.array_equal(_pixels(transport.image()), _panel(expected, screen))
+
+
+@pytest.mark.parametrize('rotation, v_flip', [(0, False), (0, True), (180, False), (180, True)])
+def test_show_stream(rotation, v_flip):
+    screen, transport = _display((400, 300), framebuffer=False, rotation=rotation, v_flip=v_flip)
+    pixels = _pixels(_source(screen.width, screen.height))
+    screen.show_stream(lambda y0, y1: pixels[y0:y1], band_rows=24)
+    assert np.array_equal(_pixels(transport.image()), _panel(pixels, screen))
+
+
+def test_show_stream_rejects_turned_image():
+    screen, transport = _display(framebuffer=False)
+    with pytest.raises(ValueError):
+        screen.show_stream(lambda y0, y1: np.zeros((y1 - y0, screen.width), dtype=np.uint8))
+
+
+@pytest.mark.parametrize('rotation, h_flip', [(0, False), (90, True), (270, False)])
+def test_show_cached(tmp_path, rotation, h_flip):
+    cache = inky_cache.FrameCache(str(tmp_path / 'frames'))
+    screen, transport = _display(rotation=rotation, h_flip=h_flip)
+    screen.frame_cache = cache
+    source = _source(screen.width, screen.height)
+    screen.set_image(source)
+    screen.cache_frame('menu')
+    screen.set_image(inky_host.Bitmap(screen.width, screen.height, 4))
+    screen.show()
+    assert not any(transport.bw_ram) and not any(transport.colour_ram)
+
+    screen.show_cached('menu')
+    expected = _panel(_pixels(source), screen)
+    assert np.array_equal(_pixels(transport.image()), expected)
+
+    # Without a frame buffer the cached planes are streamed band by band
+    streamed, streamed_transport = _display(framebuffer=False, rotation=rotation, h_flip=h_flip)
+    streamed.frame_cache = cache
+    streamed.show_cached('menu', band_rows=7)
+    assert np.array_equal(_pixels(streamed_transport.image()), expected)
+
+
+@pytest.mark.parametrize('v_flip, entry_mode, y_window, y_pointer', [
+    (False, b'\x03', b'\x0a\x00\x0e\x00', b'\x0a\x00'),  # Rows 10 to 14, top down
+    (True, b'\x01', b'\x21\x01\x1d\x01', b'\x21\x01'),  # Rows 289 to 285, bottom up
+])
+def test_show_region_commands(v_flip, entry_mode, y_window, y_pointer):
+    screen, transport = _display((400, 300), v_flip=v_flip)
+    screen.show()
+    for y in range(10, 15):
+        for x in range(16, 32):
+            screen.buf[x, y] = inky.RED if x < 24 else inky.BLACK
+    transport.clear_log()
+    assert screen.show_region(16, 10, 16, 5) == (16, 10, 16, 5)
+
+    commands = transport.commands()
+    sent = dict(commands)
+    assert sent[0x11] == entry_mode
+    assert sent[0x44] == b'\x02\x03'  # Byte columns 2 to 3
+    assert sent[0x45] == y_window
+    ram = [(command, data) for command, data in commands if command in (0x4e, 0x4f, 0x24, 0x26)]
+    assert ram == [
+        (0x4e, b'\x02'), (0x4f, y_pointer), (0x24, b'\xff' * 10),
+        (0x4e, b'\x02'), (0x4f, y_pointer), (0x26, b'\xff\x00' * 5),
+    ]
+
+
+def test_fast_update_commands():
+    screen, transport = _display()
+    screen.stay_awake = True
+    screen.set_update_mode('fast', full_every=2)
+    luts, modes = [], []
+    for refresh in range(4):
+        screen.set_pixel(refresh, 0, inky.BLACK)
+        transport.clear_log()
+        screen.show()
+        sent = dict(transport.commands())
+        luts.append(sent.get(0x32))
+        modes.append(screen.last_update_mode)
+        if screen.last_update_mode == 'fast':
+            assert 0x26 not in sent  # Red/yellow RAM retained
+    assert modes == ['full', 'fast', 'fast', 'full']
+    assert luts[0] == inky_sequence.LUTS['red']
+    assert luts[1] == inky_sequence.LUTS['fast']
+    assert luts[2] is None  # Still loaded
+    assert luts[3] == inky_sequence.LUTS['red']  # After full_every fast refreshes
+
+
+def test_alloc_delta_never_negative(monkeypatch):
+    screen, transport = _display()
+    heap = iter([5000, 4000, 1000])  # A collection while sending frees more than was allocated
+    monkeypatch.setattr(inky, '_mem_alloc', lambda: next(heap))
+    screen.show()
+    assert screen.alloc_delta == 0
+
+
+def test_read_temperature():
+    screen, transport = _display()
+    transport.temperature = -3.5
+    assert screen.read_temperature() == -3.5
+    assert transport.asleep  # Put back to sleep, it was only woken for the reading
+
+
+@pytest.mark.parametrize('celsius, band', [(0, 0), (10, 1), (20, 2), (35, 3)])
+def test_temperature_band_lut(celsius, band):
+    screen, transport = _display()
+    transport.temperature = celsius
+    screen.set_temperature(screen.read_temperature)
+    transport.clear_log()
+    screen.show(force=True)
+    assert screen.temperature_band == band
+    assert dict(transport.commands())[0x32] == inky_sequence.waveform('red', band)
+
+
+def test_temperature_lut_sent_on_band_change():
+    screen, transport = _display()
+    screen.stay_awake = True
+    luts = []
+    for celsius in (20, 25, 2, 4, 20):
+        screen.set_temperature(celsius)
+        transport.clear_log()
+        screen.show(force=True)
+        luts.append(dict(transport.commands()).get(0x32))
+    waveforms = [inky_sequence.waveform('red', band) for band in (2, 0)]
+    assert luts == [waveforms[0], None, waveforms[1], None, waveforms[0]]
+
+
+def test_show_async_overlaps():
+    screen, transport = _display()
+    transport.refresh_time = 0.3
+    ticks, busy = [], []
+
+    async def tick():
+        while transport.refreshes < 2 or screen.busy:
+            ticks.append(None)
+            busy.append(screen.busy)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        ticker = asyncio.create_task(tick())
+        first = asyncio.create_task(screen.show_async(force=True))
+        await asyncio.sleep(0.05)
+        assert screen.busy and transport.busy
+        # Drawn while the first frame refreshes, sent once it is done
+        screen.set_pixel(0, 0, inky.BLACK)
+        await screen.show_async()
+        await first
+        await ticker
+
+    asyncio.run(main())
+    assert transport.refreshes == 2
+    assert np.array_equal(_pixels(transport.image()), _panel(_pixels(screen.buf), screen))
+    assert busy.count(True) > 10  # Other tasks kept running through both refreshes
+    assert not screen.busy
+
+
+def test_wait_idle_timeout():
+    screen, transport = _display()
+    transport.refresh_time = 0.3
+
+    async def main():
+        first = asyncio.create_task(screen.show_async(force=True))
+        await asyncio.sleep(0.05)
+        assert not await screen.wait_idle(timeout=0.05)
+        with pytest.raises(TimeoutError):
+            await screen.show_async(force=True, timeout=0.05)
+        await first
+        assert await screen.wait_idle(timeout=0.05)
+
+    asyncio.run(main())
+    assert transport.refreshes == 1
+
+
+@pytest.mark.parametrize('stay_awake', [False, True])
+def test_stay_awake_register_deltas(stay_awake):
+    screen, transport = _display()
+    screen.stay_awake = stay_awake
+    registers = [command for command, data in inky_sequence.config(screen.rows, 'red', 'red', inky.WHITE)]
+    sent = []
+    for border in (inky.WHITE, inky.WHITE, inky.BLACK):
+        screen.set_border(border)
+        transport.clear_log()
+        screen.show(force=True)
+        sent.append([command for command, data in transport.commands() if command in registers or command == 0x12])
+
+    full = [0x12] + registers
+    if stay_awake:
+        # Awake between refreshes, only the registers that changed are sent again
+        assert sent == [full, [], [0x3c]]
+        assert transport.resets == 1
+    else:
+        assert sent == [full, full, full]
+        assert transport.resets == 3
+
+
+def test_stats():
+    screen, transport = _display()
+    screen.stats = inky_stats.Stats(trace_size=8)
+    screen.show(force=True)
+    stats = screen.stats
+    commands = transport.commands()
+
+    assert set(stats.timings) == {'setup', 'pack', 'transfer_bw', 'transfer_colour', 'busy'}
+    assert stats.refreshes == 1
+    assert stats.refresh_commands == stats.commands == len(commands)
+    assert stats.refresh_bytes == stats.bytes == sum(1 + len(data) for command, data in commands)
+    assert [entry[1:] for entry in stats.trace] == [(command, len(data)) for command, data in commands[-8:]]
+
+    # Nothing changed, nothing sent or counted
+    screen.show()
+    assert stats.refreshes == 1 and stats.commands == len(commands)
+
+    screen.set_pixel(0, 0, inky.BLACK)
+    transport.clear_log()
+    screen.show()
+    assert stats.refreshes == 2
+    assert stats.refresh_bytes_saved > 0  # Only the changed rows were rewritten
+    assert stats.refresh_bytes == sum(1 + len(data) for command, data in transport.commands())
+    assert stats.bytes == stats.refresh_bytes + sum(1 + len(data) for command, data in commands)
+
+    stats.reset()
+    assert (stats.refreshes, stats.commands, stats.bytes, stats.timings, stats.trace) == (0, 0, 0, {}, [])
+
+
+@pytest.mark.parametrize('colour, shown', [
+    ('red', [inky.WHITE, inky.BLACK, inky.WHITE, inky.RED]),
+    ('black', [inky.WHITE, inky.BLACK, inky.WHITE, inky.BLACK]),  # No red ink, red shows as black
+])
+def test_set_palette(colour, shown):
+    transport = inky_host.HostTransport(400, 300)
+    screen = inky.Inky((400, 300), colour, transport=transport)
+    image = inky_host.Bitmap(400, 300, 4)
+    for y in range(300):
+        for x in range(400):
+            image[x, y] = x // 100  # A stripe of each palette index
+    screen.set_image(image)
+    screen.set_palette({3: inky.RED, 2: inky.WHITE})
+    screen.show()
+    pixels = _pixels(transport.image())
+    for index in range(4):
+        assert (pixels[:, index * 100:(index + 1) * 100] == shown[index]).all()
+
+
+def test_refresh_policy_thresholds(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(inky_policy, 'ticks_ms', lambda: now[0])
+    policy = inky_policy.RefreshPolicy(regions=4, max_fast=2, max_fast_colour=1, max_age=60)
+    top, bottom = (0, 10), (90, 100)
+    assert policy.decide(100, top) == ('full', inky_policy.FIRST)
+    assert policy.decide(100, top) == ('fast', inky_policy.FAST)
+    assert policy.decide(100, top) == ('fast', inky_policy.FAST)
+    # The top band used up its fast refreshes, the bottom band didn't
+    assert policy.decide(100, bottom) == ('fast', inky_policy.FAST)
+    assert policy.decide(100, top) == ('full', inky_policy.GHOSTING)
+    assert policy.fast_updates == [0, 0, 0, 0]
+
+    assert policy.decide(100, top, colour_changed=True) == ('full', inky_policy.COLOUR)
+    assert policy.decide(100, top, known=False) == ('full', inky_policy.FIRST)
+
+    now[0] = 59999
+    assert policy.decide(100, top) == ('fast', inky_policy.FAST)
+    now[0] = 60000
+    assert policy.decide(100, top) == ('full', inky_policy.AGE)
+
+
+@pytest.mark.parametrize('inked, limit', [(1, 2), (2, 1)])  # 1 of 25 bytes is 4%, 2 are 8%
+def test_refresh_policy_colour_threshold(inked, limit):
+    policy = inky_policy.RefreshPolicy(regions=4, max_fast=2, max_fast_colour=1, colour_threshold=0.05)
+    plane = np.zeros((20, 5), dtype=np.uint8)
+    plane[0, :inked] = 0xff
+    policy.decide(20, (0, 5), colour_plane=plane)
+    for refresh in range(limit):
+        assert policy.decide(20, (0, 5), colour_plane=plane) == ('fast', inky_policy.FAST)
+    assert policy.decide(20, (0, 5), colour_plane=plane) == ('full', inky_policy.GHOSTING)
+
+
+def test_refresh_policy_driver():
+    screen, transport = _display()
+    screen.stay_awake = True
+    screen.refresh_policy = inky_policy.RefreshPolicy(max_fast=1)
+    screen.stats = inky_stats.Stats()
+    reasons = []
+    for pixel in (inky.BLACK, inky.WHITE, inky.BLACK, inky.RED):
+        screen.set_pixel(0, 0, pixel)
+        screen.show()
+        reasons.append((screen.last_update_mode, screen.stats.reason))
+    assert reasons == [('full', inky_policy.FIRST), ('fast', inky_policy.FAST),
+                       ('full', inky_policy.GHOSTING), ('full', inky_policy.COLOUR)]
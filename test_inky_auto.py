@@ -0,0 +1,53 @@
+"""Tests of creating the driver from the display type, on a computer. Run with ``pytest``."""
+
+import sys
+import types
+
+import pytest
+
+import inky_auto
+import inky_eeprom
+import inky_host
+
+
+class _SSD1619A:
+    """Records how the ``displayio`` driver is created, ``displayio`` only exists on a board."""
+
+    def __init__(self, bus, color, lut=None, **kwargs):
+        self.bus, self.color, self.lut, self.kwargs = bus, color, lut, kwargs
+
+
+@pytest.fixture
+def ssd1619a(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'ssd1619a', types.SimpleNamespace(SSD1619A=_SSD1619A))
+
+
+@pytest.mark.parametrize('variant, width, height, lut', [
+    (1, 212, 104, 'red_ht'),  # Red pHAT (High-Temp)
+    (6, 400, 300, 'red_ht'),
+    (7, 400, 300, 'red'),
+    (2, 400, 300, 'yellow'),
+])
+def test_inky_lut(variant, width, height, lut):
+    epd_type = inky_eeprom.EPDType(width, height, 3 if lut == 'yellow' else 2, 12, variant)
+    screen = inky_auto.auto_display(epd_type, transport=inky_host.HostTransport())
+    assert screen.resolution == (width, height)
+    assert screen.lut == lut
+
+
+def test_displayio_wide(ssd1619a):
+    display = inky_auto.auto_display(inky_eeprom.EPDType(400, 300, 2, 12, 6), bus='bus')
+    assert (display.color, display.lut) == ('red', 'red_ht')
+    assert display.kwargs == {'width': 400, 'height': 300, 'rotation': 0}
+
+
+def test_displayio_phat_geometry(ssd1619a):
+    display = inky_auto.auto_display(inky_eeprom.EPDType(212, 104, 1, 12, 4), bus='bus', rotation=180)
+    assert (display.color, display.lut) == ('black', 'black')
+    # 104 sources by 212 gates, turned a quarter clockwise on top of the rotation asked for
+    assert display.kwargs == {'width': 104, 'height': 212, 'rotation': 270}
+
+
+def test_unsupported_controller():
+    with pytest.raises(ValueError):
+        inky_auto.auto_display(inky_eeprom.EPDType(400, 300, 1, 12, 17))
@@ -0,0 +1,30 @@
+"""Tests of drawing into the packed planes, on a computer. Run with ``pytest``."""
+
+import inky
+import inky_canvas
+import inky_host
+
+
+def _canvas():
+    screen = inky.Inky(colour='red', transport=inky_host.HostTransport(400, 300))
+    return inky_canvas.Canvas(screen), screen
+
+
+def test_plain_item_draws_nothing():
+    canvas, screen = _canvas()
+    canvas.render()
+    item = canvas.add(inky_canvas.Item())
+    assert canvas.dirty is None
+    item.update(colour=inky.RED)
+    assert canvas.render() is None
+    canvas.remove(item)
+    assert canvas.dirty is None
+
+
+def test_rect_shows():
+    canvas, screen = _canvas()
+    canvas.add(inky_canvas.Rect(20, 10, 12, 3, inky.RED))
+    canvas.show()
+    image = screen.transport.image()
+    assert image[20, 10] == image[31, 12] == inky.RED
+    assert image[19, 10] == image[32, 12] == image[20, 13] == inky.WHITE
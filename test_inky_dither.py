@@ -0,0 +1,96 @@
+"""Tests of colour quantization and dithering, on a computer. Run with ``pytest``."""
+
+import array
+
+import numpy as np
+import pytest
+
+import inky_dither
+import inky_host
+import inky_pack
+from inky_pack import WHITE, BLACK, RED
+
+# Pure white, black, red, green, blue and yellow as RGB565
+_PIXELS = (0xFFFF, 0x0000, 0xF800, 0x07E0, 0x001F, 0xFFE0)
+
+
+class _Bitmap16(array.array):
+    """16 bit bitmap whose buffer counts 16 bit values, like ``displayio.Bitmap`` on a board."""
+
+    def __new__(cls, width, height):
+        words = (width * 16 + 31) // 32
+        bitmap = super().__new__(cls, 'H', bytes(words * 4 * height))
+        bitmap.width, bitmap.height, bitmap.bits_per_value = width, height, 16
+        return bitmap
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            x, y = index
+            index = y * (len(self) // self.height) + x
+        super().__setitem__(index, value)
+
+
+def _rgb(*colours, rows=1):
+    """Red, green and blue arrays of `rows` rows of the colours."""
+    return tuple(np.array([[colour[c] for colour in colours]] * rows, dtype=np.uint8) for c in range(3))
+
+
+@pytest.mark.parametrize('bitmap_type', [inky_host.Bitmap, _Bitmap16])
+def test_rgb565_bitmap(bitmap_type):
+    width, height = 3, 4  # Odd width, rows are padded to 32 bits
+    if bitmap_type is inky_host.Bitmap:
+        bitmap = inky_host.Bitmap(width, height, 65536)
+    else:
+        bitmap = _Bitmap16(width, height)
+    for y in range(height):
+        for x in range(width):
+            bitmap[x, y] = _PIXELS[(x + y) % len(_PIXELS)]
+
+    red, green, blue = inky_dither.channels(bitmap, y0=1, y1=3)
+    assert red.tolist() == [[0, 255, 0], [255, 0, 0]]
+    assert green.tolist() == [[0, 0, 255], [0, 255, 0]]
+    assert blue.tolist() == [[0, 0, 0], [0, 0, 255]]
+
+
+def test_rgb565_buffer_swapped():
+    buffer = bytes((0xF8, 0x00, 0x00, 0x1F))  # Red and blue, big endian
+    red, green, blue = inky_dither.channels(inky_dither.RGB565(buffer, 2, 1, swap=True))
+    assert (red.tolist(), green.tolist(), blue.tolist()) == ([[255, 0]], [[0, 0]], [[0, 255]])
+
+
+@pytest.mark.parametrize('colour, expected', [
+    ('red', [WHITE, BLACK, RED, WHITE, BLACK, WHITE]),  # Green is bright enough for white
+    ('yellow', [WHITE, BLACK, BLACK, WHITE, BLACK, RED]),
+    ('black', [WHITE, BLACK, BLACK, WHITE, BLACK, WHITE]),
+])
+def test_threshold(colour, expected):
+    rgb = _rgb((255, 255, 255), (0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0))
+    assert inky_dither.Quantizer(colour, 'threshold').quantize(*rgb).tolist() == [expected]
+
+
+def test_ordered_grey_is_half_black():
+    grey = np.full((4, 4), 128, dtype=np.uint8)
+    out = inky_dither.Quantizer('black', 'ordered').quantize(grey, grey, grey)
+    assert int(np.sum(out)) == 8
+    # The pattern continues across bands
+    band = inky_dither.Quantizer('black', 'ordered').quantize(grey[:2], grey[:2], grey[:2], y0=2)
+    assert band.tolist() == out[2:].tolist()
+
+
+def test_diffusion():
+    grey = np.full((16, 32), 128, dtype=np.uint8)
+    out = inky_dither.Quantizer('red', 'diffusion').quantize(grey, grey, grey)
+    assert set(np.unique(out).tolist()) == {WHITE, BLACK}
+    assert 0.4 < float(np.mean(out)) < 0.6
+    pure = _rgb((255, 255, 255), (0, 0, 0), (255, 0, 0), rows=3)
+    assert inky_dither.Quantizer('red', 'diffusion').quantize(*pure).tolist() == [[WHITE, BLACK, RED]] * 3
+
+
+def test_pack():
+    rgb = _rgb(*[(255, 0, 0) if x % 3 == 0 else (0, 0, 0) if x % 3 == 1 else (255, 255, 255)
+                 for x in range(20)], rows=10)
+    black, colour = inky_dither.pack(rgb, 'red', 'threshold', band_rows=4)
+    expected = inky_pack.pack_planes(inky_dither.Quantizer('red', 'threshold').quantize(*rgb))
+    assert black.tolist() == expected[0].tolist()
+    assert colour.tolist() == expected[1].tolist()
+    assert colour[0, 0] == 0b10010010
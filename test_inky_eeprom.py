@@ -0,0 +1,46 @@
+"""Tests of display detection on a computer. Run with ``pytest``."""
+
+import inky_eeprom
+
+
+def _probe(monkeypatch, result):
+    """Replace the I2C read with one that counts calls and returns or raises `result`."""
+    calls = []
+
+    def from_eeprom(i2c=None):
+        calls.append(i2c)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(inky_eeprom, '_detected', None)
+    monkeypatch.setattr(inky_eeprom.EPDType, 'from_eeprom', staticmethod(from_eeprom))
+    return calls
+
+
+def test_detect_reads_once(monkeypatch):
+    epd_type = inky_eeprom.EPDType(400, 300, 2, 12, 6)
+    calls = _probe(monkeypatch, epd_type)
+    assert inky_eeprom.detect() is epd_type
+    assert inky_eeprom.detect() is epd_type
+    assert len(calls) == 1
+
+
+def test_detect_remembers_missing_eeprom(monkeypatch):
+    calls = _probe(monkeypatch, OSError('no device'))
+    assert inky_eeprom.detect() is None
+    assert inky_eeprom.detect() is None
+    assert len(calls) == 1
+    assert inky_eeprom.detect(refresh=True) is None
+    assert len(calls) == 2
+
+
+def test_detect_cache_file(monkeypatch, tmp_path):
+    path = str(tmp_path / 'eeprom.bin')
+    epd_type = inky_eeprom.EPDType(212, 104, 1, 12, 4)
+    calls = _probe(monkeypatch, epd_type)
+    inky_eeprom.detect(cache=path)
+    monkeypatch.setattr(inky_eeprom, '_detected', None)  # Next boot
+    cached = inky_eeprom.detect(cache=path)
+    assert (cached.width, cached.height, cached.display_variant) == (212, 104, 4)
+    assert len(calls) == 1
@@ -0,0 +1,39 @@
+"""Tests of glyph atlases, on a computer. Run with ``pytest``."""
+
+import inky_font
+
+
+def _font(tmp_path, cache_size):
+    path = str(tmp_path / 'test.glyphs')
+    glyphs = {code: (4, 0, 3, 2, 1, bytes((code, code))) for code in range(ord('a'), ord('e'))}
+    with open(path, 'wb') as f:
+        inky_font.write_atlas(f, 3, 1, glyphs)
+    return inky_font.Font(path, cache_size)
+
+
+def test_glyph(tmp_path):
+    with _font(tmp_path, 8) as font:
+        rows, width, dx, dy, advance = font.glyph('b')
+        assert rows.tolist() == [[ord('b')], [ord('b')]]
+        assert (width, dx, dy, advance) == (3, 0, 1, 4)
+        assert font.glyph('z') is None
+        assert font.text_width('abz') == 8
+
+
+def test_cache_keeps_recently_used(tmp_path):
+    with _font(tmp_path, 2) as font:
+        a = font.glyph('a')
+        font.glyph('b')
+        assert font.glyph('a') is a
+        font.glyph('c')  # Evicts b, used longer ago than a
+        assert font.glyph('a') is a
+        assert 'b' not in font._cache
+
+
+def test_cache_remembers_missing(tmp_path, monkeypatch):
+    with _font(tmp_path, 4) as font:
+        assert font.glyph('z') is None
+        lookups = []
+        monkeypatch.setattr(font, '_find', lambda code: lookups.append(code))
+        assert font.glyph('z') is None
+        assert not lookups
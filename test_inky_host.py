@@ -0,0 +1,25 @@
+"""Tests of the host emulation of the display controller. Run with ``pytest``."""
+
+import pytest
+
+import inky_host
+
+
+@pytest.mark.parametrize('width, height', [(400, 300), (104, 212), (122, 250)])
+def test_pattern_fill_whole_ram(width, height):
+    transport = inky_host.HostTransport(width, height)
+    transport.write(False, b'\x47')
+    transport.write(True, b'\xe6')  # Largest steps, first step set: all of the black/white RAM
+    transport.write(False, b'\x46')
+    transport.write(True, b'\x66')  # Largest steps, first step clear: none of the red/yellow RAM
+    assert transport.bw_ram == b'\xff' * len(transport.bw_ram)
+    assert not any(transport.colour_ram)
+
+
+def test_pattern_fill_steps():
+    transport = inky_host.HostTransport(104, 212)
+    transport.write(False, b'\x47')
+    transport.write(True, b'\x01')  # Steps of 8 rows by 16 pixels, first step clear
+    stride = transport.stride
+    assert transport.bw_ram[:stride] == bytes((0x00, 0x00, 0xff, 0xff) * 3 + (0x00,))
+    assert transport.bw_ram[8 * stride:9 * stride] == bytes((0xff, 0xff, 0x00, 0x00) * 3 + (0xff,))
@@ -0,0 +1,80 @@
+"""Tests of refreshing several displays at once, on a computer. Run with ``pytest``."""
+
+import asyncio
+
+import pytest
+
+import inky
+import inky_host
+import inky_multi
+
+
+def _displays(count=2, refresh_time=0.05):
+    displays = []
+    for i in range(count):
+        transport = inky_host.HostTransport(400, 300, refresh_time=refresh_time * (i + 1))
+        screen = inky.Inky(colour='red', transport=transport)
+        screen.set_pixel(i, 0, inky.BLACK)
+        displays.append(screen)
+    return displays
+
+
+def test_show_all():
+    displays = _displays()
+    assert inky_multi.show_all(displays) == displays
+    for screen in displays:
+        assert screen.transport.refreshes == 1
+        assert screen.transport.asleep
+    assert inky_multi.show_all(displays) == []  # Nothing changed
+
+
+def test_show_all_async():
+    displays = _displays()
+    assert asyncio.run(inky_multi.show_all_async(displays)) == displays
+    for screen in displays:
+        assert screen.transport.refreshes == 1
+        assert screen.transport.asleep
+
+
+@pytest.mark.parametrize('wait', ['sync', 'async'])
+def test_show_all_timeout(wait):
+    fast, slow = _displays(refresh_time=0.2)
+    slow.transport.refresh_time = 5
+    with pytest.raises(TimeoutError):
+        if wait == 'sync':
+            inky_multi.show_all((fast, slow), timeout=0.5)
+        else:
+            asyncio.run(inky_multi.show_all_async((fast, slow), timeout=0.5))
+    assert fast.transport.asleep and not slow.transport.asleep
+
+
+class _DisplayioDisplay:
+    """Stands in for a ``displayio`` display that won't refresh for a while."""
+
+    def __init__(self, time_to_refresh):
+        self.time_to_refresh = time_to_refresh
+        self.busy = False
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+
+
+def test_show_all_async_yields_until_displayio_ready():
+    display = _DisplayioDisplay(0.3)
+    ticks = []
+
+    async def tick():
+        while not display.refreshes:
+            ticks.append(None)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        ticker = asyncio.create_task(tick())
+        refreshed = await inky_multi.show_all_async([display])
+        await ticker
+        return refreshed
+
+    assert asyncio.run(main()) == [display]
+    assert display.refreshes == 1
+    assert len(ticks) > 5  # The ticker kept running while the display wasn't ready
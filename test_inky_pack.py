@@ -0,0 +1,47 @@
+"""Tests of plane packing on a computer, needs numpy. Run with ``pytest``."""
+
+import pytest
+
+import benchmark
+import inky
+import inky_host
+import inky_pack
+
+
+@pytest.mark.parametrize('resolution', [(400, 300), (600, 448), (800, 480)])
+def test_pack_planes_matches_packbits(resolution):
+    cols, rows, _ = inky._RESOLUTION[resolution]
+    screen = inky.Inky(resolution, 'red', transport=inky_host.HostTransport(cols, rows))
+    image = benchmark.test_image(*resolution)
+    for x in range(0, resolution[0], 7):
+        image[x, x % resolution[1]] = 3  # Not a display colour, shows as black
+    screen.set_image(image)
+
+    black, colour = inky_pack.pack_planes(image)
+    assert bytes(black.reshape(-1)) == bytes(screen.packbits(image, lambda value: value != inky.WHITE))
+    assert bytes(colour.reshape(-1)) == bytes(screen.packbits(image, lambda value: value == inky.RED))
+
+
+def test_plane_view_does_not_copy():
+    buffer = bytearray(inky_pack.row_bytes(20) * 3)
+    plane = inky_pack.plane_view(buffer, 20, 3)
+    assert plane.shape == (3, 3)
+    buffer[4] = 0xa5
+    assert plane[1, 1] == 0xa5
+    plane[2, 0] = 0x5a
+    assert buffer[6] == 0x5a
+
+
+def test_show_packs_into_driver_buffers():
+    screen = inky.Inky((400, 300), 'red', transport=inky_host.HostTransport(400, 300))
+    buffers = screen._buf_a, screen._buf_b
+    screen.set_pixel(8, 1, inky.BLACK)
+    screen.set_pixel(16, 2, inky.RED)
+    screen.show()
+    # The packed planes are views of the driver's buffers, packing writes straight into them
+    assert screen._buf_a is buffers[0] and screen._buf_b is buffers[1]
+    assert any(screen._buf_a) and any(screen._buf_b)
+    assert screen._plane_a.tobytes() == screen._buf_a
+    assert screen._plane_b.tobytes() == screen._buf_b
+    screen._buf_b[0] ^= 0xff
+    assert screen._plane_b[0, 0] == screen._buf_b[0]
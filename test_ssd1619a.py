@@ -0,0 +1,85 @@
+"""Tests of the ``displayio`` driver, on a computer. Run with ``pytest``.
+
+``displayio`` and ``supervisor`` only exist on a board, a recording stand-in replaces them.
+"""
+
+import importlib
+import sys
+import types
+
+import pytest
+
+import inky_policy
+import inky_sequence
+import inky_stats  # Before the stand-in supervisor replaces the real clock
+
+
+class _EPaperDisplay:
+    """Records the arguments and refreshes of a ``displayio.EPaperDisplay``."""
+
+    busy = False
+    time_to_refresh = 0
+
+    def __init__(self, bus, start_sequence, stop_sequence, **kwargs):
+        self.start_sequence = start_sequence
+        self.kwargs = kwargs
+        self.width, self.height = kwargs['width'], kwargs['height']
+        self.refreshes = []
+
+    def refresh(self):
+        self.refreshes.append(bytes(self.start_sequence))
+
+
+class _Bus:
+    def reset(self):
+        pass
+
+
+@pytest.fixture
+def ssd1619a(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'displayio', types.SimpleNamespace(EPaperDisplay=_EPaperDisplay, FourWire=_Bus))
+    monkeypatch.setitem(sys.modules, 'supervisor', types.SimpleNamespace(ticks_ms=inky_stats.ticks_ms))
+    monkeypatch.delitem(sys.modules, 'ssd1619a', raising=False)
+    module = importlib.import_module('ssd1619a')
+    yield module
+    sys.modules.pop('ssd1619a', None)
+
+
+def _lut(display, refresh=-1):
+    """LUT in the start sequence of a refresh."""
+    sequence = display.refreshes[refresh]
+    offset = inky_sequence.find_command(sequence, 0x32)
+    return sequence[offset:offset + len(inky_sequence.LUTS['fast'])]
+
+
+@pytest.mark.parametrize('color, reasons', [
+    ('red', [inky_policy.FIRST, inky_policy.COLOUR, inky_policy.FAST, inky_policy.COLOUR]),
+    ('yellow', [inky_policy.FIRST, inky_policy.COLOUR, inky_policy.FAST, inky_policy.COLOUR]),
+    ('black', [inky_policy.FIRST, inky_policy.FAST, inky_policy.FAST, inky_policy.COLOUR]),
+])
+def test_policy_colour_unknown(ssd1619a, color, reasons):
+    display = ssd1619a.SSD1619A(_Bus(), color, width=400, height=300)
+    display.refresh_policy = inky_policy.RefreshPolicy()
+    decisions = []
+    for colour_changed in (None, None, False, True):  # None: unknown, the caller didn't say
+        display.refresh(colour_changed)
+        decisions.append(display.refresh_policy.decision[1])
+    assert decisions == reasons
+    for refresh, reason in enumerate(reasons):
+        fast = _lut(display, refresh) == inky_sequence.LUTS['fast']
+        assert fast == (reason == inky_policy.FAST)
+
+
+def test_lut(ssd1619a):
+    display = ssd1619a.SSD1619A(_Bus(), 'red', lut='red_ht', width=400, height=300)
+    display.refresh()
+    assert _lut(display) == inky_sequence.LUTS['red_ht']
+    with pytest.raises(ValueError):
+        ssd1619a.SSD1619A(_Bus(), 'red', lut='blue', width=400, height=300)
+
+
+def test_partial_update_width(ssd1619a):
+    with pytest.raises(ValueError):
+        ssd1619a.SSD1619A(_Bus(), 'red', partial_update=True, width=400, height=300)
+    display = ssd1619a.SSD1619A(_Bus(), 'red', partial_update=True, width=104, height=212)
+    assert display.kwargs['set_column_window_command'] == 0x44